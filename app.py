@@ -9,6 +9,50 @@ import base64
 from datetime import datetime, timedelta
 import random
 
+from modules.benchmarking import BENCHMARK_METRICS, peer_group_label
+from modules.dataflow import PortfolioState
+from modules.export import EXPORT_FORMATS, framework_metrics, start_export
+from modules.retrofits import (
+    OBJECTIVES as RETROFIT_OBJECTIVES,
+    PORTFOLIO_OBJECTIVES,
+    allocate_portfolio_budget,
+    optimize_retrofits,
+    pareto_packages,
+    project_retrofit,
+    simulate_retrofit_outcomes,
+)
+from modules.scenarios import SCENARIO_PRESETS, SCORE_THRESHOLDS, evaluate_scenarios
+from modules.sensitivity import DEFAULT_SAMPLES, DEFAULT_SPREAD, SAMPLING_METHODS, rank_sensitivity, sample_count
+from modules.scheduler import MAX_QUARTERS, PRIORITIES as SCHEDULE_PRIORITIES, build_jobs, carbon_trajectory, schedule_retrofits
+from modules.shared_data import get_shared_data
+from modules.ui_components import (
+    paginate,
+    property_card,
+    quest_card,
+    render_cards,
+    retro_progress_bar,
+    retrofit_card,
+)
+from modules.visualizations import (
+    GRESB_MODES,
+    MAX_SCATTER_POINTS,
+    cached_figure,
+    comparison_radar,
+    gresb_data,
+    gresb_matrix,
+    gri_compliance,
+    pareto_frontier,
+    portfolio_map,
+    quest_progress,
+    rank_range_histogram,
+    retrofit_timeline,
+    scenario_distribution,
+    sfdr_impacts,
+    spend_trajectory,
+    tcfd_radar,
+)
+from modules.spatial import cluster_properties, map_zoom, view_bounds
+
 # Set page config
 st.set_page_config(
     page_title="ESG Arcade: Real Estate Edition",
@@ -203,308 +247,196 @@ def add_retro_css():
     </style>
     """, unsafe_allow_html=True)
 
-# Function to create retro progress bar
-def retro_progress_bar(percentage, label="", color="#00FF00"):
-    return f"""
-    <div class="retro-progress-container">
-        <div class="retro-progress-bar" style="width:{percentage}%; background-color:{color};">
-            {label} {int(percentage)}%
-        </div>
-    </div>
-    """
+# Property picker: only the search matches are sent to the browser, never the whole portfolio
+def select_property(label, key):
+    property_index = st.session_state.property_index
+    query = st.text_input("SEARCH PROPERTY", key=f"{key}_search", placeholder="Name, ID, city or type")
+    matches = st.session_state.property_search.search(query)
+    if not matches:
+        st.warning(f"No property matches '{query}'.")
+        matches = st.session_state.property_search.search("")
+    return st.selectbox(
+        label,
+        matches,
+        key=key,
+        format_func=lambda property_id: f"{property_index.name(property_id)} ({property_id})"
+    )
 
-# Function to create pixel art building icon (simple ASCII representation)
-def pixel_building(score):
-    if score >= 80:
-        color = "#00FF00"  # Green
-    elif score >= 50:
-        color = "#FFFF00"  # Yellow
-    else:
-        color = "#FF0000"  # Red
-        
-    building = f"""
-    <div style="text-align: center; color: {color}; font-family: monospace; font-size: 18px; margin: 10px 0;">
-    <pre>
-      /\\
-     /  \\
-    /____\\
-    |    |
-    |____|
-    |    |
-    |    |
-    |____|
-    </pre>
-    <p style="margin-top: -10px; font-family: 'Press Start 2P', cursive; font-size: 14px; color: {color};">
-    ESG SCORE: {score}%
-    </p>
-    </div>
-    """
-    return building
+# Cached so repeating an optimization for the same property and budget is instant
+@st.cache_data(max_entries=256, show_spinner="Optimizing retrofit package...")
+def cached_optimize_retrofits(retrofit_df, property_data, budget, objective):
+    return optimize_retrofits(retrofit_df, property_data, budget, objective)
 
-# Generate sample data
-def generate_sample_data():
-    property_types = ["Office", "Retail", "Residential", "Industrial", "Mixed-Use"]
-    cities = ["Paris", "London", "Berlin", "Madrid", "Amsterdam", "Milan", "Brussels"]
-    certification_types = ["BREEAM", "HQE", "LEED", "None"]
-    certification_levels = ["Outstanding", "Excellent", "Very Good", "Good", "Pass", "None"]
-    
-    data = []
-    for i in range(1, 16):
-        property_type = random.choice(property_types)
-        city = random.choice(cities)
-        certification = random.choice(certification_types)
-        
-        # For properties with no certification
-        if certification == "None":
-            certification_level = "None"
-        else:
-            # Skip "None" if there's a certification
-            possible_levels = certification_levels.copy()
-            if "None" in possible_levels:
-                possible_levels.remove("None")
-            certification_level = random.choice(possible_levels)
-        
-        # Random ESG metrics
-        energy_score = random.randint(20, 100)
-        carbon_footprint = random.randint(50, 250)
-        water_usage = random.randint(500, 2000)
-        waste_recycling = random.randint(10, 95)
-        
-        # Social and governance metrics
-        tenant_satisfaction = random.randint(50, 100)
-        community_impact = random.randint(30, 100)
-        governance_compliance = random.randint(40, 100)
-        
-        # Calculate overall ESG score (weighted)
-        env_score = (energy_score * 0.4 + (100 - carbon_footprint/2.5) * 0.4 + 
-                    waste_recycling * 0.2)
-        social_score = (tenant_satisfaction * 0.6 + community_impact * 0.4)
-        gov_score = governance_compliance
-        
-        overall_esg_score = env_score * 0.5 + social_score * 0.3 + gov_score * 0.2
-        
-        # Random coordinates within Europe
-        lat = random.uniform(36.0, 60.0)
-        lon = random.uniform(-5.0, 30.0)
-        
-        # Create property entry
-        property_data = {
-            "Property ID": f"PROP-{i:03d}",
-            "Property Name": f"{city} {property_type} {i}",
-            "Type": property_type,
-            "Location": city,
-            "Size (sqm)": random.randint(1000, 50000),
-            "Year Built": random.randint(1970, 2023),
-            "Certification": certification,
-            "Certification Level": certification_level,
-            "Energy Score": energy_score,
-            "Carbon Footprint (kgCO2e/sqm/yr)": carbon_footprint,
-            "Water Usage (L/sqm/yr)": water_usage,
-            "Waste Recycling (%)": waste_recycling,
-            "Tenant Satisfaction": tenant_satisfaction,
-            "Community Impact": community_impact,
-            "Governance Compliance": governance_compliance,
-            "Environmental Score": env_score,
-            "Social Score": social_score,
-            "Governance Score": gov_score,
-            "Overall ESG Score": overall_esg_score,
-            "Latitude": lat,
-            "Longitude": lon
-        }
-        
-        data.append(property_data)
+@st.cache_data(max_entries=256, show_spinner=False)
+def cached_pareto_packages(retrofit_df, property_size, budget):
+    return pareto_packages(retrofit_df, property_size, budget)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def cached_simulate_retrofit_outcomes(selected_df, property_data, seed):
+    bands, _ = simulate_retrofit_outcomes(selected_df, property_data, seed=seed)
+    return bands
+
+# Portfolio-wide results are keyed on the portfolio version, not the frame: Streamlit hashes
+# only a sample of the rows of a large frame, which can miss an edit of a few properties
+@st.cache_data(max_entries=16, show_spinner="Allocating fund budget...")
+def cached_allocate_portfolio_budget(_properties_df, portfolio_version, retrofit_df, budget, objective):
+    return allocate_portfolio_budget(_properties_df, retrofit_df, budget, objective)
+
+@st.cache_data(max_entries=16, show_spinner="Scheduling retrofits...")
+def cached_schedule_retrofits(jobs_df, _properties_df, portfolio_version, retrofit_df, annual_budget, crews, priority):
+    schedule = schedule_retrofits(build_jobs(jobs_df, _properties_df, retrofit_df), annual_budget, crews, priority)
+    return schedule, carbon_trajectory(schedule, _properties_df)
+
+@st.cache_data(max_entries=16, show_spinner="Evaluating weighting scenarios...")
+def cached_evaluate_scenarios(_properties_df, portfolio_version, scenarios):
+    return evaluate_scenarios(_properties_df, scenarios)
+
+@st.cache_data(max_entries=16, show_spinner="Sampling ESG weights...")
+def cached_rank_sensitivity(_properties_df, portfolio_version, method, samples, spread):
+    return rank_sensitivity(_properties_df, method, samples, spread)
+
+# Cards shown per page; only the visible page is built and sent
+LEADERBOARD_PAGE_SIZE = 5
+QUEST_PAGE_SIZE = 10
+RETROFIT_PAGE_SIZE = 9
+
+# Card lists are fragments, so turning a page reruns only the list, not the filters or other sections
+@st.fragment
+def leaderboard_panel(group, end):
+    leaderboard = st.session_state.leaderboard
+    start, stop = paginate(
+        len(leaderboard.groups[group]), LEADERBOARD_PAGE_SIZE, "leaderboard_page", reset_on=(group, end)
+    )
+    
+    # One page of the maintained leaderboard, without sorting the portfolio
+    page_properties = leaderboard.top(stop - start, group, bottom=end == "BOTTOM", start=start)
     
-    return pd.DataFrame(data)
+    # The panel and its cards go out as one element
+    render_cards(
+        [property_card(prop) for prop in page_properties.to_dict("records")],
+        header=f"""<div style="background-color: #FF69B4; border: 3px solid #FFFFFF; padding: 15px; box-shadow: 5px 5px 0px #8B0053; height: 480px; overflow-y: auto;"><h3 style="font-size: 1.2em; margin-bottom: 15px; color: #6B0075; text-shadow: 2px 2px 0px #FFFFFF;">{end} PROPERTIES</h3>""",
+        footer="</div>"
+    )
 
-# Function to generate random target data
-def generate_target_data():
+@st.fragment
+def quest_list(filtered_df, filters):
+    start, stop = paginate(len(filtered_df), QUEST_PAGE_SIZE, "quest_page", reset_on=filters)
     current_year = datetime.now().year
-    targets = [
-        {
-            "Target Name": "Carbon Neutrality",
-            "Category": "Environmental",
-            "Current Value": random.randint(50, 80),
-            "Target Value": 100,
-            "Target Year": current_year + 5,
-            "Regulation": "EU Climate Law",
-            "Priority": "High"
-        },
-        {
-            "Target Name": "Energy Efficiency",
-            "Category": "Environmental",
-            "Current Value": random.randint(30, 70),
-            "Target Value": 90,
-            "Target Year": current_year + 3,
-            "Regulation": "EPBD",
-            "Priority": "High"
-        },
-        {
-            "Target Name": "Water Conservation",
-            "Category": "Environmental",
-            "Current Value": random.randint(40, 60),
-            "Target Value": 80,
-            "Target Year": current_year + 4,
-            "Regulation": "EU Water Framework",
-            "Priority": "Medium"
-        },
-        {
-            "Target Name": "Waste Reduction",
-            "Category": "Environmental",
-            "Current Value": random.randint(30, 50),
-            "Target Value": 90,
-            "Target Year": current_year + 3,
-            "Regulation": "EU Circular Economy Package",
-            "Priority": "Medium"
-        },
-        {
-            "Target Name": "Certification Coverage",
-            "Category": "Environmental",
-            "Current Value": random.randint(20, 40),
-            "Target Value": 100,
-            "Target Year": current_year + 5,
-            "Regulation": "Market Standards",
-            "Priority": "High"
-        },
-        {
-            "Target Name": "Tenant Wellbeing",
-            "Category": "Social",
-            "Current Value": random.randint(50, 70),
-            "Target Value": 95,
-            "Target Year": current_year + 2,
-            "Regulation": "Internal Policy",
-            "Priority": "Medium"
-        },
-        {
-            "Target Name": "Community Engagement",
-            "Category": "Social",
-            "Current Value": random.randint(30, 60),
-            "Target Value": 85,
-            "Target Year": current_year + 4,
-            "Regulation": "CSR Framework",
-            "Priority": "Low"
-        },
-        {
-            "Target Name": "ESG Reporting",
-            "Category": "Governance",
-            "Current Value": random.randint(50, 70),
-            "Target Value": 100,
-            "Target Year": current_year + 2,
-            "Regulation": "SFDR",
-            "Priority": "High"
-        },
-        {
-            "Target Name": "ESG Risk Management",
-            "Category": "Governance",
-            "Current Value": random.randint(40, 70),
-            "Target Value": 90,
-            "Target Year": current_year + 3,
-            "Regulation": "TCFD",
-            "Priority": "High"
-        }
-    ]
-    
-    return pd.DataFrame(targets)
+    render_cards([quest_card(target, current_year) for target in filtered_df.iloc[start:stop].to_dict("records")])
 
-# Generate retrofit data
-def generate_retrofit_options():
-    options = [
-        {
-            "Retrofit": "Solar Panel Installation",
-            "Category": "Energy Generation",
-            "Cost (€/sqm)": 120,
-            "ROI (Years)": 7,
-            "Carbon Reduction (%)": 30,
-            "Energy Saving (%)": 25,
-            "Implementation Time (Months)": 3,
-            "Complexity": "Medium"
-        },
-        {
-            "Retrofit": "HVAC Upgrade",
-            "Category": "Energy Efficiency",
-            "Cost (€/sqm)": 80,
-            "ROI (Years)": 5,
-            "Carbon Reduction (%)": 20,
-            "Energy Saving (%)": 30,
-            "Implementation Time (Months)": 4,
-            "Complexity": "Medium"
-        },
-        {
-            "Retrofit": "Building Envelope Insulation",
-            "Category": "Energy Efficiency",
-            "Cost (€/sqm)": 95,
-            "ROI (Years)": 8,
-            "Carbon Reduction (%)": 25,
-            "Energy Saving (%)": 35,
-            "Implementation Time (Months)": 5,
-            "Complexity": "High"
-        },
-        {
-            "Retrofit": "LED Lighting Upgrade",
-            "Category": "Energy Efficiency",
-            "Cost (€/sqm)": 15,
-            "ROI (Years)": 2,
-            "Carbon Reduction (%)": 5,
-            "Energy Saving (%)": 10,
-            "Implementation Time (Months)": 1,
-            "Complexity": "Low"
-        },
-        {
-            "Retrofit": "Smart Building Management System",
-            "Category": "Energy Management",
-            "Cost (€/sqm)": 50,
-            "ROI (Years)": 4,
-            "Carbon Reduction (%)": 15,
-            "Energy Saving (%)": 20,
-            "Implementation Time (Months)": 3,
-            "Complexity": "High"
-        },
-        {
-            "Retrofit": "Water Efficiency Measures",
-            "Category": "Water Conservation",
-            "Cost (€/sqm)": 25,
-            "ROI (Years)": 3,
-            "Carbon Reduction (%)": 2,
-            "Energy Saving (%)": 5,
-            "Implementation Time (Months)": 2,
-            "Complexity": "Low"
-        },
-        {
-            "Retrofit": "Green Roof Installation",
-            "Category": "Biodiversity",
-            "Cost (€/sqm)": 110,
-            "ROI (Years)": 12,
-            "Carbon Reduction (%)": 5,
-            "Energy Saving (%)": 8,
-            "Implementation Time (Months)": 4,
-            "Complexity": "High"
-        },
-        {
-            "Retrofit": "Waste Management Systems",
-            "Category": "Waste Reduction",
-            "Cost (€/sqm)": 10,
-            "ROI (Years)": 2,
-            "Carbon Reduction (%)": 3,
-            "Energy Saving (%)": 0,
-            "Implementation Time (Months)": 2,
-            "Complexity": "Low"
-        }
-    ]
+@st.fragment
+def retrofit_grid(retrofit_df):
+    start, stop = paginate(len(retrofit_df), RETROFIT_PAGE_SIZE, "retrofit_page")
+    retrofit_records = retrofit_df.iloc[start:stop].to_dict("records")
+    retrofit_ids = [f"retrofit_{i}" for i in range(start, stop)]
+    selected_flags = [retrofit_id in st.session_state.selected_retrofits for retrofit_id in retrofit_ids]
+    
+    # The page of cards goes out as one element; the buttons that select them follow in the same order
+    render_cards(
+        [retrofit_card(retrofit, is_selected, retrofit["Affordable"])
+         for retrofit, is_selected in zip(retrofit_records, selected_flags)],
+        columns=3
+    )
     
-    return pd.DataFrame(options)
+    cols = st.columns(3)
+    for i, (retrofit_id, retrofit, is_selected) in enumerate(zip(retrofit_ids, retrofit_records, selected_flags)):
+        can_afford = retrofit["Affordable"]
+        
+        with cols[i % 3]:
+            # Add button for selection (this will actually work, unlike the card markup)
+            button_label = "REMOVE" if is_selected else ("SELECT" if can_afford else "INSUFFICIENT FUNDS")
+            button_disabled = not can_afford and not is_selected
+            
+            if st.button(f"{button_label}: {retrofit['Retrofit']}", key=f"btn_{retrofit_id}", disabled=button_disabled):
+                if is_selected:
+                    st.session_state.selected_retrofits.remove(retrofit_id)
+                else:
+                    st.session_state.selected_retrofits.append(retrofit_id)
+                st.rerun()
+
+# Exports are written on a background thread; while one runs, the panel polls it instead of blocking the script
+EXPORT_POLL_SECONDS = 1
+
+def export_panel(properties_df, targets_df, metrics, scope, polling):
+    export_job = st.session_state.get("export_job")
+    if polling and export_job is not None and export_job.done():
+        # Rerun the whole app so the panel is drawn again without polling
+        st.rerun()
+    
+    export_format = st.selectbox(
+        "EXPORT FORMAT",
+        list(EXPORT_FORMATS.keys()),
+        format_func=lambda export_format: EXPORT_FORMATS[export_format].upper(),
+        key="export_format"
+    )
+    running = export_job is not None and not export_job.done()
+    if st.button(f"GENERATE {EXPORT_FORMATS[export_format].upper()}", disabled=running):
+        if export_job is not None:
+            export_job.discard()
+        st.session_state.export_job = start_export(properties_df, targets_df, metrics, export_format, scope)
+        st.session_state.export_rewarded = False
+        st.rerun()
+    
+    if export_job is None:
+        return
+    if running:
+        st.caption(f"WRITING {EXPORT_FORMATS[export_job.format].upper()} EXPORT...")
+    elif export_job.error() is not None:
+        st.error(f"Export failed: {export_job.error()}")
+    else:
+        if not st.session_state.export_rewarded:
+            st.session_state.export_rewarded = True
+            st.session_state.game_score += 100
+            st.session_state.level = (st.session_state.game_score // 1000) + 1
+            st.toast(f"{EXPORT_FORMATS[export_job.format]} report generated! +100 points", icon="🏆")
+        # The file is only read when the button is clicked; st.download_button serves from
+        # memory, so it is read whole then and the job's temporary file is left for repeat clicks
+        st.download_button(
+            f"DOWNLOAD {EXPORT_FORMATS[export_job.format].upper()}",
+            data=export_job.read,
+            file_name=export_job.file_name,
+            mime=export_job.mime,
+            on_click="ignore",
+            key="export_download"
+        )
+
+# Apply metric changes to this session's portfolio; scores, leaderboards,
+# aggregates and peer benchmarks that depend on them are refreshed incrementally
+def update_portfolio(changes):
+    state = st.session_state.portfolio_state
+    state.update(changes)
+    st.session_state.properties_df = state.properties
+    st.session_state.property_index = state.property_index
+    st.session_state.leaderboard = state.leaderboard
+    st.session_state.aggregates = state.aggregates
+    st.session_state.benchmarks = state.benchmarks
 
 # Apply the custom CSS
 add_retro_css()
 
-# Initialize session state for the "game"
-if 'properties_df' not in st.session_state:
-    st.session_state.properties_df = generate_sample_data()
+# Portfolio data is loaded once per server process and shared by every session;
+# sessions only hold references to it
+shared_data = get_shared_data()
+if st.session_state.get('data_fingerprint') != shared_data.fingerprint:
+    st.session_state.data_fingerprint = shared_data.fingerprint
+    st.session_state.properties_df = shared_data.properties
+    st.session_state.targets_df = shared_data.targets
+    st.session_state.retrofit_df = shared_data.retrofits
+    st.session_state.property_index = shared_data.property_index
+    st.session_state.property_search = shared_data.property_search
+    st.session_state.spatial_index = shared_data.spatial_index
+    st.session_state.leaderboard = shared_data.leaderboard
+    st.session_state.aggregates = shared_data.aggregates
+    st.session_state.benchmarks = shared_data.benchmarks
+    st.session_state.portfolio_state = PortfolioState(
+        shared_data.properties, shared_data.property_index, shared_data.leaderboard, shared_data.aggregates,
+        shared_data.benchmarks, version=shared_data.fingerprint, peer_groups=shared_data.peer_groups
+    )
 
-if 'targets_df' not in st.session_state:
-    st.session_state.targets_df = generate_target_data()
-    
-if 'retrofit_df' not in st.session_state:
-    st.session_state.retrofit_df = generate_retrofit_options()
+# Identifies this session's portfolio for the caches above; it changes with every update_portfolio
+portfolio_version = st.session_state.portfolio_state.version
 
+# Initialize session state for the "game"
 if 'game_score' not in st.session_state:
     st.session_state.game_score = 0
     
@@ -581,71 +513,40 @@ if current_section == "Portfolio Map":
         # Map of properties
         df = st.session_state.properties_df
         
-        # Create color scale based on ESG score
-        fig = px.scatter_mapbox(
-            df, 
-            lat="Latitude", 
-            lon="Longitude", 
-            color="Overall ESG Score",
-            size=[30] * len(df),  # Fixed size for pixel art feel
-            color_continuous_scale=["red", "yellow", "green"],
-            range_color=[0, 100],
-            hover_name="Property Name",
-            hover_data={
-                "Property ID": True,
-                "Type": True,
-                "Location": True,
-                "Overall ESG Score": True,
-                "Certification": True,
-                "Latitude": False,
-                "Longitude": False
-            },
-            zoom=3,
-            height=500
-        )
-        
-        fig.update_layout(
-            mapbox_style="carto-positron",  # Lighter map style for better visibility
-            paper_bgcolor="#FFFFFF",
-            plot_bgcolor="#FFFFFF",
-            font=dict(family="VT323", size=16, color="#000000"),
-            margin=dict(l=0, r=0, t=0, b=0),
-            coloraxis_colorbar=dict(
-                title="ESG Score",
-                tickfont=dict(family="VT323", size=14, color="#000000"),
-                titlefont=dict(family="Press Start 2P", size=12, color="#6B0075"),
-                len=0.8
-            )
-        )
+        property_index = st.session_state.property_index
+        map_views = ["ALL LOCATIONS"] + property_index.locations()
+        map_view = st.selectbox("MAP VIEW", map_views)
+
+        def map_data():
+            if map_view == "ALL LOCATIONS":
+                bounds = view_bounds(df)
+            else:
+                bounds = view_bounds(df[["Latitude", "Longitude"]].iloc[property_index.located_in(map_view)])
+            # Large portfolios are drawn as grid clusters so the figure stays small
+            markers, clustered = cluster_properties(df, bounds, index=st.session_state.spatial_index)
+            center = dict(lat=(bounds[0] + bounds[1]) / 2, lon=(bounds[2] + bounds[3]) / 2)
+            return dict(markers=markers, clustered=clustered, center=center, zoom=map_zoom(bounds))
+
+        # Keyed on the portfolio version and the view, so a hit neither
+        # clusters the portfolio nor recomputes the view bounds
+        fig = cached_figure("portfolio_map", map_data, lambda view: portfolio_map(**view),
+                            data_key=(portfolio_version, map_view))
         
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        st.markdown("""
-        <div style="background-color: #FF69B4; border: 3px solid #FFFFFF; padding: 15px; 
-                   box-shadow: 5px 5px 0px #8B0053; height: 480px; overflow-y: auto;">
-            <h3 style="font-size: 1.2em; margin-bottom: 15px; color: #6B0075; text-shadow: 2px 2px 0px #FFFFFF;">TOP PROPERTIES</h3>
-        """, unsafe_allow_html=True)
-        
-        # Sort by ESG score and get top 5
-        top_properties = df.sort_values("Overall ESG Score", ascending=False).head(5)
-        
-        for _, prop in top_properties.iterrows():
-            score = int(prop["Overall ESG Score"])
-            st.markdown(f"""
-            <div class="property-card">
-                <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; margin-bottom: 10px;">
-                    {prop["Property Name"]}
-                </p>
-                {pixel_building(score)}
-                <p>TYPE: {prop["Type"]}</p>
-                <p>LOCATION: {prop["Location"]}</p>
-                <p>CERT: {prop["Certification"]}</p>
-                {retro_progress_bar(score, "ESG", "#00FF00" if score >= 80 else "#FFFF00" if score >= 50 else "#FF0000")}
-            </div>
-            """, unsafe_allow_html=True)
+        leaderboard = st.session_state.leaderboard
+        col_scope, col_order = st.columns([2, 1])
+        with col_scope:
+            leaderboard_group = st.selectbox(
+                "LEADERBOARD",
+                leaderboard.group_names(),
+                format_func=lambda group: "PORTFOLIO" if group is None else f"{group[0]}: {group[1]}".upper()
+            )
+        with col_order:
+            leaderboard_end = st.selectbox("SHOW", ["TOP", "BOTTOM"])
         
-        st.markdown("</div>", unsafe_allow_html=True)
+        leaderboard_panel(leaderboard_group, leaderboard_end)
         
         # Game-like action buttons
         st.markdown("<div style='height: 20px'></div>", unsafe_allow_html=True)
@@ -670,10 +571,12 @@ elif current_section == "ESG Assessment":
     
     # Property selector
     df = st.session_state.properties_df
-    property_options = df["Property Name"].tolist()
+    property_index = st.session_state.property_index
     
-    selected_property = st.selectbox("SELECT PROPERTY", property_options)
-    property_data = df[df["Property Name"] == selected_property].iloc[0]
+    # Options are Property IDs, since names are not guaranteed to be unique
+    selected_property_id = select_property("SELECT PROPERTY", "assessment_property")
+    property_data = property_index.get(selected_property_id)
+    selected_property = property_data["Property Name"]
     
     # Display property ESG stats in a game-like stat card
     col1, col2 = st.columns([1, 1])
@@ -765,66 +668,85 @@ elif current_section == "ESG Assessment":
         </div>
         """, unsafe_allow_html=True)
     
+    # Standing within comparable buildings (same type, city and size band), precomputed for every property
+    property_benchmark = st.session_state.benchmarks.iloc[property_index.position(selected_property_id)]
+    
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">PEER BENCHMARK</h3>
+    """, unsafe_allow_html=True)
+    
+    metric_standings = "".join(
+        f"""
+            <div style="width: 25%; padding: 5px;">
+                <p>{metric.split(" (")[0].upper()}: TOP {property_benchmark[metric]:.0f}%</p>
+            </div>"""
+        for metric in BENCHMARK_METRICS
+    )
+    st.markdown(f"""
+    <div style="background-color: #000080; border: 3px solid #FFFFFF; padding: 20px; 
+               box-shadow: 5px 5px 0px #000000; margin-bottom: 20px;">
+        <p style="font-family: 'Press Start 2P', cursive; font-size: 1em; color: #FFFF00;">
+            TOP {property_benchmark["Overall ESG Score"]:.0f}% OF {peer_group_label(property_data, property_benchmark["Peer Level"])}
+        </p>
+        <p>OVERALL ESG SCORE IN A PEER GROUP OF {int(property_benchmark["Peers"]):,}</p>
+        <div style="display: flex; flex-wrap: wrap;">{metric_standings}
+        </div>
+    </div>
+    """, unsafe_allow_html=True)
+    
     # Comparison chart
     st.markdown("""
     <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">COMPARISON RADAR</h3>
     """, unsafe_allow_html=True)
     
     # Create a radar chart comparing this property to portfolio average
-    avg_env = df["Environmental Score"].mean()
-    avg_social = df["Social Score"].mean()
-    avg_gov = df["Governance Score"].mean()
-    
-    categories = ['Environmental', 'Social', 'Governance']
-    
-    fig = go.Figure()
-    
-    fig.add_trace(go.Scatterpolar(
-        r=[env_score, social_score, gov_score],
-        theta=categories,
-        fill='toself',
-        name='Selected Property',
-        line=dict(color='#00FFFF'),
-        fillcolor='rgba(0, 255, 255, 0.2)'
-    ))
-    
-    fig.add_trace(go.Scatterpolar(
-        r=[avg_env, avg_social, avg_gov],
-        theta=categories,
-        fill='toself',
-        name='Portfolio Average',
-        line=dict(color='#FF00FF'),
-        fillcolor='rgba(255, 0, 255, 0.2)'
-    ))
-    
-    fig.update_layout(
-        polar=dict(
-            radialaxis=dict(
-                visible=True,
-                range=[0, 100]
-            )
-        ),
-        showlegend=True,
-        legend=dict(
-            font=dict(
-                family="VT323",
-                size=16,
-                color="white"
-            )
-        ),
-        paper_bgcolor="#000080",
-        plot_bgcolor="#000080",
-        font=dict(
-            family="VT323",
-            size=16,
-            color="white"
-        )
+    portfolio_means = st.session_state.aggregates.summary()["Mean"]
+    avg_env = portfolio_means["Environmental Score"]
+    avg_social = portfolio_means["Social Score"]
+    avg_gov = portfolio_means["Governance Score"]
+    
+    fig = cached_figure(
+        "comparison_radar",
+        {
+            "Selected Property": [env_score, social_score, gov_score],
+            "Portfolio Average": [avg_env, avg_social, avg_gov]
+        },
+        comparison_radar,
+        categories=['Environmental', 'Social', 'Governance']
     )
     
     st.plotly_chart(fig, use_container_width=True)
     
     st.markdown("</div>", unsafe_allow_html=True)
     
+    # Neighbouring buildings, looked up in the spatial index rather than by scanning the portfolio
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">NEARBY PROPERTIES</h3>
+    """, unsafe_allow_html=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        nearby_radius = st.slider("RADIUS (KM)", min_value=1, max_value=100, value=5)
+    with col2:
+        nearby_count = st.slider("NEAREST", min_value=1, max_value=20, value=5)
+    
+    spatial_index = st.session_state.spatial_index
+    property_position = property_index.position(selected_property_id)
+    within, _ = spatial_index.radius(property_data["Latitude"], property_data["Longitude"], nearby_radius)
+    nearest, distances = spatial_index.nearest(
+        property_data["Latitude"], property_data["Longitude"], nearby_count, exclude=property_position
+    )
+    
+    st.markdown(f"""
+    <div class="pixel-card">
+        <p>{len(within) - 1:,} OTHER PROPERTIES WITHIN {nearby_radius} KM</p>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    nearby = df.iloc[nearest][["Property Name", "Type", "Location", "Overall ESG Score"]].copy()
+    nearby.insert(1, "Distance (km)", distances.round(2))
+    st.dataframe(nearby, use_container_width=True, hide_index=True)
+    
     # Game-like action buttons
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -878,55 +800,7 @@ elif current_section == "Target Tracking":
     <h3 style="font-size: 1.2em; margin-top: 20px; margin-bottom: 15px;">ESG QUESTS</h3>
     """, unsafe_allow_html=True)
     
-    for _, target in filtered_df.iterrows():
-        current_value = target["Current Value"]
-        target_value = target["Target Value"]
-        progress = (current_value / target_value) * 100
-        
-        # Determine color based on progress
-        if progress >= 80:
-            color = "#00FF00"  # Green
-        elif progress >= 50:
-            color = "#FFFF00"  # Yellow
-        else:
-            color = "#FF0000"  # Red
-            
-        years_left = target["Target Year"] - datetime.now().year
-        
-        st.markdown(f"""
-        <div style="background-color: #000080; border: 3px solid #FFFFFF; padding: 15px; 
-                   box-shadow: 5px 5px 0px #000000; margin-bottom: 15px;">
-            <div style="display: flex; justify-content: space-between; align-items: center;">
-                <p style="font-family: 'Press Start 2P', cursive; font-size: 1em; color: #FFFF00;">
-                    {target["Target Name"]}
-                </p>
-                <p style="background-color: {
-                    "#FF0000" if target["Priority"] == "High" else 
-                    "#FFFF00" if target["Priority"] == "Medium" else "#00FF00"
-                }; padding: 5px 10px; font-family: 'VT323', monospace; font-size: 16px;">
-                    {target["Priority"]}
-                </p>
-            </div>
-            
-            <p style="margin-top: 10px;">CATEGORY: {target["Category"]}</p>
-            <p>REGULATION: {target["Regulation"]}</p>
-            <p>TARGET YEAR: {target["Target Year"]} ({years_left} years left)</p>
-            
-            <div style="display: flex; margin-top: 15px; margin-bottom: 10px;">
-                <p style="width: 50%; text-align: left;">CURRENT: {current_value}%</p>
-                <p style="width: 50%; text-align: right;">TARGET: {target_value}%</p>
-            </div>
-            
-            {retro_progress_bar(progress, "PROGRESS", color)}
-            
-            <div style="display: flex; justify-content: flex-end; margin-top: 10px;">
-                <div style="background-color: #0000AA; border: 2px solid #FFFFFF; padding: 5px 10px; 
-                           font-family: 'Press Start 2P', cursive; font-size: 0.8em; cursor: pointer;">
-                    UPDATE QUEST
-                </div>
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+    quest_list(filtered_df, (category_filter, priority_filter))
     
     # Summary chart
     st.markdown("""
@@ -945,57 +819,7 @@ elif current_section == "Target Tracking":
     categories = ["Environmental", "Social", "Governance"]
     progress_values = [env_progress, social_progress, gov_progress]
     
-    fig = go.Figure()
-    
-    # Add bars
-    fig.add_trace(go.Bar(
-        x=categories,
-        y=progress_values,
-        text=[f"{val:.1f}%" for val in progress_values],
-        textposition='auto',
-        marker=dict(
-            color=['#00FF00', '#FFFF00', '#FF0000'],
-            line=dict(color='#FFFFFF', width=2)
-        )
-    ))
-    
-    # Add a horizontal line at 100%
-    fig.add_shape(
-        type="line",
-        x0=-0.5,
-        y0=100,
-        x1=2.5,
-        y1=100,
-        line=dict(
-            color="#FFFFFF",
-            width=2,
-            dash="dash",
-        )
-    )
-    
-    fig.update_layout(
-        xaxis=dict(
-            title="ESG Categories",
-            title_font=dict(family="Press Start 2P", size=12),
-            tickfont=dict(family="VT323", size=14),
-            tickmode='array',
-            tickvals=[0, 1, 2],
-            ticktext=categories
-        ),
-        yaxis=dict(
-            title="Progress (%)",
-            title_font=dict(family="Press Start 2P", size=12),
-            tickfont=dict(family="VT323", size=14),
-            range=[0, 110]
-        ),
-        paper_bgcolor="#000080",
-        plot_bgcolor="#000080",
-        font=dict(
-            family="VT323",
-            size=16,
-            color="white"
-        )
-    )
+    fig = cached_figure("quest_progress", progress_values, quest_progress, categories=categories)
     
     st.plotly_chart(fig, use_container_width=True)
     
@@ -1024,18 +848,24 @@ elif current_section == "Retrofit Simulator":
     </div>
     """, unsafe_allow_html=True)
     
+    # Celebrate a plan implemented on the previous run, now that the new metrics are shown
+    if "plan_implemented" in st.session_state:
+        st.toast(f"Retrofit plan implemented for {st.session_state.pop('plan_implemented')}! +300 points", icon="🏆")
+        st.balloons()
+    
     # Property selector
     df = st.session_state.properties_df
-    property_options = df["Property Name"].tolist()
+    property_index = st.session_state.property_index
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
-        selected_property = st.selectbox("SELECT PROPERTY FOR RETROFIT", property_options)
+        selected_property_id = select_property("SELECT PROPERTY FOR RETROFIT", "retrofit_property")
     with col2:
         budget = st.number_input("BUDGET (€)", min_value=10000, max_value=1000000, value=100000, step=10000)
     
-    property_data = df[df["Property Name"] == selected_property].iloc[0]
+    property_data = property_index.get(selected_property_id)
+    selected_property = property_data["Property Name"]
     property_size = property_data["Size (sqm)"]
     
     # Display property current stats
@@ -1074,83 +904,38 @@ elif current_section == "Retrofit Simulator":
     <h3 style="font-size: 1.2em; margin-top: 20px; margin-bottom: 15px;">AVAILABLE UPGRADES</h3>
     """, unsafe_allow_html=True)
     
-    # Retrofit data
-    retrofit_df = st.session_state.retrofit_df
+    # Retrofit data (copied, since the catalog is shared with other sessions)
+    retrofit_df = st.session_state.retrofit_df.copy()
     
     # Calculate total cost for each retrofit based on property size
     retrofit_df["Total Cost (€)"] = retrofit_df["Cost (€/sqm)"] * property_size
     retrofit_df["Affordable"] = retrofit_df["Total Cost (€)"] <= budget
     
-    # Create columns for the retrofit options
-    cols = st.columns(3)
-    
     # Track selected retrofits
     if "selected_retrofits" not in st.session_state:
         st.session_state.selected_retrofits = []
     
-    # Display retrofit cards
-    for i, (_, retrofit) in enumerate(retrofit_df.iterrows()):
-        col = cols[i % 3]
-        
-        # Calculate retrofit ID
-        retrofit_id = f"retrofit_{i}"
-        
-        # Check if this retrofit is already selected
-        is_selected = retrofit_id in st.session_state.selected_retrofits
-        
-        # Calculate affordability
-        can_afford = retrofit["Affordable"]
-        remaining_budget = budget - sum([retrofit_df.iloc[int(r.split('_')[1])]["Total Cost (€)"] 
-                                        for r in st.session_state.selected_retrofits if r != retrofit_id])
-        
-        with col:
-            border_color = "#00FF00" if is_selected else ("#FFFFFF" if can_afford else "#FF0000")
-            bg_color = "#004400" if is_selected else "#000080"
-            
-            st.markdown(f"""
-            <div style="background-color: {bg_color}; border: 3px solid {border_color}; 
-                      padding: 15px; margin-bottom: 15px; cursor: pointer;"
-                 onclick="this.style.backgroundColor='{
-                     '#000080' if is_selected else '#004400'
-                 }'; this.style.borderColor='{
-                     '#FFFFFF' if is_selected else '#00FF00'
-                 }';">
-                <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; 
-                         color: {'#00FF00' if is_selected else '#FFFF00'}; margin-bottom: 10px;">
-                    {retrofit["Retrofit"]}
-                </p>
-                <p>CATEGORY: {retrofit["Category"]}</p>
-                <p>COST: €{int(retrofit["Total Cost (€)"]):,}</p>
-                <p>ROI: {retrofit["ROI (Years)"]} years</p>
-                <p>CARBON REDUCTION: {retrofit["Carbon Reduction (%)"]}%</p>
-                <p>ENERGY SAVING: {retrofit["Energy Saving (%)"]}%</p>
-                <p>TIME: {retrofit["Implementation Time (Months)"]} months</p>
-                <p>COMPLEXITY: {retrofit["Complexity"]}</p>
-                
-                <div style="margin-top: 15px; text-align: center;">
-                    <div style="display: inline-block; background-color: {
-                        '#FF0000' if is_selected else '#00FF00'
-                    }; border: 2px solid #FFFFFF; padding: 5px 10px; 
-                             font-family: 'Press Start 2P', cursive; font-size: 0.7em;">
-                        {
-                            "REMOVE" if is_selected else 
-                            ("SELECT" if can_afford else "INSUFFICIENT FUNDS")
-                        }
-                    </div>
-                </div>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Add button for selection (this will actually work, unlike the div click)
-            button_label = "REMOVE" if is_selected else ("SELECT" if can_afford else "INSUFFICIENT FUNDS")
-            button_disabled = not can_afford and not is_selected
-            
-            if st.button(button_label, key=f"btn_{retrofit_id}", disabled=button_disabled):
-                if is_selected:
-                    st.session_state.selected_retrofits.remove(retrofit_id)
-                else:
-                    st.session_state.selected_retrofits.append(retrofit_id)
-                st.rerun()
+    # Optimize mode: pick the best package within budget automatically
+    opt_col1, opt_col2 = st.columns([2, 1])
+    with opt_col1:
+        objective = st.selectbox(
+            "OPTIMIZE FOR",
+            list(RETROFIT_OBJECTIVES.keys()),
+            format_func=lambda key: RETROFIT_OBJECTIVES[key].upper()
+        )
+    with opt_col2:
+        st.markdown("<div style='height: 28px'></div>", unsafe_allow_html=True)
+        if st.button("OPTIMIZE"):
+            best_package = cached_optimize_retrofits(
+                st.session_state.retrofit_df, property_data, budget, objective
+            )
+            st.session_state.selected_retrofits = [f"retrofit_{i}" for i in best_package]
+            st.session_state.game_score += 50
+            st.session_state.level = (st.session_state.game_score // 1000) + 1
+            st.toast(f"Optimal package found: {len(best_package)} upgrades! +50 points", icon="🏆")
+            st.rerun()
+    
+    retrofit_grid(retrofit_df)
     
     # Calculate impact of selected retrofits
     selected_retrofits_data = [retrofit_df.iloc[int(r.split('_')[1])] for r in st.session_state.selected_retrofits]
@@ -1160,13 +945,11 @@ elif current_section == "Retrofit Simulator":
     total_energy_saving = min(100, sum([r["Energy Saving (%)"] for r in selected_retrofits_data]))
     
     # Calculate new property metrics after retrofits
-    new_carbon = max(0, property_data["Carbon Footprint (kgCO2e/sqm/yr)"] * (1 - total_carbon_reduction/100))
-    new_energy_score = min(100, property_data["Energy Score"] + (total_energy_saving/2))
-    
-    # Estimate impact on overall ESG score
-    env_improvement = (total_carbon_reduction + total_energy_saving) / 4  # Converting to ESG score impact
-    new_env_score = min(100, property_data["Environmental Score"] + env_improvement)
-    new_overall_score = min(100, property_data["Overall ESG Score"] + (env_improvement * 0.5))  # Environmental is 50% of overall
+    projection = project_retrofit(property_data, total_carbon_reduction, total_energy_saving)
+    new_carbon = float(projection["Carbon Footprint (kgCO2e/sqm/yr)"])
+    new_energy_score = float(projection["Energy Score"])
+    new_env_score = float(projection["Environmental Score"])
+    new_overall_score = float(projection["Overall ESG Score"])
     
     # Display retrofit plan summary
     st.markdown(f"""
@@ -1259,6 +1042,65 @@ elif current_section == "Retrofit Simulator":
     </div>
     """, unsafe_allow_html=True)
     
+    # Uncertainty bands for the selected package
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        monte_carlo_mode = st.checkbox("MONTE CARLO MODE (100,000 SCENARIOS)")
+    with col2:
+        monte_carlo_seed = st.number_input("SCENARIO SEED", min_value=0, value=42, step=1)
+    
+    if monte_carlo_mode and len(selected_retrofits_data) > 0:
+        selected_positions = [int(r.split('_')[1]) for r in st.session_state.selected_retrofits]
+        bands = cached_simulate_retrofit_outcomes(
+            retrofit_df.iloc[selected_positions], property_data, int(monte_carlo_seed)
+        )
+        
+        band_cells = "".join(f"""
+            <div style="width: 25%; padding: 10px;">
+                <p style="font-family: 'Press Start 2P', cursive; font-size: 0.8em; color: #FFFF00;">{metric.upper()}</p>
+                <p>P10: {bands.at["P10", metric]:,.1f}</p>
+                <p>P50: {bands.at["P50", metric]:,.1f}</p>
+                <p>P90: {bands.at["P90", metric]:,.1f}</p>
+            </div>
+        """ for metric in bands.columns)
+        
+        st.markdown(f"""
+        <div style="background-color: #000080; border: 3px solid #FFFFFF; padding: 20px; 
+                   box-shadow: 5px 5px 0px #000000; margin-bottom: 20px;">
+            <h3 style="font-size: 1em; margin-bottom: 15px;">PROJECTED RANGE AFTER RETROFIT</h3>
+            <div style="display: flex; flex-wrap: wrap;">{band_cells}</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    # Cost-vs-impact trade-offs for this property
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">PARETO FRONTIER</h3>
+    """, unsafe_allow_html=True)
+    
+    frontier = cached_pareto_packages(st.session_state.retrofit_df, property_size, budget)
+    
+    fig = cached_figure("pareto_frontier", frontier.drop(columns="Retrofits"), pareto_frontier)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        frontier_choice = st.selectbox(
+            "FRONTIER PACKAGE",
+            frontier.index.tolist(),
+            format_func=lambda i: (
+                f"€{int(frontier.at[i, 'Total Cost (€)']):,} | "
+                f"CO2 -{frontier.at[i, 'Carbon Reduction (%)']:.0f}% | "
+                f"ENERGY +{frontier.at[i, 'Energy Saving (%)']:.0f}% | "
+                f"{frontier.at[i, 'Implementation Time (Months)']:.0f} MONTHS | "
+                f"{frontier.at[i, 'Package']}"
+            )
+        )
+    with col2:
+        st.markdown("<div style='height: 28px'></div>", unsafe_allow_html=True)
+        if st.button("APPLY PACKAGE"):
+            st.session_state.selected_retrofits = [f"retrofit_{i}" for i in frontier.at[frontier_choice, "Retrofits"]]
+            st.rerun()
+    
     # Action buttons
     col1, col2 = st.columns(2)
     with col1:
@@ -1271,13 +1113,133 @@ elif current_section == "Retrofit Simulator":
     with col2:
         if st.button("IMPLEMENT RETROFIT PLAN"):
             if len(selected_retrofits_data) > 0:
+                update_portfolio({selected_property_id: {
+                    "Carbon Footprint (kgCO2e/sqm/yr)": new_carbon,
+                    "Energy Score": new_energy_score,
+                }})
+                st.session_state.selected_retrofits = []
                 st.session_state.game_score += 300
                 st.session_state.level = (st.session_state.game_score // 1000) + 1
-                st.toast(f"Retrofit plan implemented! +300 points", icon="🏆")
-                st.balloons()
+                st.session_state.plan_implemented = selected_property
+                st.rerun()
             else:
                 st.warning("Please select at least one retrofit option first!")
 
+    # Portfolio-wide capital allocation
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">PORTFOLIO CAPEX ALLOCATION</h3>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns([1, 1, 1])
+    with col1:
+        fund_budget = st.number_input("FUND BUDGET (€)", min_value=100000, value=10000000, step=100000)
+    with col2:
+        fund_objective = st.selectbox(
+            "ALLOCATE FOR",
+            list(PORTFOLIO_OBJECTIVES.keys()),
+            format_func=lambda key: PORTFOLIO_OBJECTIVES[key].upper()
+        )
+    with col3:
+        st.markdown("<div style='height: 28px'></div>", unsafe_allow_html=True)
+        if st.button("ALLOCATE FUND"):
+            st.session_state.portfolio_allocation = cached_allocate_portfolio_budget(
+                df, portfolio_version, st.session_state.retrofit_df, fund_budget, fund_objective
+            )
+            st.session_state.game_score += 250
+            st.session_state.level = (st.session_state.game_score // 1000) + 1
+            st.toast("Fund allocated across the portfolio! +250 points", icon="🏆")
+    
+    if "portfolio_allocation" in st.session_state:
+        allocation, allocation_summary = st.session_state.portfolio_allocation
+        st.markdown(f"""
+        <div style="background-color: #000080; border: 3px solid #FFFFFF; padding: 20px; 
+                   box-shadow: 5px 5px 0px #000000; margin-top: 15px; margin-bottom: 20px;">
+            <div style="display: flex; flex-wrap: wrap;">
+                <div style="width: 33%; padding: 10px;">
+                    <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; color: #FFFF00;">
+                        {allocation_summary["objective"].upper()}
+                    </p>
+                    <p style="font-size: 1.5em;">{allocation_summary["value"]:,.2f}</p>
+                </div>
+                <div style="width: 33%; padding: 10px;">
+                    <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; color: #FFFF00;">
+                        UPGRADES FUNDED
+                    </p>
+                    <p style="font-size: 1.5em;">{allocation_summary["retrofits"]:,} in {allocation_summary["properties"]:,} properties</p>
+                </div>
+                <div style="width: 33%; padding: 10px;">
+                    <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; color: #FFFF00;">
+                        TOTAL COST
+                    </p>
+                    <p style="font-size: 1.5em;">€{int(allocation_summary["total_cost"]):,}</p>
+                </div>
+            </div>
+            <p>UPPER BOUND: {allocation_summary["upper_bound"]:,.2f} 
+               (OPTIMALITY GAP ≤ {allocation_summary["gap_pct"]:.2f}%)</p>
+        </div>
+        """, unsafe_allow_html=True)
+        st.dataframe(allocation.head(100), use_container_width=True)
+
+    # Multi-year phasing of the retrofit plan
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">MULTI-YEAR SCHEDULE</h3>
+    """, unsafe_allow_html=True)
+    
+    schedule_scopes = ["SELECTED PROPERTY PLAN"]
+    if "portfolio_allocation" in st.session_state:
+        schedule_scopes.append("FUND ALLOCATION")
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        schedule_scope = st.selectbox("SCHEDULE", schedule_scopes)
+    with col2:
+        annual_budget = st.number_input("ANNUAL BUDGET (€)", min_value=10000, value=2000000, step=100000)
+    with col3:
+        crews = st.number_input("CREWS", min_value=1, value=3, step=1)
+    with col4:
+        schedule_priority = st.selectbox(
+            "PRIORITIZE BY",
+            list(SCHEDULE_PRIORITIES.keys()),
+            format_func=lambda key: SCHEDULE_PRIORITIES[key].upper()
+        )
+    
+    if schedule_scope == "FUND ALLOCATION":
+        jobs_df = st.session_state.portfolio_allocation[0][["Property ID", "Retrofit"]]
+    else:
+        jobs_df = pd.DataFrame({
+            "Property ID": [property_data["Property ID"]] * len(selected_retrofits_data),
+            "Retrofit": [retrofit["Retrofit"] for retrofit in selected_retrofits_data]
+        })
+    
+    if len(jobs_df) == 0:
+        st.info("Select retrofits or allocate the fund to build a schedule.")
+    else:
+        schedule, trajectory = cached_schedule_retrofits(
+            jobs_df, df, portfolio_version, st.session_state.retrofit_df, annual_budget, int(crews), schedule_priority
+        )
+        scheduled = schedule.dropna(subset=["Start"])
+        unscheduled = schedule["Start"].isna()
+        over_budget = int((unscheduled & (schedule["Total Cost (€)"] > annual_budget)).sum())
+        past_horizon = int(unscheduled.sum()) - over_budget
+        if over_budget:
+            st.warning(f"{over_budget:,} retrofit(s) cost more than the annual budget and were never scheduled.")
+        if past_horizon:
+            st.warning(f"{past_horizon:,} retrofit(s) were still waiting after {MAX_QUARTERS // 4} years "
+                       f"({MAX_QUARTERS} quarters); raise the budget or add crews to fit them in.")
+        
+        if len(scheduled):
+            # A Gantt bar per retrofit is only readable for modest plans
+            fig = cached_figure("retrofit_timeline", scheduled.head(200), retrofit_timeline)
+            st.plotly_chart(fig, use_container_width=True)
+            
+            fig = cached_figure("spend_trajectory", trajectory, spend_trajectory)
+            st.plotly_chart(fig, use_container_width=True)
+            
+            st.dataframe(
+                scheduled[["Property ID", "Property Name", "Retrofit", "Start Quarter", "Quarters", "Total Cost (€)"]].head(100),
+                use_container_width=True
+            )
+
 elif current_section == "ESG Reports":
     st.markdown("""
     <div class="pixel-card">
@@ -1308,20 +1270,40 @@ elif current_section == "ESG Reports":
     # Example report metrics
     # This would dynamically pull data from the property portfolio in a real application
     
-    # Get portfolio-level statistics
+    # Get portfolio-level statistics from the aggregate cube rather than the property rows
     df = st.session_state.properties_df
-    avg_energy_score = df["Energy Score"].mean()
-    avg_carbon = df["Carbon Footprint (kgCO2e/sqm/yr)"].mean()
-    avg_water = df["Water Usage (L/sqm/yr)"].mean()
-    avg_recycling = df["Waste Recycling (%)"].mean()
+    aggregates = st.session_state.aggregates
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        report_type_scope = st.selectbox("PROPERTY TYPE", ["All Types"] + aggregates.values("Type"))
+    with col2:
+        report_location_scope = st.selectbox("LOCATION", ["All Locations"] + aggregates.values("Location"))
+    
+    report_scope = {}
+    if report_type_scope != "All Types":
+        report_scope["Type"] = report_type_scope
+    if report_location_scope != "All Locations":
+        report_scope["Location"] = report_location_scope
     
-    certified_buildings = df[df["Certification"] != "None"].shape[0]
-    certification_percentage = (certified_buildings / df.shape[0]) * 100
+    if report_scope and aggregates.count(report_scope) == 0:
+        st.warning("No properties match this scope; showing the whole portfolio.")
+        report_scope = {}
     
-    avg_env_score = df["Environmental Score"].mean()
-    avg_social_score = df["Social Score"].mean()
-    avg_gov_score = df["Governance Score"].mean()
-    avg_overall_score = df["Overall ESG Score"].mean()
+    report_means = aggregates.summary(report_scope)["Mean"]
+    avg_energy_score = report_means["Energy Score"]
+    avg_carbon = report_means["Carbon Footprint (kgCO2e/sqm/yr)"]
+    avg_water = report_means["Water Usage (L/sqm/yr)"]
+    avg_recycling = report_means["Waste Recycling (%)"]
+    
+    properties_assessed = aggregates.count(report_scope)
+    certified_buildings = aggregates.count(report_scope, exclude={"Certification": "None"})
+    certification_percentage = (certified_buildings / properties_assessed) * 100 if properties_assessed else 0.0
+    
+    avg_env_score = report_means["Environmental Score"]
+    avg_social_score = report_means["Social Score"]
+    avg_gov_score = report_means["Governance Score"]
+    avg_overall_score = report_means["Overall ESG Score"]
     
     # Display report overview
     st.markdown(f"""
@@ -1354,7 +1336,7 @@ elif current_section == "ESG Reports":
         <div style="display: flex; flex-wrap: wrap;">
             <div style="width: 33%; padding: 10px;">
                 <p>PROPERTIES ASSESSED</p>
-                <p style="font-size: 1.5em; color: #00FFFF;">{df.shape[0]}</p>
+                <p style="font-size: 1.5em; color: #00FFFF;">{properties_assessed:,}</p>
             </div>
             
             <div style="width: 33%; padding: 10px;">
@@ -1414,41 +1396,24 @@ elif current_section == "ESG Reports":
     <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">REPORT VISUALIZATION</h3>
     """, unsafe_allow_html=True)
     
+    # Demo framework scores are drawn once per session so the charts stay put (and cached) between reruns
+    demo_values = st.session_state.setdefault("report_demo_values", {})
+    
     # Create chart based on report type
     if selected_report == "GRESB":
         # Create a bubble chart for property comparison
-        fig = px.scatter(
-            df,
-            x="Environmental Score",
-            y="Social Score",
-            size="Size (sqm)",
-            color="Type",
-            hover_name="Property Name",
-            size_max=50,
-            color_discrete_sequence=["#00FF00", "#FFFF00", "#FF0000", "#00FFFF", "#FF00FF"]
-        )
-        
-        fig.update_layout(
-            title=dict(
-                text="Property ESG Performance Matrix",
-                font=dict(family="Press Start 2P", size=16)
-            ),
-            paper_bgcolor="#000080",
-            plot_bgcolor="#000080",
-            font=dict(family="VT323", size=16, color="white"),
-            xaxis=dict(
-                title="Environmental Score",
-                title_font=dict(family="Press Start 2P", size=12),
-                gridcolor="#333333"
-            ),
-            yaxis=dict(
-                title="Social Score",
-                title_font=dict(family="Press Start 2P", size=12),
-                gridcolor="#333333"
+        # Large portfolios are sampled or binned before the figure is built; the cache is keyed on the
+        # portfolio version, so a hit neither hashes nor reduces the whole portfolio
+        gresb_mode = "sample"
+        if len(df) > MAX_SCATTER_POINTS:
+            gresb_mode = st.radio(
+                "LARGE PORTFOLIO VIEW",
+                list(GRESB_MODES.keys()),
+                format_func=lambda mode: GRESB_MODES[mode].upper(),
+                horizontal=True
             )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        fig = cached_figure("gresb_matrix", lambda: gresb_data(df, gresb_mode), gresb_matrix,
+                            data_key=(portfolio_version, gresb_mode), total=len(df))
         
     elif selected_report == "SFDR":
         # Principal Adverse Impact indicators visualization
@@ -1456,158 +1421,179 @@ elif current_section == "ESG Reports":
                      "Social Issues", "Governance"]
         
         # Random values for demo
-        values = [random.randint(30, 90) for _ in range(len(categories))]
+        if "SFDR" not in demo_values:
+            demo_values["SFDR"] = [random.randint(30, 90) for _ in range(len(categories))]
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=values,
-            marker=dict(
-                color=["#FF0000", "#FFFF00", "#00FFFF", "#00FF00", "#FF00FF", "#0000FF"],
-                line=dict(color="#FFFFFF", width=2)
-            )
-        ))
-        
-        fig.update_layout(
-            title=dict(
-                text="Principal Adverse Impact Indicators",
-                font=dict(family="Press Start 2P", size=16)
-            ),
-            paper_bgcolor="#000080",
-            plot_bgcolor="#000080",
-            font=dict(family="VT323", size=16, color="white"),
-            xaxis=dict(
-                title="Categories",
-                title_font=dict(family="Press Start 2P", size=12),
-                tickfont=dict(family="VT323", size=14)
-            ),
-            yaxis=dict(
-                title="Mitigation Score",
-                title_font=dict(family="Press Start 2P", size=12),
-                tickfont=dict(family="VT323", size=14),
-                gridcolor="#333333"
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        fig = cached_figure("sfdr_impacts", demo_values["SFDR"], sfdr_impacts, categories=categories)
         
     elif selected_report == "GRI":
         # Create a stacked bar chart for GRI disclosures compliance
         categories = ["Economic", "Environmental", "Social", "Governance"]
-        full_compliance = [random.randint(40, 90) for _ in range(len(categories))]
-        partial_compliance = [random.randint(0, 100-v) for v in full_compliance]
-        non_compliance = [100 - (full + partial) for full, partial in zip(full_compliance, partial_compliance)]
-        
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=full_compliance,
-            name="Full Compliance",
-            marker=dict(color="#00FF00", line=dict(color="#FFFFFF", width=1))
-        ))
-        
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=partial_compliance,
-            name="Partial Compliance",
-            marker=dict(color="#FFFF00", line=dict(color="#FFFFFF", width=1))
-        ))
-        
-        fig.add_trace(go.Bar(
-            x=categories,
-            y=non_compliance,
-            name="Non-Compliance",
-            marker=dict(color="#FF0000", line=dict(color="#FFFFFF", width=1))
-        ))
-        
-        fig.update_layout(
-            barmode="stack",
-            title=dict(
-                text="GRI Disclosures Compliance",
-                font=dict(family="Press Start 2P", size=16)
-            ),
-            paper_bgcolor="#000080",
-            plot_bgcolor="#000080",
-            font=dict(family="VT323", size=16, color="white"),
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.02,
-                xanchor="center",
-                x=0.5,
-                font=dict(family="VT323", size=14)
-            ),
-            xaxis=dict(
-                title="Categories",
-                title_font=dict(family="Press Start 2P", size=12),
-                tickfont=dict(family="VT323", size=14)
-            ),
-            yaxis=dict(
-                title="Percentage",
-                title_font=dict(family="Press Start 2P", size=12),
-                tickfont=dict(family="VT323", size=14),
-                gridcolor="#333333"
-            )
-        )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        if "GRI" not in demo_values:
+            full_compliance = [random.randint(40, 90) for _ in range(len(categories))]
+            partial_compliance = [random.randint(0, 100-v) for v in full_compliance]
+            non_compliance = [100 - (full + partial) for full, partial in zip(full_compliance, partial_compliance)]
+            demo_values["GRI"] = {
+                "Full Compliance": full_compliance,
+                "Partial Compliance": partial_compliance,
+                "Non-Compliance": non_compliance
+            }
+        
+        fig = cached_figure("gri_compliance", demo_values["GRI"], gri_compliance, categories=categories)
         
     elif selected_report == "TCFD":
         # Create a radar chart for TCFD compliance across dimensions
         categories = ["Governance", "Strategy", "Risk Management", "Metrics & Targets"]
         
         # Random values for demo
-        values = [random.randint(50, 95) for _ in range(len(categories))]
+        if "TCFD" not in demo_values:
+            demo_values["TCFD"] = [random.randint(50, 95) for _ in range(len(categories))]
         
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatterpolar(
-            r=values,
-            theta=categories,
-            fill='toself',
-            name='Current Compliance',
-            line=dict(color="#00FFFF"),
-            fillcolor="rgba(0, 255, 255, 0.2)"
-        ))
-        
-        fig.add_trace(go.Scatterpolar(
-            r=[100, 100, 100, 100],
-            theta=categories,
-            fill='toself',
-            name='Target',
-            line=dict(color="#FF00FF", dash="dash"),
-            fillcolor="rgba(255, 0, 255, 0.1)"
-        ))
-        
-        fig.update_layout(
-            polar=dict(
-                radialaxis=dict(
-                    visible=True,
-                    range=[0, 100]
-                )
-            ),
-            title=dict(
-                text="TCFD Compliance by Dimension",
-                font=dict(family="Press Start 2P", size=16)
-            ),
-            showlegend=True,
-            legend=dict(
-                orientation="h",
-                yanchor="bottom",
-                y=1.1,
-                xanchor="center",
-                x=0.5,
-                font=dict(family="VT323", size=14)
-            ),
-            paper_bgcolor="#000080",
-            plot_bgcolor="#000080",
-            font=dict(family="VT323", size=16, color="white")
+        fig = cached_figure("tcfd_radar", demo_values["TCFD"], tcfd_radar, categories=categories)
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Weighting scenarios: the whole portfolio re-scored under alternative ESG weights
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">WEIGHTING SCENARIOS</h3>
+    """, unsafe_allow_html=True)
+    
+    selected_scenarios = st.multiselect(
+        "COMPARE POLICIES",
+        [name for name in SCENARIO_PRESETS if name != "Current"],
+        default=[name for name in SCENARIO_PRESETS if name != "Current"]
+    )
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        custom_environmental = st.slider("CUSTOM ENVIRONMENTAL WEIGHT", 0.0, 1.0, 0.5, 0.05)
+    with col2:
+        # Rounded so float error cannot leave a sliver of weight, or a slider with equal bounds
+        remaining_weight = round(1.0 - custom_environmental, 2)
+        if remaining_weight > 0:
+            custom_social = st.slider("CUSTOM SOCIAL WEIGHT", 0.0, remaining_weight,
+                                      min(0.3, remaining_weight), 0.05)
+        else:
+            custom_social = 0.0
+            st.slider("CUSTOM SOCIAL WEIGHT", 0.0, 1.0, 0.0, 0.05, disabled=True)
+    with col3:
+        custom_governance = round(1.0 - custom_environmental - custom_social, 2)
+        st.markdown(f"""
+        <div style="background-color: #000080; border: 2px solid #FFFFFF; padding: 10px; text-align: center;">
+            <p style="font-family: 'VT323', monospace;">CUSTOM GOVERNANCE WEIGHT</p>
+            <p style="font-size: 1.5em; color: #00FFFF;">{custom_governance:.2f}</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    scenarios = {name: SCENARIO_PRESETS[name] for name in ["Current"] + selected_scenarios}
+    scenarios["Custom"] = {
+        "environmental": custom_environmental,
+        "social": custom_social,
+        "governance": custom_governance
+    }
+    if len(df) == 0:
+        st.info("There are no properties to score under the weighting scenarios.")
+    else:
+        scenario_summary, scenario_ranks = cached_evaluate_scenarios(df, portfolio_version, scenarios)
+    
+        fig = cached_figure("scenario_distribution", scenario_summary[["P10", "P50", "P90"]], scenario_distribution,
+                            thresholds=SCORE_THRESHOLDS)
+        st.plotly_chart(fig, use_container_width=True)
+    
+        threshold_columns = [
+            f"{prefix}{threshold}" for threshold in SCORE_THRESHOLDS
+            for prefix in ("≥", "Crossed Up ", "Crossed Down ")
+        ]
+        st.dataframe(
+            scenario_summary[["Mean", "P50", "Mean Rank Change", "Max Rank Change", "Rank Correlation"] + threshold_columns].round(3),
+            use_container_width=True
+        )
+    
+        # Properties whose standing depends most on the chosen policy
+        volatile = scenario_ranks.nlargest(10, "Max Rank Change")
+        volatile = df.loc[volatile.index, ["Property ID", "Property Name"]].join(volatile)
+        st.markdown("""
+        <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; color: #FFFF00; margin-top: 15px;">
+            MOST POLICY-SENSITIVE PROPERTIES
+        </p>
+        """, unsafe_allow_html=True)
+        st.dataframe(volatile, use_container_width=True, hide_index=True)
+    
+    # Rank stability: how far each property moves when the weights are nudged
+    st.markdown("""
+    <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">RANK STABILITY</h3>
+    """, unsafe_allow_html=True)
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        sampling_method = st.selectbox(
+            "SAMPLING",
+            list(SAMPLING_METHODS.keys()),
+            format_func=lambda key: SAMPLING_METHODS[key].upper()
+        )
+    with col2:
+        sensitivity_samples = st.slider("WEIGHT SAMPLES", 16, 256, DEFAULT_SAMPLES, 16)
+        weight_sets = sample_count(sampling_method, sensitivity_samples)
+        st.caption(f"{weight_sets} WEIGHT SETS, BASE INCLUDED")
+    with col3:
+        sensitivity_spread = st.slider("WEIGHT SPREAD", 0.05, 1.0, DEFAULT_SPREAD, 0.05)
+    
+    # Scoring the portfolio under every weight set is slow, so it only runs on request
+    sensitivity_key = (portfolio_version, sampling_method, sensitivity_samples, sensitivity_spread)
+    if st.button("RUN ANALYSIS"):
+        st.session_state.rank_sensitivity = (sensitivity_key, cached_rank_sensitivity(df, *sensitivity_key))
+    
+    last_run = st.session_state.get("rank_sensitivity")
+    if last_run is None:
+        st.info(f"Press RUN ANALYSIS to rank the portfolio under {weight_sets} weight sets.")
+    elif last_run[0] != sensitivity_key:
+        st.info("The portfolio or the settings changed since the last run; press RUN ANALYSIS to update it.")
+    else:
+        sensitivity = last_run[1]
+        always_top = int((sensitivity["Top Quartile (%)"] == 100).sum())
+        always_bottom = int((sensitivity["Bottom Quartile (%)"] == 100).sum())
+    
+        st.markdown(f"""
+        <div style="background-color: #000080; border: 3px solid #FFFFFF; padding: 20px; 
+                   box-shadow: 5px 5px 0px #000000; margin-bottom: 20px;">
+            <div style="display: flex; flex-wrap: wrap;">
+                <div style="width: 25%; padding: 10px;">
+                    <p>WEIGHT SETS</p>
+                    <p style="font-size: 1.5em; color: #00FFFF;">{sensitivity.attrs["samples"]}</p>
+                </div>
+                <div style="width: 25%; padding: 10px;">
+                    <p>MEDIAN RANK RANGE</p>
+                    <p style="font-size: 1.5em; color: #00FFFF;">{sensitivity["Rank Range"].median():,.0f}</p>
+                </div>
+                <div style="width: 25%; padding: 10px;">
+                    <p>ALWAYS TOP QUARTILE</p>
+                    <p style="font-size: 1.5em; color: #00FF00;">{always_top:,}</p>
+                </div>
+                <div style="width: 25%; padding: 10px;">
+                    <p>ALWAYS BOTTOM QUARTILE</p>
+                    <p style="font-size: 1.5em; color: #FF0000;">{always_bottom:,}</p>
+                </div>
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+        fig = cached_figure(
+            "rank_range_histogram",
+            lambda: sensitivity["Rank Range"],
+            rank_range_histogram,
+            data_key=sensitivity_key
         )
-        
         st.plotly_chart(fig, use_container_width=True)
     
+        unstable = sensitivity.nlargest(10, "Rank Range")
+        unstable = df.loc[unstable.index, ["Property ID", "Property Name"]].join(unstable)
+        st.markdown("""
+        <p style="font-family: 'Press Start 2P', cursive; font-size: 0.9em; color: #FFFF00; margin-top: 15px;">
+            LEAST STABLE RANKINGS
+        </p>
+        """, unsafe_allow_html=True)
+        st.dataframe(unstable.round(1), use_container_width=True, hide_index=True)
+    
     # Report export options
     st.markdown("""
     <h3 style="font-size: 1.2em; margin-top: 30px; margin-bottom: 15px;">EXPORT OPTIONS</h3>
@@ -1622,10 +1608,12 @@ elif current_section == "ESG Reports":
             st.toast("PDF report generated! +100 points", icon="🏆")
     
     with col2:
-        if st.button("GENERATE EXCEL"):
-            st.session_state.game_score += 100
-            st.session_state.level = (st.session_state.game_score // 1000) + 1
-            st.toast("Excel report generated! +100 points", icon="🏆")
+        # Streams the report scope's properties, the framework metrics and the targets to a file
+        export_job = st.session_state.get("export_job")
+        polling = export_job is not None and not export_job.done()
+        st.fragment(export_panel, run_every=EXPORT_POLL_SECONDS if polling else None)(
+            df, st.session_state.targets_df, framework_metrics(aggregates, report_scope), report_scope, polling
+        )
     
     with col3:
         if st.button("SHARE REPORT"):
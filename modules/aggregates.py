@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+
+DIMENSIONS = ["Type", "Location", "Certification"]
+
+METRICS = [
+    "Energy Score",
+    "Carbon Footprint (kgCO2e/sqm/yr)",
+    "Water Usage (L/sqm/yr)",
+    "Waste Recycling (%)",
+    "Environmental Score",
+    "Social Score",
+    "Governance Score",
+    "Overall ESG Score",
+]
+
+SIZE_COLUMN = "Size (sqm)"
+
+STATISTICS = ["Mean", "Size-Weighted Mean", "Min", "Max", "Sum"]
+
+
+class AggregateCube:
+    """Per-cell aggregates of the portfolio over Type × Location × Certification.
+
+    Each cell holds the property count, total floor area and, per metric,
+    the sum, the floor-area-weighted sum, the minimum and the maximum, all
+    computed in one grouped pass. Any slice is then summarised from the
+    matching cells only, so its cost depends on the number of cells rather
+    than the number of properties.
+
+    :meth:`update` applies metric changes of a few properties by adjusting
+    only their cells; copy a shared cube with :meth:`copy` first.
+    """
+
+    def __init__(self, df):
+        # Number the cells, with the first dimension varying slowest
+        cell_codes = np.zeros(len(df), dtype=np.int64)
+        labels = []
+        for dimension in DIMENSIONS:
+            codes, uniques = pd.factorize(df[dimension], sort=True)
+            cell_codes = cell_codes * len(uniques) + codes
+            labels.append(np.asarray(uniques, dtype=str))
+        occupied, cells = np.unique(cell_codes, return_inverse=True)
+
+        # Rows sorted by cell, so the minimum and maximum of each cell are one reduceat
+        order = np.argsort(cells, kind="stable")
+        starts = np.searchsorted(cells[order], np.arange(len(occupied)))
+
+        size = df[SIZE_COLUMN].to_numpy(dtype=np.float64)
+        aggregates = {
+            "Count": np.bincount(cells, minlength=len(occupied)),
+            SIZE_COLUMN: np.bincount(cells, weights=size, minlength=len(occupied)),
+        }
+        for metric in METRICS:
+            values = df[metric].to_numpy(dtype=np.float64)
+            aggregates[(metric, "Sum")] = np.bincount(cells, weights=values, minlength=len(occupied))
+            aggregates[(metric, "Weighted Sum")] = np.bincount(cells, weights=values * size, minlength=len(occupied))
+            aggregates[(metric, "Min")] = np.minimum.reduceat(values[order], starts) if len(df) else values
+            aggregates[(metric, "Max")] = np.maximum.reduceat(values[order], starts) if len(df) else values
+
+        index_codes = []
+        for dimension_labels in reversed(labels):
+            occupied, code = np.divmod(occupied, len(dimension_labels))
+            index_codes.append(code)
+        self.index = pd.MultiIndex(levels=labels, codes=index_codes[::-1], names=DIMENSIONS)
+        self.keys = {dimension: self.index.get_level_values(dimension).to_numpy() for dimension in DIMENSIONS}
+        self.data = aggregates
+
+        # Kept so single cells can be re-scanned when an update removes their minimum or maximum
+        self.row_cells = cells
+        self.cell_order = order
+        self.cell_starts = np.append(starts, len(df))
+
+    @property
+    def cells(self):
+        """The cube as a DataFrame with one row per occupied cell."""
+        return pd.DataFrame(self.data, index=self.index)
+
+    def copy(self):
+        cube = AggregateCube.__new__(AggregateCube)
+        cube.__dict__.update(self.__dict__)
+        cube.data = {column: values.copy() for column, values in self.data.items()}
+        return cube
+
+    def update(self, df, positions, previous):
+        """Fold changed metric values of the rows at ``positions`` into their cells.
+
+        ``df`` already holds the new values and ``previous`` maps each changed
+        metric to its old values at ``positions``. Sums are adjusted by the
+        difference; a cell's minimum or maximum is only re-scanned from its
+        rows when the old extreme may have been removed.
+        """
+        positions = np.asarray(positions)
+        cells = self.row_cells[positions]
+        size = df[SIZE_COLUMN].to_numpy()[positions].astype(np.float64)
+
+        for metric, old in previous.items():
+            if metric not in METRICS:
+                continue
+            old = np.asarray(old, dtype=np.float64)
+            values = df[metric].to_numpy()
+            new = values[positions].astype(np.float64)
+
+            np.add.at(self.data[(metric, "Sum")], cells, new - old)
+            np.add.at(self.data[(metric, "Weighted Sum")], cells, (new - old) * size)
+
+            for statistic, extreme in (("Min", np.minimum), ("Max", np.maximum)):
+                column = self.data[(metric, statistic)]
+                # A cell whose extreme value was changed to something less extreme must be re-scanned
+                lost = (old == column[cells]) & (extreme(new, old) != new)
+                extreme.at(column, cells, new)
+                for cell in np.unique(cells[lost]):
+                    rows = self.cell_order[self.cell_starts[cell]:self.cell_starts[cell + 1]]
+                    column[cell] = extreme.reduce(values[rows])
+
+    def __len__(self):
+        return len(self.index)
+
+    def _select(self, filters, exclude=None):
+        selected = np.ones(len(self.index), dtype=bool)
+        for dimension, value in (filters or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            selected &= np.isin(self.keys[dimension], [str(item) for item in values])
+        for dimension, value in (exclude or {}).items():
+            values = value if isinstance(value, (list, tuple, set)) else [value]
+            selected &= ~np.isin(self.keys[dimension], [str(item) for item in values])
+        return selected
+
+    def count(self, filters=None, exclude=None):
+        """Number of properties in the slice.
+
+        ``filters`` maps a dimension to a value or list of values to keep;
+        ``exclude`` maps a dimension to values to leave out.
+        """
+        return int(self.data["Count"][self._select(filters, exclude)].sum())
+
+    def summary(self, filters=None):
+        """Statistics of every metric over the slice selected by ``filters``.
+
+        Returns a DataFrame indexed by metric with the STATISTICS columns
+        (all ``NaN`` for an empty slice).
+        """
+        selected = self._select(filters)
+        count = self.data["Count"][selected].sum()
+        size = self.data[SIZE_COLUMN][selected].sum()
+
+        rows = {}
+        for metric in METRICS:
+            total = self.data[(metric, "Sum")][selected].sum()
+            rows[metric] = {
+                "Mean": total / count if count else np.nan,
+                "Size-Weighted Mean": self.data[(metric, "Weighted Sum")][selected].sum() / size if size else np.nan,
+                "Min": self.data[(metric, "Min")][selected].min() if count else np.nan,
+                "Max": self.data[(metric, "Max")][selected].max() if count else np.nan,
+                "Sum": total,
+            }
+        return pd.DataFrame.from_dict(rows, orient="index", columns=STATISTICS)
+
+    def values(self, dimension):
+        """Distinct values of ``dimension`` present in the portfolio."""
+        return pd.unique(self.keys[dimension]).tolist()
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from modules.calculations import (
+    CARBON_COLUMN,
+    COMMUNITY_COLUMN,
+    COMPLIANCE_COLUMN,
+    ENERGY_COLUMN,
+    RECYCLING_COLUMN,
+    SCORE_COLUMNS,
+    TENANT_COLUMN,
+)
+
+SIZE_COLUMN = "Size (sqm)"
+WATER_COLUMN = "Water Usage (L/sqm/yr)"
+
+# Floor-area bands (sqm) used to keep peers of comparable scale together
+SIZE_BANDS = [0, 5000, 10000, 20000, 35000, np.inf]
+SIZE_BAND_LABELS = ["<5K SQM", "5-10K SQM", "10-20K SQM", "20-35K SQM", "35K+ SQM"]
+
+# Peer groups from the narrowest to the broadest; a property is ranked in the
+# narrowest one that has at least MIN_PEERS members
+PEER_LEVELS = [
+    ["Type", "Location", "Size Band"],
+    ["Type", "Location"],
+    ["Type"],
+]
+MIN_PEERS = 5
+
+# Metrics where a lower value is better; every other benchmarked metric is higher-is-better
+LOWER_IS_BETTER = [CARBON_COLUMN, WATER_COLUMN]
+
+BENCHMARK_METRICS = [
+    ENERGY_COLUMN, CARBON_COLUMN, WATER_COLUMN, RECYCLING_COLUMN,
+    TENANT_COLUMN, COMMUNITY_COLUMN, COMPLIANCE_COLUMN,
+] + SCORE_COLUMNS
+
+
+def size_bands(sizes):
+    return pd.cut(sizes, SIZE_BANDS, labels=SIZE_BAND_LABELS, right=False)
+
+
+def _group_codes(keys):
+    codes = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        key_codes, uniques = pd.factorize(key)
+        codes = codes * len(uniques) + key_codes
+    return codes
+
+
+def _peer_keys(df):
+    return {"Type": df["Type"], "Location": df["Location"], "Size Band": size_bands(df[SIZE_COLUMN])}
+
+
+class PeerGroups:
+    """The peer group of every property at each level of PEER_LEVELS, and the level it is ranked at.
+
+    Groups depend only on Type, Location and size, so they are built once
+    and reused while metrics change. A group's members are listed through a
+    sort by group, so they are found without scanning the portfolio.
+    """
+
+    def __init__(self, df):
+        keys = _peer_keys(df)
+        n = len(df)
+        self.size_bands = keys["Size Band"].to_numpy()
+        self.levels = np.zeros(n, dtype=np.int64)
+        self.peers = np.zeros(n, dtype=np.int64)
+        self.codes, self.ranked, self._order, self._offsets = [], [], [], []
+        pending = np.ones(n, dtype=bool)
+
+        for level, columns in enumerate(PEER_LEVELS):
+            _, codes = np.unique(_group_codes([keys[column] for column in columns]), return_inverse=True)
+            counts = np.bincount(codes, minlength=1)
+            sizes = counts[codes]
+            settled = pending & ((sizes >= MIN_PEERS) | (level == len(PEER_LEVELS) - 1))
+            self.peers[settled] = sizes[settled]
+            self.levels[settled] = level
+            pending &= ~settled
+
+            self.codes.append(codes.astype(np.int32))
+            # Groups with members ranked at this level; the others never need ranking here
+            self.ranked.append(np.bincount(codes[settled], minlength=len(counts)) > 0)
+            self._order.append(np.argsort(codes, kind="stable").astype(np.int32))
+            self._offsets.append(np.concatenate([[0], np.cumsum(counts)]))
+
+    def members(self, level, groups):
+        """Row positions of every member of the ``groups`` (codes at ``level``), group after group."""
+        groups = np.asarray(groups, dtype=np.int64)
+        offsets = self._offsets[level]
+        starts = offsets[groups]
+        lengths = offsets[groups + 1] - starts
+        steps = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        return self._order[level][np.repeat(starts, lengths) + steps]
+
+
+def _oriented_values(df, metrics, rows):
+    # Orient every metric so that higher is better
+    values = np.empty((len(rows), len(metrics)))
+    for column, metric in enumerate(metrics):
+        values[:, column] = df[metric].to_numpy()[rows]
+        if metric in LOWER_IS_BETTER:
+            values[:, column] = -values[:, column]
+    return values
+
+
+def _rank_groups(groups, level, group_codes, df, metrics):
+    # Rank every member of the groups best-first; keep the members ranked at this level
+    rows = groups.members(level, group_codes)
+    ranks = pd.DataFrame(_oriented_values(df, metrics, rows)).groupby(
+        groups.codes[level][rows], sort=False
+    ).rank(ascending=False, method="max", pct=True).to_numpy()
+    keep = groups.levels[rows] == level
+    return rows[keep], ranks[keep] * 100
+
+
+def peer_benchmarks(df, metrics=None, groups=None):
+    """Percentile standing of every property within its peer group.
+
+    Peers share Type, Location and size band; properties with fewer than
+    MIN_PEERS such peers are compared at the next broader level of
+    PEER_LEVELS instead. For each metric the result holds the share of the
+    peer group (in %) that does at least as well as the property, so 12
+    means "top 12%" and the best property of a group of 50 gets 2. Each
+    level is ranked in one grouped pass, the broader ones only over the
+    groups that are needed. ``groups`` are the :class:`PeerGroups` of
+    ``df`` when they have been built already.
+
+    Returns a DataFrame aligned with ``df`` with a column per metric, plus
+    ``Size Band``, ``Peer Level`` (index into PEER_LEVELS) and ``Peers``
+    (the size of the peer group).
+    """
+    metrics = metrics or [metric for metric in BENCHMARK_METRICS if metric in df.columns]
+    if groups is None:
+        groups = PeerGroups(df)
+    ranks = np.full((len(df), len(metrics)), np.nan)
+    for level in range(len(PEER_LEVELS)):
+        settled = groups.levels == level
+        if settled.any():
+            rows, level_ranks = _rank_groups(groups, level, np.unique(groups.codes[level][settled]), df, metrics)
+            ranks[rows] = level_ranks
+
+    benchmarks = pd.DataFrame(ranks, index=df.index, columns=metrics)
+    benchmarks.insert(0, "Size Band", groups.size_bands)
+    benchmarks.insert(1, "Peer Level", groups.levels)
+    benchmarks.insert(2, "Peers", groups.peers)
+    return benchmarks
+
+
+def update_peer_benchmarks(benchmarks, df, positions, metrics, groups):
+    """Re-rank ``metrics`` in place after they changed for the properties at row ``positions``.
+
+    ``groups`` are the :class:`PeerGroups` of ``df``; Type, Location and size
+    must not have changed since they were built. At every level only the
+    groups that hold a changed property and have members ranked at that
+    level are ranked again, and only those members are rewritten. Returns
+    their row positions.
+    """
+    positions = np.asarray(positions)
+    rewritten = []
+    for level in range(len(PEER_LEVELS)):
+        changed = np.unique(groups.codes[level][positions])
+        changed = changed[groups.ranked[level][changed]]
+        if len(changed):
+            rewritten.append(_rank_groups(groups, level, changed, df, metrics))
+    rows = np.concatenate([rows for rows, _ in rewritten])
+    ranks = np.concatenate([ranks for _, ranks in rewritten])
+    for column, metric in enumerate(metrics):
+        benchmarks.iloc[rows, benchmarks.columns.get_loc(metric)] = ranks[:, column]
+    return rows
+
+
+def peer_group_label(property_data, level=0):
+    """Human-readable peer group of a property, e.g. "PARIS OFFICE PROPERTIES (10-20K SQM)"."""
+    columns = PEER_LEVELS[level]
+    label = f"{property_data['Type']} properties"
+    if "Location" in columns:
+        label = f"{property_data['Location']} {label}"
+    if "Size Band" in columns:
+        band = size_bands(pd.Series([property_data[SIZE_COLUMN]]))[0]
+        label = f"{label} ({band})"
+    return label.upper()
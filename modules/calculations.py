@@ -0,0 +1,114 @@
+import numpy as np
+
+# Input metric columns used by the scoring engine
+ENERGY_COLUMN = "Energy Score"
+CARBON_COLUMN = "Carbon Footprint (kgCO2e/sqm/yr)"
+RECYCLING_COLUMN = "Waste Recycling (%)"
+TENANT_COLUMN = "Tenant Satisfaction"
+COMMUNITY_COLUMN = "Community Impact"
+COMPLIANCE_COLUMN = "Governance Compliance"
+
+# Derived score columns written by the scoring engine
+SCORE_COLUMNS = ["Environmental Score", "Social Score", "Governance Score", "Overall ESG Score"]
+
+# Sub-weights inside each pillar, then the weight of each pillar in the overall score
+DEFAULT_WEIGHTS = {
+    "energy": 0.4,
+    "carbon": 0.4,
+    "recycling": 0.2,
+    "tenant": 0.6,
+    "community": 0.4,
+    "environmental": 0.5,
+    "social": 0.3,
+    "governance": 0.2,
+}
+
+# A carbon footprint of 250 kgCO2e/sqm/yr maps to a carbon score of 0
+CARBON_SCALE = 2.5
+
+
+def resolve_weights(weights=None):
+    """Return the default weights with any overrides from ``weights`` applied."""
+    if not weights:
+        return dict(DEFAULT_WEIGHTS)
+    unknown = set(weights) - set(DEFAULT_WEIGHTS)
+    if unknown:
+        raise ValueError(f"Unknown ESG weight(s): {', '.join(sorted(unknown))}")
+    return {**DEFAULT_WEIGHTS, **weights}
+
+
+def carbon_score(carbon_footprint):
+    return 100 - np.asarray(carbon_footprint, dtype=np.float64) / CARBON_SCALE
+
+
+def compute_esg_scores(energy, carbon, recycling, tenant, community, compliance, weights=None):
+    """Score whole columns at once.
+
+    Every metric may be a scalar, a NumPy array or a pandas Series; the result
+    is a dict of float arrays keyed by the names in ``SCORE_COLUMNS``.
+    """
+    w = resolve_weights(weights)
+
+    env_score = (w["energy"] * np.asarray(energy, dtype=np.float64) +
+                 w["carbon"] * carbon_score(carbon) +
+                 w["recycling"] * np.asarray(recycling, dtype=np.float64))
+    social_score = (w["tenant"] * np.asarray(tenant, dtype=np.float64) +
+                    w["community"] * np.asarray(community, dtype=np.float64))
+    gov_score = np.asarray(compliance, dtype=np.float64)
+
+    overall_score = (w["environmental"] * env_score +
+                     w["social"] * social_score +
+                     w["governance"] * gov_score)
+
+    return {
+        "Environmental Score": env_score,
+        "Social Score": social_score,
+        "Governance Score": gov_score,
+        "Overall ESG Score": overall_score,
+    }
+
+
+def score_properties(df, weights=None, inplace=False):
+    """Compute the four ESG score columns for a properties DataFrame."""
+    scores = compute_esg_scores(
+        df[ENERGY_COLUMN].to_numpy(),
+        df[CARBON_COLUMN].to_numpy(),
+        df[RECYCLING_COLUMN].to_numpy(),
+        df[TENANT_COLUMN].to_numpy(),
+        df[COMMUNITY_COLUMN].to_numpy(),
+        df[COMPLIANCE_COLUMN].to_numpy(),
+        weights=weights,
+    )
+
+    if not inplace:
+        df = df.copy()
+    for column, values in scores.items():
+        df[column] = values
+    return df
+
+
+def score_record(record, overrides=None, weights=None):
+    """Score a single property (e.g. a DataFrame row) with optional metric overrides.
+
+    Used for what-if projections such as a retrofit changing the energy score
+    and carbon footprint of one building.
+    """
+    values = {
+        ENERGY_COLUMN: record[ENERGY_COLUMN],
+        CARBON_COLUMN: record[CARBON_COLUMN],
+        RECYCLING_COLUMN: record[RECYCLING_COLUMN],
+        TENANT_COLUMN: record[TENANT_COLUMN],
+        COMMUNITY_COLUMN: record[COMMUNITY_COLUMN],
+        COMPLIANCE_COLUMN: record[COMPLIANCE_COLUMN],
+    }
+    values.update(overrides or {})
+    scores = compute_esg_scores(
+        values[ENERGY_COLUMN],
+        values[CARBON_COLUMN],
+        values[RECYCLING_COLUMN],
+        values[TENANT_COLUMN],
+        values[COMMUNITY_COLUMN],
+        values[COMPLIANCE_COLUMN],
+        weights=weights,
+    )
+    return {column: float(value) for column, value in scores.items()}
@@ -0,0 +1,266 @@
+import random
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from modules.calculations import compute_esg_scores
+
+PROPERTY_TYPES = ["Office", "Retail", "Residential", "Industrial", "Mixed-Use"]
+CITIES = ["Paris", "London", "Berlin", "Madrid", "Amsterdam", "Milan", "Brussels"]
+CERTIFICATION_TYPES = ["BREEAM", "HQE", "LEED", "None"]
+CERTIFICATION_LEVELS = ["Outstanding", "Excellent", "Very Good", "Good", "Pass", "None"]
+
+# Bounding box for random coordinates within Europe
+LAT_RANGE = (36.0, 60.0)
+LON_RANGE = (-5.0, 30.0)
+
+
+def _randint(rng, low, high, n):
+    # Inclusive on both ends, like random.randint
+    return rng.integers(low, high + 1, size=n, dtype=np.int64)
+
+
+def _categorical(values, codes):
+    return pd.Categorical.from_codes(codes, categories=values)
+
+
+def generate_sample_data(n_properties=15, seed=None):
+    """Generate a random property portfolio in a single vectorized pass.
+
+    The same ``seed`` and ``n_properties`` always give the same portfolio.
+    """
+    rng = np.random.default_rng(seed)
+    n = int(n_properties)
+
+    type_codes = rng.integers(0, len(PROPERTY_TYPES), size=n)
+    city_codes = rng.integers(0, len(CITIES), size=n)
+    cert_codes = rng.integers(0, len(CERTIFICATION_TYPES), size=n)
+
+    # Certified properties get one of the real levels, uncertified ones get "None"
+    no_cert = CERTIFICATION_TYPES.index("None")
+    level_codes = rng.integers(0, len(CERTIFICATION_LEVELS) - 1, size=n)
+    level_codes[cert_codes == no_cert] = CERTIFICATION_LEVELS.index("None")
+
+    # Random ESG metrics
+    energy_score = _randint(rng, 20, 100, n)
+    carbon_footprint = _randint(rng, 50, 250, n)
+    water_usage = _randint(rng, 500, 2000, n)
+    waste_recycling = _randint(rng, 10, 95, n)
+
+    # Social and governance metrics
+    tenant_satisfaction = _randint(rng, 50, 100, n)
+    community_impact = _randint(rng, 30, 100, n)
+    governance_compliance = _randint(rng, 40, 100, n)
+
+    scores = compute_esg_scores(energy_score, carbon_footprint, waste_recycling,
+                                tenant_satisfaction, community_impact, governance_compliance)
+
+    size = _randint(rng, 1000, 50000, n)
+    year_built = _randint(rng, 1970, 2023, n)
+    lat = rng.uniform(*LAT_RANGE, size=n)
+    lon = rng.uniform(*LON_RANGE, size=n)
+
+    # Build the text columns with array operations rather than per-row f-strings
+    numbers = np.arange(1, n + 1).astype(np.str_)
+    property_ids = np.char.add("PROP-", np.char.zfill(numbers, 3))
+    name_prefixes = np.array([f"{city} {property_type} " for city in CITIES
+                              for property_type in PROPERTY_TYPES])
+    names = np.char.add(name_prefixes[city_codes * len(PROPERTY_TYPES) + type_codes], numbers)
+
+    return pd.DataFrame({
+        "Property ID": property_ids,
+        "Property Name": names,
+        "Type": _categorical(PROPERTY_TYPES, type_codes),
+        "Location": _categorical(CITIES, city_codes),
+        "Size (sqm)": size,
+        "Year Built": year_built,
+        "Certification": _categorical(CERTIFICATION_TYPES, cert_codes),
+        "Certification Level": _categorical(CERTIFICATION_LEVELS, level_codes),
+        "Energy Score": energy_score,
+        "Carbon Footprint (kgCO2e/sqm/yr)": carbon_footprint,
+        "Water Usage (L/sqm/yr)": water_usage,
+        "Waste Recycling (%)": waste_recycling,
+        "Tenant Satisfaction": tenant_satisfaction,
+        "Community Impact": community_impact,
+        "Governance Compliance": governance_compliance,
+        **scores,
+        "Latitude": lat,
+        "Longitude": lon
+    })
+
+
+def generate_target_data(seed=None):
+    rng = random.Random(seed)
+    current_year = datetime.now().year
+    targets = [
+        {
+            "Target Name": "Carbon Neutrality",
+            "Category": "Environmental",
+            "Current Value": rng.randint(50, 80),
+            "Target Value": 100,
+            "Target Year": current_year + 5,
+            "Regulation": "EU Climate Law",
+            "Priority": "High"
+        },
+        {
+            "Target Name": "Energy Efficiency",
+            "Category": "Environmental",
+            "Current Value": rng.randint(30, 70),
+            "Target Value": 90,
+            "Target Year": current_year + 3,
+            "Regulation": "EPBD",
+            "Priority": "High"
+        },
+        {
+            "Target Name": "Water Conservation",
+            "Category": "Environmental",
+            "Current Value": rng.randint(40, 60),
+            "Target Value": 80,
+            "Target Year": current_year + 4,
+            "Regulation": "EU Water Framework",
+            "Priority": "Medium"
+        },
+        {
+            "Target Name": "Waste Reduction",
+            "Category": "Environmental",
+            "Current Value": rng.randint(30, 50),
+            "Target Value": 90,
+            "Target Year": current_year + 3,
+            "Regulation": "EU Circular Economy Package",
+            "Priority": "Medium"
+        },
+        {
+            "Target Name": "Certification Coverage",
+            "Category": "Environmental",
+            "Current Value": rng.randint(20, 40),
+            "Target Value": 100,
+            "Target Year": current_year + 5,
+            "Regulation": "Market Standards",
+            "Priority": "High"
+        },
+        {
+            "Target Name": "Tenant Wellbeing",
+            "Category": "Social",
+            "Current Value": rng.randint(50, 70),
+            "Target Value": 95,
+            "Target Year": current_year + 2,
+            "Regulation": "Internal Policy",
+            "Priority": "Medium"
+        },
+        {
+            "Target Name": "Community Engagement",
+            "Category": "Social",
+            "Current Value": rng.randint(30, 60),
+            "Target Value": 85,
+            "Target Year": current_year + 4,
+            "Regulation": "CSR Framework",
+            "Priority": "Low"
+        },
+        {
+            "Target Name": "ESG Reporting",
+            "Category": "Governance",
+            "Current Value": rng.randint(50, 70),
+            "Target Value": 100,
+            "Target Year": current_year + 2,
+            "Regulation": "SFDR",
+            "Priority": "High"
+        },
+        {
+            "Target Name": "ESG Risk Management",
+            "Category": "Governance",
+            "Current Value": rng.randint(40, 70),
+            "Target Value": 90,
+            "Target Year": current_year + 3,
+            "Regulation": "TCFD",
+            "Priority": "High"
+        }
+    ]
+
+    return pd.DataFrame(targets)
+
+def generate_retrofit_options():
+    options = [
+        {
+            "Retrofit": "Solar Panel Installation",
+            "Category": "Energy Generation",
+            "Cost (€/sqm)": 120,
+            "ROI (Years)": 7,
+            "Carbon Reduction (%)": 30,
+            "Energy Saving (%)": 25,
+            "Implementation Time (Months)": 3,
+            "Complexity": "Medium"
+        },
+        {
+            "Retrofit": "HVAC Upgrade",
+            "Category": "Energy Efficiency",
+            "Cost (€/sqm)": 80,
+            "ROI (Years)": 5,
+            "Carbon Reduction (%)": 20,
+            "Energy Saving (%)": 30,
+            "Implementation Time (Months)": 4,
+            "Complexity": "Medium"
+        },
+        {
+            "Retrofit": "Building Envelope Insulation",
+            "Category": "Energy Efficiency",
+            "Cost (€/sqm)": 95,
+            "ROI (Years)": 8,
+            "Carbon Reduction (%)": 25,
+            "Energy Saving (%)": 35,
+            "Implementation Time (Months)": 5,
+            "Complexity": "High"
+        },
+        {
+            "Retrofit": "LED Lighting Upgrade",
+            "Category": "Energy Efficiency",
+            "Cost (€/sqm)": 15,
+            "ROI (Years)": 2,
+            "Carbon Reduction (%)": 5,
+            "Energy Saving (%)": 10,
+            "Implementation Time (Months)": 1,
+            "Complexity": "Low"
+        },
+        {
+            "Retrofit": "Smart Building Management System",
+            "Category": "Energy Management",
+            "Cost (€/sqm)": 50,
+            "ROI (Years)": 4,
+            "Carbon Reduction (%)": 15,
+            "Energy Saving (%)": 20,
+            "Implementation Time (Months)": 3,
+            "Complexity": "High"
+        },
+        {
+            "Retrofit": "Water Efficiency Measures",
+            "Category": "Water Conservation",
+            "Cost (€/sqm)": 25,
+            "ROI (Years)": 3,
+            "Carbon Reduction (%)": 2,
+            "Energy Saving (%)": 5,
+            "Implementation Time (Months)": 2,
+            "Complexity": "Low"
+        },
+        {
+            "Retrofit": "Green Roof Installation",
+            "Category": "Biodiversity",
+            "Cost (€/sqm)": 110,
+            "ROI (Years)": 12,
+            "Carbon Reduction (%)": 5,
+            "Energy Saving (%)": 8,
+            "Implementation Time (Months)": 4,
+            "Complexity": "High"
+        },
+        {
+            "Retrofit": "Waste Management Systems",
+            "Category": "Waste Reduction",
+            "Cost (€/sqm)": 10,
+            "ROI (Years)": 2,
+            "Carbon Reduction (%)": 3,
+            "Energy Saving (%)": 0,
+            "Implementation Time (Months)": 2,
+            "Complexity": "Low"
+        }
+    ]
+
+    return pd.DataFrame(options)
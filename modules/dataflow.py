@@ -0,0 +1,190 @@
+import uuid
+
+import numpy as np
+
+from modules.aggregates import DIMENSIONS as AGGREGATE_DIMENSIONS, METRICS as AGGREGATE_METRICS
+from modules.benchmarking import BENCHMARK_METRICS, SIZE_COLUMN, PeerGroups, update_peer_benchmarks
+from modules.calculations import (
+    CARBON_COLUMN,
+    COMMUNITY_COLUMN,
+    COMPLIANCE_COLUMN,
+    ENERGY_COLUMN,
+    RECYCLING_COLUMN,
+    SCORE_COLUMNS,
+    TENANT_COLUMN,
+    compute_esg_scores,
+)
+from modules.leaderboard import GROUP_COLUMNS as LEADERBOARD_GROUPS, SCORE_COLUMN as LEADERBOARD_SCORE
+from modules.property_index import NAME_COLUMN
+
+# Which derived columns each column feeds directly
+DEPENDENCIES = {
+    ENERGY_COLUMN: ["Environmental Score"],
+    CARBON_COLUMN: ["Environmental Score"],
+    RECYCLING_COLUMN: ["Environmental Score"],
+    TENANT_COLUMN: ["Social Score"],
+    COMMUNITY_COLUMN: ["Social Score"],
+    COMPLIANCE_COLUMN: ["Governance Score"],
+    "Environmental Score": ["Overall ESG Score"],
+    "Social Score": ["Overall ESG Score"],
+    "Governance Score": ["Overall ESG Score"],
+}
+
+SCORE_INPUTS = [ENERGY_COLUMN, CARBON_COLUMN, RECYCLING_COLUMN, TENANT_COLUMN, COMMUNITY_COLUMN, COMPLIANCE_COLUMN]
+
+# Columns that decide a property's group (size sets its peer group and weights the aggregates);
+# the structures keyed on them are not updated incrementally
+KEY_COLUMNS = sorted({"Property ID", SIZE_COLUMN, *AGGREGATE_DIMENSIONS, *LEADERBOARD_GROUPS})
+
+# Up to this many rows, single-cell writes are cheaper than one vectorized assignment
+CELLWISE_WRITE_LIMIT = 100
+
+
+def _write(df, positions, column, values):
+    location = df.columns.get_loc(column)
+    if len(positions) <= CELLWISE_WRITE_LIMIT:
+        for position, value in zip(positions, values):
+            df.iat[position, location] = value
+    else:
+        df.iloc[positions, location] = values
+
+
+def _own(df, column, owned, dtype=None):
+    # Give the column its own array before writing to it; copy-on-write would otherwise
+    # copy every column stored in the same block. Extension columns (strings) have their
+    # own array already, so copy-on-write copies just that one.
+    if column not in owned:
+        if dtype is not None or isinstance(df[column].dtype, np.dtype):
+            df[column] = df[column].to_numpy(dtype=dtype, copy=True)
+        owned.add(column)
+
+
+def affected_columns(columns):
+    """Every column that has to be recomputed when ``columns`` change, including themselves."""
+    affected = set()
+    pending = list(columns)
+    while pending:
+        column = pending.pop()
+        if column not in affected:
+            affected.add(column)
+            pending.extend(DEPENDENCIES.get(column, []))
+    return affected
+
+
+class PortfolioState:
+    """A session's portfolio together with the structures derived from it.
+
+    Starts out sharing the frame, property index, leaderboard, aggregate
+    cube and peer benchmarks loaded for every session. The first
+    :meth:`update` switches to shallow copies of the frames and private
+    copies of the leaderboard and the cube; the frames' columns stay shared
+    with the loaded data until an update writes to them, and only those
+    columns are copied. An update writes the changed inputs, rescores only
+    the changed rows, folds the changes into the leaderboard and the
+    aggregate cube, and re-ranks the peer groups of the changed rows,
+    touching only what depends on the changed columns. The search and
+    spatial indexes are left as loaded.
+
+    ``version`` identifies the portfolio's contents, to key caches on
+    instead of hashing the frame: it is the ``version`` passed in (e.g. the
+    data fingerprint) until the first update, and changes with every update.
+    """
+
+    def __init__(self, properties, property_index, leaderboard, aggregates, benchmarks=None, weights=None,
+                 version=None, peer_groups=None):
+        self.properties = properties
+        self.property_index = property_index
+        self.leaderboard = leaderboard
+        self.aggregates = aggregates
+        self.benchmarks = benchmarks
+        # Grouping columns cannot be updated, so the peer groups are shared as they are
+        self.peer_groups = peer_groups
+        self.weights = weights
+        self._private = False
+        self._owned = set()
+        self._owned_benchmarks = set()
+        self.version = version
+        self._base_version = version
+        self._session = None
+        self._updates = 0
+
+    def _make_private(self):
+        # A shallow copy shares every column until it is written (pandas copy-on-write)
+        self.properties = self.properties.copy(deep=False)
+        self.property_index = self.property_index.rebind(self.properties)
+        self.leaderboard = self.leaderboard.copy()
+        self.leaderboard.df = self.properties
+        self.aggregates = self.aggregates.copy()
+        if self.benchmarks is not None:
+            self.benchmarks = self.benchmarks.copy(deep=False)
+        # Other sessions' edits start from the same data, so versions are told apart per session
+        self._session = uuid.uuid4().hex
+        self._private = True
+
+    def update(self, changes):
+        """Apply ``{property_id: {column: value}}`` and refresh everything that depends on it.
+
+        Derived score columns and grouping columns cannot be set directly.
+        Returns the set of columns that were written.
+        """
+        columns = sorted({column for values in changes.values() for column in values})
+        derived = [column for column in columns if column in SCORE_COLUMNS]
+        if derived:
+            raise ValueError(f"Derived column(s) cannot be updated directly: {', '.join(derived)}")
+        keys = [column for column in columns if column in KEY_COLUMNS]
+        if keys:
+            raise ValueError(f"Grouping column(s) cannot be updated incrementally: {', '.join(keys)}")
+        unknown = [column for column in columns if column not in self.properties.columns]
+        if unknown:
+            raise ValueError(f"Unknown column(s): {', '.join(unknown)}")
+        if not changes:
+            return set()
+
+        if not self._private:
+            self._make_private()
+        df = self.properties
+        positions = np.array([self.property_index.position(property_id) for property_id in changes])
+
+        affected = affected_columns(columns)
+        previous = {column: df[column].to_numpy()[positions].astype(np.float64)
+                    for column in affected if column in AGGREGATE_METRICS}
+
+        if NAME_COLUMN in columns:
+            for property_id, values in changes.items():
+                if NAME_COLUMN in values:
+                    self.property_index.rename(property_id, values[NAME_COLUMN])
+
+        for column in columns:
+            current = df[column].to_numpy()[positions]
+            values = np.array([values.get(column, old) for values, old in zip(changes.values(), current)])
+            if df[column].dtype.kind in "iu" and not np.array_equal(values, np.round(values)):
+                self._owned.discard(column)
+                _own(df, column, self._owned, np.float64)
+            _own(df, column, self._owned)
+            _write(df, positions, column, values)
+
+        rescored = [column for column in SCORE_COLUMNS if column in affected]
+        if rescored:
+            scores = compute_esg_scores(*(df[column].to_numpy()[positions] for column in SCORE_INPUTS),
+                                        weights=self.weights)
+            for column in rescored:
+                _own(df, column, self._owned)
+                _write(df, positions, column, scores[column])
+
+        if previous:
+            self.aggregates.update(df, positions, previous)
+        if LEADERBOARD_SCORE in affected:
+            for position, score in zip(positions, df[LEADERBOARD_SCORE].to_numpy()[positions]):
+                self.leaderboard.update(position, score)
+        benchmarked = [metric for metric in BENCHMARK_METRICS if metric in affected]
+        if benchmarked and self.benchmarks is not None:
+            if self.peer_groups is None:
+                self.peer_groups = PeerGroups(df)
+            for metric in benchmarked:
+                _own(self.benchmarks, metric, self._owned_benchmarks)
+            update_peer_benchmarks(self.benchmarks, df, positions, benchmarked, self.peer_groups)
+
+        self._updates += 1
+        self.version = (self._base_version, self._session, self._updates)
+
+        return affected
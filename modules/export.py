@@ -0,0 +1,225 @@
+import io
+import os
+import tempfile
+import weakref
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from openpyxl import Workbook
+
+from modules.aggregates import STATISTICS
+
+EXPORT_FORMATS = {
+    "xlsx": "Excel",
+    "csv": "CSV",
+    "parquet": "Parquet",
+}
+
+# Metrics reported under each framework, all of them columns of the aggregate cube
+FRAMEWORK_METRICS = {
+    "GRESB": [
+        "Energy Score", "Carbon Footprint (kgCO2e/sqm/yr)", "Water Usage (L/sqm/yr)", "Waste Recycling (%)",
+        "Environmental Score", "Social Score", "Governance Score", "Overall ESG Score",
+    ],
+    "SFDR": ["Carbon Footprint (kgCO2e/sqm/yr)", "Energy Score", "Environmental Score"],
+    "GRI": [
+        "Energy Score", "Carbon Footprint (kgCO2e/sqm/yr)", "Water Usage (L/sqm/yr)", "Waste Recycling (%)",
+        "Social Score", "Governance Score",
+    ],
+    "TCFD": ["Carbon Footprint (kgCO2e/sqm/yr)", "Energy Score", "Environmental Score", "Governance Score"],
+}
+
+# Portfolio rows converted and written at a time; also the size of a Parquet row group
+EXPORT_CHUNK_SIZE = 50_000
+
+# Rows of an Excel worksheet, header included; longer tables continue on another sheet
+EXCEL_MAX_ROWS = 1_048_576
+
+# Exports run on threads: a worker process would need its own copy of the portfolio
+EXPORT_WORKERS = 2
+
+_pool = ThreadPoolExecutor(EXPORT_WORKERS, thread_name_prefix="export")
+
+
+def framework_metrics(aggregates, scope=None):
+    """The FRAMEWORK_METRICS statistics of the slice ``scope`` of the aggregate cube, one row per metric."""
+    summary = aggregates.summary(scope)
+    properties = aggregates.count(scope)
+    frames = [summary.loc[metrics].rename_axis("Metric").reset_index().assign(Framework=framework)
+              for framework, metrics in FRAMEWORK_METRICS.items()]
+    metrics = pd.concat(frames, ignore_index=True)[["Framework", "Metric", *STATISTICS]]
+    metrics.insert(2, "Properties", properties)
+    return metrics
+
+
+def property_chunks(df, scope=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the rows of ``df`` in ``scope`` (as for the aggregate cube) ``chunk_size`` rows at a time.
+
+    The scope is applied chunk by chunk, so no filtered copy of the whole
+    portfolio is made. At least one (possibly empty) chunk is yielded.
+    """
+    for start in range(0, max(len(df), 1), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        if scope:
+            mask = np.ones(len(chunk), dtype=bool)
+            for column, values in scope.items():
+                mask &= chunk[column].isin(values if isinstance(values, list) else [values]).to_numpy()
+            chunk = chunk[mask]
+        yield chunk
+
+
+def report_tables(properties, targets, metrics, scope=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """The tables of a report export, each as an iterable of DataFrame chunks."""
+    return {
+        "Portfolio": property_chunks(properties, scope, chunk_size),
+        "Framework Metrics": [metrics],
+        "Targets": [targets],
+    }
+
+
+def _excel_rows(chunk):
+    # Excel has no NaN; missing values become empty cells
+    values = chunk.astype(object)
+    return values.where(chunk.notna(), None).itertuples(index=False, name=None)
+
+
+def write_xlsx(tables, path):
+    """Write every table to its own worksheet of a write-only workbook.
+
+    Rows are streamed to disk as they are appended, so memory does not grow
+    with the table length. Tables longer than an Excel sheet continue on
+    ``"<name> (2)"`` and so on.
+    """
+    workbook = Workbook(write_only=True)
+    for name, chunks in tables.items():
+        sheet, sheet_rows, sheet_number = None, 0, 1
+        for chunk in chunks:
+            header = list(chunk.columns)
+            if sheet is None:
+                sheet = workbook.create_sheet(name)
+                sheet.append(header)
+                sheet_rows = 1
+            for row in _excel_rows(chunk):
+                if sheet_rows == EXCEL_MAX_ROWS:
+                    sheet_number += 1
+                    sheet = workbook.create_sheet(f"{name} ({sheet_number})")
+                    sheet.append(header)
+                    sheet_rows = 1
+                sheet.append(row)
+                sheet_rows += 1
+    workbook.save(path)
+    return path
+
+
+def _member_name(name, extension):
+    return name.lower().replace(" ", "_") + extension
+
+
+def write_csv(tables, path):
+    """Write every table as a CSV file into a zip archive, compressing chunk by chunk."""
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, chunks in tables.items():
+            with archive.open(_member_name(name, ".csv"), "w", force_zip64=True) as member:
+                text = io.TextIOWrapper(member, encoding="utf-8", newline="")
+                for number, chunk in enumerate(chunks):
+                    chunk.to_csv(text, header=number == 0, index=False)
+                text.flush()
+                text.detach()
+    return path
+
+
+def write_parquet(tables, path):
+    """Write every table as a Parquet file into a zip archive, one row group per chunk.
+
+    Parquet files are compressed already, so they are stored in the archive as they are.
+    """
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, chunks in tables.items():
+            with archive.open(_member_name(name, ".parquet"), "w", force_zip64=True) as member:
+                writer = None
+                for chunk in chunks:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(member, table.schema)
+                    writer.write_table(table.cast(writer.schema))
+                writer.close()
+    return path
+
+
+_WRITERS = {
+    "xlsx": (write_xlsx, ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "csv": (write_csv, ".zip", "application/zip"),
+    "parquet": (write_parquet, ".zip", "application/zip"),
+}
+
+
+def export_report(properties, targets, metrics, path, export_format="xlsx", scope=None,
+                  chunk_size=EXPORT_CHUNK_SIZE):
+    """Write the portfolio rows in ``scope``, the framework metrics and the targets to ``path``.
+
+    ``export_format`` is a key of EXPORT_FORMATS. Only one chunk of
+    ``chunk_size`` portfolio rows is converted at a time, so memory stays
+    flat however large the portfolio is.
+    """
+    if export_format not in _WRITERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    writer = _WRITERS[export_format][0]
+    return writer(report_tables(properties, targets, metrics, scope, chunk_size), path)
+
+
+def _remove_export(future, path):
+    # Cancel the export if it has not started, and delete its file once it is no longer written
+    future.cancel()
+    future.add_done_callback(lambda _: os.path.exists(path) and os.remove(path))
+
+
+class ExportJob:
+    """A report export running on the background pool, written to a temporary file.
+
+    The file is deleted by :meth:`discard`, or else when the job is garbage
+    collected (its session ends) or the process exits.
+    """
+
+    def __init__(self, future, path, export_format):
+        self.future = future
+        self.path = path
+        self.format = export_format
+        _, extension, self.mime = _WRITERS[export_format]
+        self.file_name = f"esg_report_{datetime.now():%Y%m%d_%H%M%S}{extension}"
+        self._remove = weakref.finalize(self, _remove_export, future, path)
+
+    def done(self):
+        return self.future.done()
+
+    def error(self):
+        """The exception the export failed with, or ``None``."""
+        return self.future.exception() if self.done() else None
+
+    def read(self):
+        """Contents of the finished export file."""
+        with open(self.future.result(), "rb") as file:
+            return file.read()
+
+    def discard(self):
+        """Cancel the export if it has not started, and delete its file once it is no longer written."""
+        self._remove()
+
+
+def start_export(properties, targets, metrics, export_format="xlsx", scope=None):
+    """Start :func:`export_report` on a background thread and return its :class:`ExportJob`.
+
+    The export reads a copy-on-write snapshot of ``properties``, so later
+    edits of the portfolio do not change a running export.
+    """
+    if export_format not in _WRITERS:
+        raise ValueError(f"Unknown export format: {export_format}")
+    descriptor, path = tempfile.mkstemp(prefix="esg_report_", suffix=_WRITERS[export_format][1])
+    os.close(descriptor)
+    future = _pool.submit(export_report, properties.copy(deep=False), targets.copy(deep=False), metrics,
+                          path, export_format, scope)
+    return ExportJob(future, path, export_format)
@@ -0,0 +1,259 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+
+from modules.calculations import score_properties
+from modules.data_generator import CERTIFICATION_LEVELS, CERTIFICATION_TYPES, PROPERTY_TYPES
+
+DEFAULT_CHUNK_SIZE = 100_000
+
+STRING_COLUMNS = ["Property ID", "Property Name"]
+INTEGER_COLUMNS = ["Size (sqm)", "Year Built"]
+FLOAT_COLUMNS = [
+    "Energy Score",
+    "Carbon Footprint (kgCO2e/sqm/yr)",
+    "Water Usage (L/sqm/yr)",
+    "Waste Recycling (%)",
+    "Tenant Satisfaction",
+    "Community Impact",
+    "Governance Compliance",
+    "Latitude",
+    "Longitude",
+]
+
+# Columns of the properties CSV layout, in store order
+PROPERTY_COLUMNS = [
+    "Property ID", "Property Name", "Type", "Location", "Size (sqm)", "Year Built",
+    "Certification", "Certification Level", "Energy Score", "Carbon Footprint (kgCO2e/sqm/yr)",
+    "Water Usage (L/sqm/yr)", "Waste Recycling (%)", "Tenant Satisfaction", "Community Impact",
+    "Governance Compliance", "Latitude", "Longitude",
+]
+
+# Inclusive bounds checked for every row
+VALID_RANGES = {
+    "Energy Score": (0, 100),
+    "Waste Recycling (%)": (0, 100),
+    "Latitude": (-90, 90),
+    "Longitude": (-180, 180),
+}
+
+# Columns that must be greater than zero
+POSITIVE_COLUMNS = ["Size (sqm)"]
+
+# Earliest plausible Year Built; the latest is the current year
+EARLIEST_YEAR_BUILT = 1800
+
+# Columns restricted to a known set of values
+VALID_VALUES = {
+    "Type": PROPERTY_TYPES,
+    "Certification": CERTIFICATION_TYPES,
+    "Certification Level": CERTIFICATION_LEVELS,
+}
+
+REJECT_COLUMNS = ["Chunk", "Line", "Property ID", "Reason"]
+
+
+def validate_chunk(chunk, seen_ids=None):
+    """Coerce and validate one chunk of raw CSV rows.
+
+    ``seen_ids`` holds the Property IDs accepted from earlier chunks; rows
+    repeating one of them, or an earlier row of the same chunk, are rejected.
+
+    Returns the coerced chunk and a list of ``(reason, mask)`` pairs, one per
+    failed check, where ``mask`` flags the offending rows.
+    """
+    chunk = chunk.copy()
+    failures = []
+
+    # Parse numbers as float64 in every chunk so the store schema never changes between chunks
+    for column in INTEGER_COLUMNS + FLOAT_COLUMNS:
+        chunk[column] = pd.to_numeric(chunk[column], errors="coerce").astype(np.float64)
+        failures.append((f"invalid {column}", chunk[column].isna().to_numpy()))
+
+    for column in STRING_COLUMNS + ["Location"]:
+        chunk[column] = chunk[column].astype("string").str.strip()
+        missing = chunk[column].isna() | (chunk[column] == "")
+        failures.append((f"missing {column}", missing.to_numpy(dtype=bool, na_value=True)))
+
+    for column, (low, high) in VALID_RANGES.items():
+        values = chunk[column].to_numpy(dtype=np.float64)
+        failures.append((f"{column} out of range", (values < low) | (values > high)))
+
+    for column in POSITIVE_COLUMNS:
+        failures.append((f"{column} not positive", chunk[column].to_numpy(dtype=np.float64) <= 0))
+
+    year_built = chunk["Year Built"].to_numpy(dtype=np.float64)
+    implausible = (year_built < EARLIEST_YEAR_BUILT) | (year_built > date.today().year)
+    failures.append(("implausible Year Built", implausible))
+
+    for column, allowed in VALID_VALUES.items():
+        chunk[column] = chunk[column].astype("string").str.strip()
+        failures.append((f"unknown {column}", ~chunk[column].isin(allowed).to_numpy(dtype=bool)))
+
+    # The first occurrence of a Property ID wins; later rows with the same ID are rejected
+    duplicate = chunk["Property ID"].duplicated().to_numpy()
+    if seen_ids:
+        # Look each of the chunk's IDs up in the set; isin would rebuild a table from the whole set every chunk
+        ids = chunk["Property ID"].tolist()
+        duplicate = duplicate | np.fromiter((property_id in seen_ids for property_id in ids), bool, len(ids))
+    failures.append(("duplicate Property ID", duplicate))
+
+    # Properties without a certification cannot have a certification level, and vice versa
+    no_cert = (chunk["Certification"] == "None").to_numpy(dtype=bool, na_value=False)
+    no_level = (chunk["Certification Level"] == "None").to_numpy(dtype=bool, na_value=False)
+    failures.append(("certification level mismatch", no_cert != no_level))
+
+    return chunk, [(reason, mask) for reason, mask in failures if mask.any()]
+
+
+def _rejects(chunk, chunk_number, failures, rejected):
+    reasons = np.full(int(rejected.sum()), "", dtype=object)
+    for reason, mask in failures:
+        reasons = np.where(mask[rejected], reasons + reason + "; ", reasons)
+
+    return pd.DataFrame({
+        "Chunk": chunk_number,
+        # Line numbers in the source file, counting the header as line 1
+        "Line": chunk.index.to_numpy()[rejected] + 2,
+        "Property ID": chunk["Property ID"].to_numpy()[rejected],
+        "Reason": [reason.rstrip("; ") for reason in reasons],
+    }, columns=REJECT_COLUMNS)
+
+
+def _prepare(chunk, location_categories):
+    chunk = chunk[PROPERTY_COLUMNS].copy()
+    for column in INTEGER_COLUMNS:
+        chunk[column] = chunk[column].astype(np.int64)
+    for column, allowed in VALID_VALUES.items():
+        chunk[column] = pd.Categorical(chunk[column], categories=allowed)
+
+    # Locations are open-ended; new ones are appended so earlier codes never change
+    for location in pd.unique(chunk["Location"].to_numpy()):
+        if location not in location_categories:
+            location_categories.append(location)
+    chunk["Location"] = pd.Categorical(chunk["Location"], categories=pd.Index(location_categories, dtype="str"))
+
+    return score_properties(chunk.reset_index(drop=True), inplace=True)
+
+
+def _empty_chunk():
+    # Goes through the same coercion as real chunks, so an empty store has the usual column types
+    chunk, _ = validate_chunk(pd.DataFrame({column: pd.Series(dtype=object) for column in PROPERTY_COLUMNS}))
+    return _prepare(chunk, [])
+
+
+def _widen_dictionaries(schema):
+    # Pandas picks the narrowest code type per chunk, so pin dictionary indices to int32
+    fields = []
+    for field in schema:
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), field.type.value_type))
+        fields.append(field)
+    return pa.schema(fields, metadata=schema.metadata)
+
+
+class _StoreWriter:
+    """Appends chunks to an Arrow IPC or Parquet file."""
+
+    def __init__(self, path, parquet=False):
+        self.path = path
+        self.parquet = parquet
+        self.writer = None
+        self.schema = None
+
+    def write(self, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self.writer is None:
+            self.schema = _widen_dictionaries(table.schema)
+            if self.parquet:
+                self.writer = pq.ParquetWriter(self.path, self.schema)
+            else:
+                options = ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+                self.writer = ipc.new_file(self.path, self.schema, options=options)
+        self.writer.write_table(table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def ingest_properties_csv(csv_path, store_path, chunk_size=DEFAULT_CHUNK_SIZE, rejects_path=None):
+    """Stream a properties CSV into the columnar store one chunk at a time.
+
+    Each chunk is validated and scored, then appended to ``store_path``;
+    only one chunk of rows is held in memory at a time. Invalid rows are
+    skipped and written to ``rejects_path`` (when given) instead of failing
+    the file. Returns a per-chunk summary DataFrame.
+
+    The one thing that grows with the file is the set of accepted Property
+    IDs used to reject duplicates across chunks: roughly 100 bytes per
+    property, so about 100 MB for a million properties.
+    """
+    header = pd.read_csv(csv_path, nrows=0).columns
+    missing = [column for column in PROPERTY_COLUMNS if column not in header]
+    if missing:
+        raise ValueError(f"{csv_path} is missing column(s): {', '.join(missing)}")
+
+    # Write next to the destination and swap in at the end, so readers never see a partial store
+    tmp_path = f"{store_path}.tmp"
+    tmp_rejects_path = f"{rejects_path}.tmp" if rejects_path else None
+    writer = _StoreWriter(tmp_path, parquet=store_path.lower().endswith((".parquet", ".pq")))
+    location_categories = []
+    # Grows with the number of accepted properties; see the docstring
+    seen_ids = set()
+    summary = []
+    wrote_rejects = False
+
+    # "None" is a real certification value, so only empty fields count as missing
+    reader = pd.read_csv(csv_path, usecols=PROPERTY_COLUMNS, dtype=str, chunksize=chunk_size,
+                         keep_default_na=False, na_values=[""])
+    try:
+        for chunk_number, raw_chunk in enumerate(reader, start=1):
+            chunk, failures = validate_chunk(raw_chunk, seen_ids)
+            rejected = np.zeros(len(chunk), dtype=bool)
+            for _, mask in failures:
+                rejected |= mask
+
+            if rejected.any() and tmp_rejects_path:
+                _rejects(chunk, chunk_number, failures, rejected).to_csv(
+                    tmp_rejects_path, mode="a" if wrote_rejects else "w",
+                    header=not wrote_rejects, index=False
+                )
+                wrote_rejects = True
+
+            accepted = chunk[~rejected]
+            seen_ids.update(accepted["Property ID"].tolist())
+            if len(accepted):
+                writer.write(_prepare(accepted, location_categories))
+
+            summary.append({
+                "Chunk": chunk_number,
+                "Rows": len(chunk),
+                "Accepted": int(len(accepted)),
+                "Rejected": int(rejected.sum()),
+            })
+
+        if writer.writer is None:
+            # Nothing valid in the file; still leave an empty, readable store behind
+            writer.write(_empty_chunk())
+    except BaseException:
+        writer.close()
+        for path in (tmp_path, tmp_rejects_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+        raise
+
+    writer.close()
+    os.replace(tmp_path, store_path)
+    if tmp_rejects_path:
+        if wrote_rejects:
+            os.replace(tmp_rejects_path, rejects_path)
+        elif os.path.exists(rejects_path):
+            os.remove(rejects_path)
+
+    return pd.DataFrame(summary, columns=["Chunk", "Rows", "Accepted", "Rejected"])
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMN = "Overall ESG Score"
+
+# Columns a leaderboard can be restricted to one value of
+GROUP_COLUMNS = ["Type", "Location"]
+
+# Properties kept ranked per group and direction; requests for more fall back to a partial selection
+BUFFER_SIZE = 32
+
+
+class Leaderboard:
+    """Top-N and bottom-N properties by score, for the portfolio and per Type/Location.
+
+    Each group and direction keeps a small buffer of row positions that is
+    always the exact best (or worst) few of its group: every member scores
+    at least as well as every non-member. Buffers are filled with a partial
+    selection (``np.argpartition``) the first time they are asked for, and
+    :meth:`update` patches them when a score changes, so a leaderboard is
+    never re-sorted. A buffer is only refilled from its group when updates
+    have shrunk it below the requested size.
+
+    Instances are mutable; copy one with :meth:`copy` before updating a
+    leaderboard that other sessions share. A copy shares the scores of the
+    original until its first update.
+    """
+
+    def __init__(self, df, score_column=SCORE_COLUMN, buffer_size=BUFFER_SIZE):
+        self.df = df
+        self.score_column = score_column
+        self.buffer_size = buffer_size
+        self.scores = df[score_column].to_numpy(dtype=np.float64).copy()
+        self._shared_scores = False
+
+        # Row positions of each group, plus each row's group per column
+        self.groups = {None: np.arange(len(df))}
+        self.row_groups = {}
+        for column in GROUP_COLUMNS:
+            codes, values = pd.factorize(df[column], sort=True)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+            for code, value in enumerate(values):
+                self.groups[(column, value)] = order[bounds[code]:bounds[code + 1]]
+            self.row_groups[column] = np.asarray(values, dtype=object)[codes]
+
+        self.buffers = {}
+
+    def copy(self):
+        leaderboard = Leaderboard.__new__(Leaderboard)
+        leaderboard.__dict__.update(self.__dict__)
+        leaderboard._shared_scores = True
+        leaderboard.buffers = {key: set(members) for key, members in self.buffers.items()}
+        return leaderboard
+
+    def group_names(self):
+        """Keys accepted as ``group``: ``None`` for the whole portfolio, or ``(column, value)``."""
+        return list(self.groups)
+
+    def _keys(self, positions, bottom):
+        return -self.scores[positions] if bottom else self.scores[positions]
+
+    def _worst(self, members, bottom):
+        # Rank order is by score, then by portfolio position for ties
+        members = np.fromiter(members, dtype=np.int64, count=len(members))
+        return int(members[np.lexsort((-members, self._keys(members, bottom)))[0]])
+
+    def _beats(self, position, other, bottom):
+        key, other_key = self._keys(np.array([position, other]), bottom)
+        return key > other_key or (key == other_key and position < other)
+
+    def _select(self, positions, k, bottom):
+        # Partial selection of the k best; ties at the cut-off go to the earliest rows
+        if len(positions) <= k:
+            return positions
+        keys = self._keys(positions, bottom)
+        cutoff = keys[np.argpartition(-keys, k - 1)[k - 1]]
+        better = positions[keys > cutoff]
+        tied = positions[keys == cutoff]
+        return np.concatenate([better, tied[:k - len(better)]])
+
+    def _fill(self, group, bottom):
+        members = set(self._select(self.groups[group], self.buffer_size, bottom).tolist())
+        self.buffers[(group, bottom)] = members
+        return members
+
+    def ranking(self, n=5, group=None, bottom=False):
+        """Row positions of the ``n`` best (or worst, if ``bottom``) properties in ``group``, best first."""
+        positions = self.groups[group]
+        n = min(n, len(positions))
+        if n > self.buffer_size:
+            members = self._select(positions, n, bottom)
+        else:
+            members = self.buffers.get((group, bottom))
+            if members is None or len(members) < n:
+                members = self._fill(group, bottom)
+            members = np.fromiter(members, dtype=np.int64, count=len(members))
+        order = np.lexsort((members, -self._keys(members, bottom)))
+        return members[order][:n]
+
+    def top(self, n=5, group=None, bottom=False, start=0):
+        """The ``n`` best (or worst) properties in ``group`` as a DataFrame, best first.
+
+        ``start`` skips that many places, so ``start=10`` gives places 11 to 10 + ``n``.
+        """
+        positions = self.ranking(start + n, group, bottom)[start:]
+        return self.df.iloc[positions].assign(**{self.score_column: self.scores[positions]})
+
+    def update(self, position, score):
+        """Change the score of the property at row ``position``, keeping every buffer exact."""
+        if self._shared_scores:
+            self.scores = self.scores.copy()
+            self._shared_scores = False
+        self.scores[position] = score
+        groups = [None] + [(column, self.row_groups[column][position]) for column in GROUP_COLUMNS]
+
+        for group in groups:
+            for bottom in (False, True):
+                members = self.buffers.get((group, bottom))
+                if members is None or len(members) == len(self.groups[group]):
+                    continue
+                members.discard(position)
+                if not members:
+                    continue
+                worst = self._worst(members, bottom)
+
+                if self._beats(position, worst, bottom):
+                    members.add(position)
+                    if len(members) > self.buffer_size:
+                        members.discard(worst)
+                # Otherwise a member that fell below the rest may now trail a non-member, so it stays out
@@ -0,0 +1,141 @@
+import os
+import sys
+
+import pandas as pd
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+
+from modules.ingestion import ingest_properties_csv
+
+SAMPLE_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               "assets", "sample_data")
+
+PROPERTIES_CSV = os.path.join(SAMPLE_DATA_DIR, "properties.csv")
+RETROFITS_CSV = os.path.join(SAMPLE_DATA_DIR, "retrofits.csv")
+
+# Arrow IPC files are written uncompressed so they can be memory-mapped without copying
+PROPERTIES_STORE = os.path.join(SAMPLE_DATA_DIR, "properties.arrow")
+RETROFITS_STORE = os.path.join(SAMPLE_DATA_DIR, "retrofits.arrow")
+
+PARQUET_ROW_GROUP_SIZE = 128_000
+
+
+def _is_parquet(path):
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+def _has_data(path):
+    return os.path.exists(path) and os.path.getsize(path) > 0
+
+
+def write_table(df, path):
+    """Write a DataFrame to a Parquet or Arrow IPC file, chosen by the file extension."""
+    if _is_parquet(path):
+        df.to_parquet(path, index=False, row_group_size=PARQUET_ROW_GROUP_SIZE)
+    else:
+        feather.write_feather(df, path, compression="uncompressed")
+    return path
+
+
+def read_table(path, columns=None):
+    """Read a Parquet or Arrow IPC file, loading only ``columns`` if given.
+
+    Both formats are opened through a memory map, so columns that are not
+    requested are never read from disk.
+    """
+    if _is_parquet(path):
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        table = feather.read_table(path, columns=columns, memory_map=True)
+    return table.to_pandas()
+
+
+def read_retrofits_csv(path=RETROFITS_CSV, **kwargs):
+    return pd.read_csv(path, **kwargs)
+
+
+def convert_csv(csv_path, store_path, reader=read_retrofits_csv):
+    """One-shot conversion of a CSV file into the columnar store."""
+    return write_table(reader(csv_path), store_path)
+
+
+def convert_properties_csv(csv_path, store_path, rejects_path=None):
+    """Stream a properties CSV into the store, validating and scoring it chunk by chunk.
+
+    Rows that fail validation are listed in ``rejects_path``, which defaults to
+    ``<store name>_rejects.csv`` next to the store.
+    """
+    if rejects_path is None:
+        rejects_path = os.path.splitext(store_path)[0] + "_rejects.csv"
+    ingest_properties_csv(csv_path, store_path, rejects_path=rejects_path)
+    return store_path
+
+
+def _sync(store_path, csv_path, converter):
+    # Convert the CSV the first time it is seen, and again whenever it is edited
+    if _has_data(csv_path):
+        if not os.path.exists(store_path) or os.path.getmtime(csv_path) > os.path.getmtime(store_path):
+            converter(csv_path, store_path)
+
+
+def _load(store_path, csv_path, converter, columns):
+    _sync(store_path, csv_path, converter)
+    if not os.path.exists(store_path):
+        return None
+    df = read_table(store_path, columns=columns)
+    # A CSV whose rows were all rejected leaves an empty store; treat it as no data
+    if len(df) == 0:
+        return None
+    return df
+
+
+def sync_stores():
+    """Bring the sample data stores up to date with their CSV files."""
+    _sync(PROPERTIES_STORE, PROPERTIES_CSV, convert_properties_csv)
+    _sync(RETROFITS_STORE, RETROFITS_CSV, convert_csv)
+
+
+def load_properties(columns=None, store_path=PROPERTIES_STORE, csv_path=PROPERTIES_CSV):
+    """Load the stored portfolio, or ``None`` if no portfolio data has been provided.
+
+    A store without any rows, e.g. from a CSV where every row was rejected,
+    also counts as no data.
+    """
+    return _load(store_path, csv_path, convert_properties_csv, columns)
+
+
+def load_retrofits(columns=None, store_path=RETROFITS_STORE, csv_path=RETROFITS_CSV):
+    """Load the stored retrofit catalog, or ``None`` if none has been provided or it has no rows."""
+    return _load(store_path, csv_path, convert_csv, columns)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    if argv:
+        # python -m modules.portfolio_store input.csv output.arrow|output.parquet
+        if len(argv) != 2:
+            print("usage: python -m modules.portfolio_store [input.csv output.arrow|output.parquet]")
+            return 1
+        csv_path, store_path = argv
+        if os.path.basename(csv_path).startswith("retrofit"):
+            convert_csv(csv_path, store_path)
+        else:
+            convert_properties_csv(csv_path, store_path)
+        print(f"Wrote {store_path}")
+        return 0
+
+    # Without arguments, convert the sample data files in place
+    for csv_path, store_path, converter in [
+        (PROPERTIES_CSV, PROPERTIES_STORE, convert_properties_csv),
+        (RETROFITS_CSV, RETROFITS_STORE, convert_csv),
+    ]:
+        if _has_data(csv_path):
+            print(f"Wrote {converter(csv_path, store_path)}")
+        else:
+            print(f"Skipped {csv_path} (empty)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import bisect
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+ID_COLUMN = "Property ID"
+NAME_COLUMN = "Property Name"
+LOCATION_COLUMN = "Location"
+
+
+def _positions_by_value(values, first=0):
+    # Row positions (offset by ``first``) of every distinct non-missing value, in row order
+    codes, uniques = pd.factorize(values)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    return {value: order[bounds[code]:bounds[code + 1]] + first for code, value in enumerate(uniques)}
+
+
+class PropertyIndex:
+    """Hash lookup of portfolio rows by Property ID, Property Name and Location.
+
+    Property IDs must be unique; names and locations repeat, so they map to
+    every row that carries them. Positions are row positions in the frame
+    the index was built from, so lookups never scan a column.
+    """
+
+    def __init__(self, df):
+        ids = df[ID_COLUMN].astype(str)
+        duplicated = ids[ids.duplicated()].unique()
+        if len(duplicated):
+            examples = ", ".join(duplicated[:5])
+            raise ValueError(f"Property ID must be unique; {len(duplicated):,} repeated (e.g. {examples})")
+
+        self.df = df
+        self._shared_maps = False
+        self._positions = dict(zip(ids.tolist(), range(len(df))))
+        self._names = {}
+        for position, name in enumerate(df[NAME_COLUMN].astype(str).tolist()):
+            self._names.setdefault(name, []).append(position)
+        self._locations = _positions_by_value(df[LOCATION_COLUMN])
+
+    def __len__(self):
+        return len(self._positions)
+
+    def __contains__(self, property_id):
+        return property_id in self._positions
+
+    def position(self, property_id):
+        """Row position of ``property_id``; raises ``KeyError`` for unknown IDs."""
+        return self._positions[property_id]
+
+    def get(self, property_id):
+        """The row for ``property_id`` as a Series."""
+        return self.df.iloc[self._positions[property_id]]
+
+    def ids_named(self, name):
+        """Property IDs of every row called ``name``."""
+        return [self.df[ID_COLUMN].iat[position] for position in self._names.get(name, [])]
+
+    def name(self, property_id):
+        return self.df[NAME_COLUMN].iat[self._positions[property_id]]
+
+    def locations(self):
+        """Every Location with at least one property, sorted."""
+        return sorted(self._locations)
+
+    def located_in(self, location):
+        """Row positions of the properties in ``location``, in portfolio order."""
+        return self._locations.get(location, np.zeros(0, dtype=np.int64))
+
+    def rebind(self, df):
+        """Return this index over ``df``, a copy of the indexed frame with the same rows in the same order.
+
+        The lookup maps are shared with this index until the copy first changes them.
+        """
+        index = PropertyIndex.__new__(PropertyIndex)
+        index.__dict__.update(self.__dict__)
+        index.df = df
+        index._shared_maps = True
+        return index
+
+    def _own_maps(self):
+        if self._shared_maps:
+            self._positions = dict(self._positions)
+            # Name lists and location arrays are replaced rather than changed in place,
+            # so copying the dicts suffices
+            self._names = dict(self._names)
+            self._locations = dict(self._locations)
+            self._shared_maps = False
+
+    def append(self, new_rows):
+        """Append ``new_rows`` to ``df`` and index them; returns the new ``df``.
+
+        Only the new rows are indexed; the frame itself is still concatenated.
+        Raises ``ValueError`` if a new Property ID is already in the portfolio
+        or repeated within ``new_rows``.
+        """
+        ids = new_rows[ID_COLUMN].astype(str)
+        clashes = [property_id for property_id in ids if property_id in self._positions]
+        if clashes or ids.duplicated().any():
+            repeated = clashes or ids[ids.duplicated()].tolist()
+            raise ValueError(f"Property ID must be unique; {', '.join(repeated[:5])} already used")
+
+        self._own_maps()
+        first = len(self.df)
+        self.df = pd.concat([self.df, new_rows], ignore_index=True)
+        self._positions.update(zip(ids.tolist(), range(first, first + len(ids))))
+        for position, name in enumerate(new_rows[NAME_COLUMN].astype(str).tolist(), start=first):
+            self._names[name] = self._names.get(name, []) + [position]
+        for location, positions in _positions_by_value(new_rows[LOCATION_COLUMN], first).items():
+            self._locations[location] = np.concatenate([self.located_in(location), positions])
+        return self.df
+
+    def rename(self, property_id, name):
+        """Move ``property_id`` to ``name`` in the name lookup.
+
+        Call it before the new name is written to ``df``; the old name is
+        read from there.
+        """
+        position = self._positions[property_id]
+        old_name, name = str(self.df[NAME_COLUMN].iat[position]), str(name)
+        if name == old_name:
+            return
+
+        self._own_maps()
+        remaining = [p for p in self._names[old_name] if p != position]
+        if remaining:
+            self._names[old_name] = remaining
+        else:
+            del self._names[old_name]
+        positions = list(self._names.get(name, []))
+        bisect.insort(positions, position)
+        self._names[name] = positions
+
+
+# Fields whose words can be searched, besides the Property ID
+SEARCH_COLUMNS = [NAME_COLUMN, "Location", "Type"]
+
+# Upper bound on matches returned by one search
+MAX_MATCHES = 50
+
+
+class PropertySearch:
+    """Prefix search over the words of Property ID, name, location and type.
+
+    Every distinct lower-cased word is stored once in a sorted vocabulary,
+    and the rows containing each word are stored word after word in one
+    array. The words starting with a prefix form a contiguous range of the
+    vocabulary, so the rows matching one search term are a single slice
+    found with two binary searches. Rows must match every term.
+    """
+
+    def __init__(self, df):
+        words, positions = [], []
+        for column in [ID_COLUMN] + SEARCH_COLUMNS:
+            values = pa.Array.from_pandas(df[column].astype(str))
+            split = pc.utf8_split_whitespace(pc.utf8_lower(values))
+            words.append(pc.list_flatten(split).cast(pa.large_string()))
+            positions.append(pc.list_parent_indices(split).to_numpy().astype(np.int64))
+        positions = np.concatenate(positions)
+
+        # Number the distinct words in sorted order
+        encoded = pc.dictionary_encode(pa.concat_arrays(words))
+        sorted_words = pc.sort_indices(encoded.dictionary).to_numpy()
+        rank = np.empty(len(sorted_words), dtype=np.int64)
+        rank[sorted_words] = np.arange(len(sorted_words))
+        codes = rank[encoded.indices.to_numpy()]
+
+        order = np.argsort(codes, kind="stable")
+        self.vocabulary = encoded.dictionary.take(pa.array(sorted_words)).to_numpy(zero_copy_only=False)
+        self.rows = positions[order]
+        self.offsets = np.searchsorted(codes[order], np.arange(len(self.vocabulary) + 1))
+        self.ids = df[ID_COLUMN].astype(str).to_numpy()
+
+    def _term_rows(self, term):
+        first = np.searchsorted(self.vocabulary, term, side="left")
+        last = np.searchsorted(self.vocabulary, term + "\uffff", side="left")
+        return self.rows[self.offsets[first]:self.offsets[last]]
+
+    def search(self, query, limit=MAX_MATCHES):
+        """Property IDs of up to ``limit`` rows matching every word of ``query``, in portfolio order.
+
+        An empty query matches the first ``limit`` properties.
+        """
+        terms = query.lower().split()
+        if not terms:
+            return self.ids[:limit].tolist()
+
+        # A row can hold several words with the same prefix, so mark rows rather than merging lists
+        matches = np.ones(len(self.ids), dtype=bool)
+        for term in terms:
+            hits = np.zeros(len(self.ids), dtype=bool)
+            hits[self._term_rows(term)] = True
+            matches &= hits
+        return self.ids[np.flatnonzero(matches)[:limit]].tolist()
@@ -0,0 +1,479 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from modules.calculations import (
+    CARBON_COLUMN,
+    COMMUNITY_COLUMN,
+    COMPLIANCE_COLUMN,
+    ENERGY_COLUMN,
+    RECYCLING_COLUMN,
+    TENANT_COLUMN,
+    compute_esg_scores,
+)
+
+COST_COLUMN = "Cost (€/sqm)"
+CARBON_REDUCTION_COLUMN = "Carbon Reduction (%)"
+ENERGY_SAVING_COLUMN = "Energy Saving (%)"
+
+# Objectives the optimizer can maximize
+OBJECTIVES = {
+    "carbon": "Carbon Reduction",
+    "energy": "Energy Saving",
+    "esg": "Overall ESG Score",
+}
+
+# Savings are tracked in steps of 1/SAVING_RESOLUTION percentage points; finer catalog values are rounded
+SAVING_RESOLUTION = 10
+
+# Slack when comparing summed euro costs with the budget
+COST_TOLERANCE = 1e-6
+
+
+def project_retrofit(property_data, carbon_reduction, energy_saving, weights=None):
+    """Project a property's metrics after retrofits with the given total savings.
+
+    ``carbon_reduction`` and ``energy_saving`` are total percentages (capped at
+    100) and may be arrays, in which case every projection is computed at once.
+    """
+    carbon_reduction = np.minimum(100, carbon_reduction)
+    energy_saving = np.minimum(100, energy_saving)
+
+    new_carbon = np.maximum(0, property_data[CARBON_COLUMN] * (1 - carbon_reduction / 100))
+    new_energy_score = np.minimum(100, property_data[ENERGY_COLUMN] + energy_saving / 2)
+
+    scores = compute_esg_scores(
+        new_energy_score,
+        new_carbon,
+        property_data[RECYCLING_COLUMN],
+        property_data[TENANT_COLUMN],
+        property_data[COMMUNITY_COLUMN],
+        property_data[COMPLIANCE_COLUMN],
+        weights=weights,
+    )
+
+    return {
+        "Carbon Reduction (%)": carbon_reduction,
+        "Energy Saving (%)": energy_saving,
+        "Carbon Footprint (kgCO2e/sqm/yr)": new_carbon,
+        "Energy Score": new_energy_score,
+        "Environmental Score": np.minimum(100, scores["Environmental Score"]),
+        "Overall ESG Score": np.minimum(100, scores["Overall ESG Score"]),
+    }
+
+
+def _saving_units(savings, cap):
+    """Savings as integer steps, plus the step count at which ``cap`` is reached.
+
+    Steps are the gcd of the (resolution-scaled) savings, so catalogs with
+    round percentages keep the state space small.
+    """
+    scale = 1 if np.all(savings == np.round(savings)) else SAVING_RESOLUTION
+    scaled = np.maximum(np.round(savings * scale), 0).astype(np.int64)
+    unit = math.gcd(*scaled.tolist()) or 1
+    return scaled // unit, int(math.ceil(cap * scale / unit - 1e-9)), unit / scale
+
+
+def _fold_shift(table, step, axis):
+    """``table`` shifted up by ``step`` along ``axis``, with everything pushed past the end folded onto it.
+
+    Returns the shifted minimum costs and, for the last index, the source
+    index each folded minimum came from.
+    """
+    table = np.moveaxis(table, axis, 0)
+    last = len(table) - 1
+    shifted = np.full_like(table, np.inf)
+    if step <= last:
+        shifted[step:last] = table[:last - step]
+    first = max(last - step, 0)
+    source = first + np.argmin(table[first:], axis=0)
+    shifted[last] = np.take_along_axis(table, source[None], axis=0)[0]
+    return np.moveaxis(shifted, 0, axis), source.astype(np.int32)
+
+
+def _cheapest_packages(costs, carbon_steps, energy_steps, carbon_cap, energy_cap):
+    """Knapsack over capped savings: the lowest cost of reaching every (carbon, energy) state.
+
+    ``best[k, j]`` is the cheapest package whose carbon saving, capped at
+    ``carbon_cap`` steps, is exactly ``k`` and whose capped energy saving is
+    exactly ``j``. The table has one cell per capped saving, however large
+    the budget or fine the costs, and costs are summed exactly. For every
+    retrofit a bit per state records whether taking it improved the state,
+    with the source of states reached past a cap, so a package is traced
+    back without keeping the tables.
+    """
+    best = np.full((carbon_cap + 1, energy_cap + 1), np.inf)
+    best[0, 0] = 0.0
+    take, carbon_from, energy_from = [], [], []
+
+    for cost, k, j in zip(costs, carbon_steps, energy_steps):
+        candidate, carbon_source = _fold_shift(best, k, axis=0)
+        candidate, energy_source = _fold_shift(candidate, j, axis=1)
+        candidate += cost
+        taken = candidate < best
+        best = np.where(taken, candidate, best)
+        take.append(np.packbits(taken, axis=None))
+        carbon_from.append(carbon_source)
+        energy_from.append(energy_source)
+
+    return best, take, carbon_from, energy_from
+
+
+def optimize_retrofits(retrofit_df, property_data, budget, objective="carbon", weights=None):
+    """Find the retrofit package that maximizes ``objective`` within ``budget``.
+
+    Solved exactly with dynamic programming over the capped carbon and energy
+    savings (see :func:`_cheapest_packages`): the run time grows with the
+    number of retrofits times the number of saving states -- at most 101 per
+    objective dimension for whole percentages -- and not with the budget,
+    the property size or the cost precision. Savings are taken to
+    1/SAVING_RESOLUTION percentage points. Among the best packages, the
+    cheapest is returned, as the positional indices of the chosen retrofits
+    in ``retrofit_df``.
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"Unknown objective {objective!r}; expected one of {', '.join(OBJECTIVES)}")
+    if len(retrofit_df) == 0:
+        return []
+
+    costs = retrofit_df[COST_COLUMN].to_numpy(dtype=np.float64) * property_data["Size (sqm)"]
+    carbon = retrofit_df[CARBON_REDUCTION_COLUMN].to_numpy(dtype=np.float64)
+    energy = retrofit_df[ENERGY_SAVING_COLUMN].to_numpy(dtype=np.float64)
+
+    # Only the savings the objective depends on are tracked; energy stops counting once the score is 100
+    carbon_steps, carbon_cap, carbon_unit = _saving_units(carbon, 100)
+    energy_cap = min(100, 2 * (100 - property_data[ENERGY_COLUMN])) if objective == "esg" else 100
+    energy_steps, energy_cap, energy_unit = _saving_units(energy, max(energy_cap, 0))
+    if objective == "energy":
+        carbon_steps, carbon_cap = np.zeros_like(carbon_steps), 0
+    elif objective == "carbon":
+        energy_steps, energy_cap = np.zeros_like(energy_steps), 0
+
+    best, take, carbon_from, energy_from = _cheapest_packages(
+        costs, carbon_steps, energy_steps, carbon_cap, energy_cap
+    )
+
+    carbon_grid, energy_grid = np.meshgrid(np.arange(carbon_cap + 1) * carbon_unit,
+                                           np.arange(energy_cap + 1) * energy_unit, indexing="ij")
+    if objective == "esg":
+        value = project_retrofit(property_data, carbon_grid, energy_grid, weights)["Overall ESG Score"]
+    else:
+        value = np.minimum(100, carbon_grid if objective == "carbon" else energy_grid)
+    value = np.where(best <= budget + COST_TOLERANCE, value, -np.inf)
+    # Cheapest package among the best-scoring ones
+    k, j = np.unravel_index(np.argmin(np.where(value >= value.max() - 1e-9, best, np.inf)), best.shape)
+
+    chosen = []
+    for i in range(len(costs) - 1, -1, -1):
+        bit = k * best.shape[1] + j
+        if take[i][bit >> 3] >> (7 - (bit & 7)) & 1:
+            chosen.append(i)
+            j = energy_from[i][k] if j == energy_cap else j - energy_steps[i]
+            k = carbon_from[i][j] if k == carbon_cap else k - carbon_steps[i]
+    return sorted(chosen)
+
+
+# Objectives for allocating one budget across the whole portfolio
+PORTFOLIO_OBJECTIVES = {
+    "carbon": "Total Carbon Reduction (tCO2e/yr)",
+    "esg": "Average Overall ESG Score Gain (points)",
+}
+
+# Retrofits within this fraction of the best remaining impact per euro are funded together
+ALLOCATION_THRESHOLD_STEP = 0.02
+
+
+def _property_columns(properties_df):
+    columns = {
+        column: properties_df[column].to_numpy(dtype=np.float64)
+        for column in (CARBON_COLUMN, ENERGY_COLUMN, RECYCLING_COLUMN, TENANT_COLUMN,
+                       COMMUNITY_COLUMN, COMPLIANCE_COLUMN, "Size (sqm)")
+    }
+    columns["count"] = len(properties_df)
+    return columns
+
+
+def _property_values(property_columns, carbon_reduction, energy_saving, objective, weights, rows=None):
+    # Objective contribution of each property (or of ``rows``) for the given total
+    # savings, with the 100% caps applied; savings may carry an extra retrofit axis
+    columns = {
+        key: value if key == "count" else (value if rows is None else value[rows])[..., None]
+        for key, value in property_columns.items()
+    } if np.ndim(carbon_reduction) == 2 else {
+        key: value if key == "count" or rows is None else value[rows]
+        for key, value in property_columns.items()
+    }
+    projected = project_retrofit(columns, carbon_reduction, energy_saving, weights)
+
+    if objective == "carbon":
+        # kgCO2e/sqm/yr x sqm -> tonnes per year
+        return (columns[CARBON_COLUMN] - projected[CARBON_COLUMN]) * columns["Size (sqm)"] / 1000
+    if objective == "esg":
+        return projected["Overall ESG Score"] / columns["count"]
+    raise ValueError(f"Unknown objective {objective!r}; expected one of {', '.join(PORTFOLIO_OBJECTIVES)}")
+
+
+def retrofit_matrices(properties_df, retrofit_df, objective="carbon", weights=None):
+    """Build the properties x retrofits cost and impact matrices by broadcasting.
+
+    Impacts are for each retrofit on its own; :func:`allocate_portfolio_budget`
+    re-values them once several retrofits land on one property.
+    """
+    property_columns = _property_columns(properties_df)
+    cost = property_columns["Size (sqm)"][:, None] * retrofit_df[COST_COLUMN].to_numpy(dtype=np.float64)[None, :]
+
+    n = len(properties_df)
+    baseline = _property_values(property_columns, np.zeros(n), np.zeros(n), objective, weights)
+    impact = _property_values(
+        property_columns,
+        np.broadcast_to(retrofit_df[CARBON_REDUCTION_COLUMN].to_numpy(dtype=np.float64), cost.shape),
+        np.broadcast_to(retrofit_df[ENERGY_SAVING_COLUMN].to_numpy(dtype=np.float64), cost.shape),
+        objective, weights
+    ) - baseline[:, None]
+
+    return cost, np.maximum(impact, 0)
+
+
+def allocate_portfolio_budget(properties_df, retrofit_df, budget, objective="carbon", weights=None):
+    """Allocate one capex budget across every property and retrofit.
+
+    Retrofits are funded greedily by impact per euro. Impacts are marginal:
+    once a property has retrofits, further ones are re-valued with the 100%
+    caps applied. Each round funds, at most one per property, every retrofit
+    within a small step of the best remaining ratio, so the whole matrix is
+    re-scanned once per round rather than once per retrofit.
+
+    The optimality gap is measured against the Lagrangian (LP) relaxation of
+    the uncapped problem -- fill the budget by standalone impact per euro and
+    take a fraction of the first retrofit that does not fit -- which is an
+    upper bound because the caps only ever reduce the combined impact.
+
+    Returns ``(allocation, summary)``: a DataFrame with one row per funded
+    retrofit and a dict with the objective value, upper bound and gap. The
+    value is what the funded retrofits add: tonnes of CO2e saved per year,
+    or points on the portfolio's average Overall ESG Score.
+    """
+    cost, impact = retrofit_matrices(properties_df, retrofit_df, objective, weights)
+    n_properties, n_retrofits = cost.shape
+
+    # Upper bound from the fractional relaxation over standalone impacts
+    flat_cost = cost.ravel()
+    flat_impact = impact.ravel()
+    candidates = np.flatnonzero((flat_impact > 0) & (flat_cost <= budget))
+    order = candidates[np.argsort(-flat_impact[candidates] / flat_cost[candidates], kind="stable")]
+    cumulative = np.cumsum(flat_cost[order])
+    whole = np.searchsorted(cumulative, budget, side="right")
+    upper_bound = float(flat_impact[order[:whole]].sum())
+    if whole < len(order):
+        spent = cumulative[whole - 1] if whole else 0.0
+        upper_bound += float(flat_impact[order[whole]] * (budget - spent) / flat_cost[order[whole]])
+
+    property_columns = _property_columns(properties_df)
+    item_carbon = retrofit_df[CARBON_REDUCTION_COLUMN].to_numpy(dtype=np.float64)
+    item_energy = retrofit_df[ENERGY_SAVING_COLUMN].to_numpy(dtype=np.float64)
+
+    total_carbon = np.zeros(n_properties)
+    total_energy = np.zeros(n_properties)
+    current = _property_values(property_columns, total_carbon, total_energy, objective, weights)
+    baseline = current.copy()
+    taken = np.zeros(cost.shape, dtype=bool)
+
+    def marginal_gain(rows):
+        gain = _property_values(
+            property_columns,
+            total_carbon[rows, None] + item_carbon[None, :],
+            total_energy[rows, None] + item_energy[None, :],
+            objective, weights, rows=rows
+        ) - current[rows, None]
+        return np.where(taken[rows] | (gain <= 1e-12), 0.0, gain)
+
+    all_rows = np.arange(n_properties)
+    gain = marginal_gain(all_rows)
+    ratio = gain / cost
+    remaining = float(budget)
+    chosen_rows, chosen_cols, chosen_gains = [], [], []
+
+    threshold = np.inf
+    while True:
+        # Best retrofit per property among those that still fit the budget
+        affordable_ratio = np.where((cost <= remaining) & (gain > 0), ratio, -np.inf)
+        best_col = np.argmax(affordable_ratio, axis=1)
+        best_ratio = affordable_ratio[all_rows, best_col]
+        top_ratio = best_ratio.max() if n_properties else -np.inf
+        if not np.isfinite(top_ratio):
+            break
+
+        # Lower the threshold until something qualifies; marginal gains only shrink
+        # as a property gets more retrofits, so this follows the greedy order
+        threshold = min(threshold, top_ratio * (1 - ALLOCATION_THRESHOLD_STEP))
+        rows = np.flatnonzero(best_ratio >= threshold)
+        rows = rows[np.argsort(-best_ratio[rows], kind="stable")]
+        cols = best_col[rows]
+        round_cumulative = np.cumsum(cost[rows, cols])
+        fits = max(np.searchsorted(round_cumulative, remaining, side="right"), 1)
+        rows, cols = rows[:fits], cols[:fits]
+
+        remaining -= float(round_cumulative[fits - 1])
+        taken[rows, cols] = True
+        total_carbon[rows] += item_carbon[cols]
+        total_energy[rows] += item_energy[cols]
+        current[rows] += gain[rows, cols]
+        chosen_rows.append(rows)
+        chosen_cols.append(cols)
+        chosen_gains.append(gain[rows, cols])
+        gain[rows] = marginal_gain(rows)
+        ratio[rows] = gain[rows] / cost[rows]
+
+    if chosen_rows:
+        rows, cols, gains = (np.concatenate(parts) for parts in (chosen_rows, chosen_cols, chosen_gains))
+    else:
+        rows, cols, gains = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    order = np.lexsort((cols, rows))
+    rows, cols, gains = rows[order], cols[order], gains[order]
+    value = float(np.sum(current - baseline))
+
+    allocation = properties_df[["Property ID", "Property Name"]].iloc[rows].reset_index(drop=True)
+    allocation["Retrofit"] = retrofit_df["Retrofit"].to_numpy()[cols]
+    allocation["Total Cost (€)"] = cost[rows, cols]
+    allocation["Impact"] = gains
+
+    gap = max(upper_bound - value, 0.0)
+    summary = {
+        "objective": PORTFOLIO_OBJECTIVES[objective],
+        "value": value,
+        "upper_bound": upper_bound,
+        "gap": gap,
+        "gap_pct": gap / upper_bound * 100 if upper_bound > 0 else 0.0,
+        "total_cost": float(budget - remaining),
+        "retrofits": len(rows),
+        "properties": int(len(np.unique(rows))),
+    }
+    return allocation, summary
+
+
+TIME_COLUMN = "Implementation Time (Months)"
+
+# Rows compared at once while pruning dominated packages
+PARETO_BLOCK_SIZE = 4_000_000
+
+
+def _non_dominated(cost, carbon, energy, months):
+    """Mask of packages not dominated on (cost, -carbon, -energy, months).
+
+    Packages are sorted by cost first, so a package can only be dominated by
+    one earlier in the order; exact duplicates keep their first occurrence.
+    """
+    order = np.lexsort((months, -energy, -carbon, cost))
+    cost, carbon, energy, months = cost[order], carbon[order], energy[order], months[order]
+    n = len(order)
+    keep = np.ones(n, dtype=bool)
+
+    block = max(1, PARETO_BLOCK_SIZE // max(n, 1))
+    earlier = np.arange(n)
+    for start in range(0, n, block):
+        rows = np.arange(start, min(start + block, n))
+        dominated = ((carbon[None, :] >= carbon[rows, None]) &
+                     (energy[None, :] >= energy[rows, None]) &
+                     (months[None, :] <= months[rows, None]) &
+                     (earlier[None, :] < rows[:, None]))
+        keep[rows] = ~dominated.any(axis=1)
+
+    mask = np.zeros(n, dtype=bool)
+    mask[order[keep]] = True
+    return mask
+
+
+def pareto_packages(retrofit_df, property_size, budget=None):
+    """Pareto-optimal retrofit packages for one property.
+
+    A package is kept if no other package is at least as cheap, reduces carbon
+    and saves energy at least as much (both capped at 100%) and takes no
+    longer, with retrofits assumed to be carried out one after another.
+    The frontier is grown one retrofit at a time and pruned after each step,
+    so dominated packages are never extended. Returns one row per package,
+    sorted by cost.
+    """
+    costs = retrofit_df[COST_COLUMN].to_numpy(dtype=np.float64) * property_size
+    item_carbon = retrofit_df[CARBON_REDUCTION_COLUMN].to_numpy(dtype=np.float64)
+    item_energy = retrofit_df[ENERGY_SAVING_COLUMN].to_numpy(dtype=np.float64)
+    item_months = retrofit_df[TIME_COLUMN].to_numpy(dtype=np.float64)
+    limit = np.inf if budget is None else budget
+
+    # Start from the empty package; members are bitmasks over retrofit positions
+    cost = np.zeros(1)
+    carbon = np.zeros(1)
+    energy = np.zeros(1)
+    months = np.zeros(1)
+    members = np.array([0], dtype=object)
+
+    for i in range(len(costs)):
+        extended = cost + costs[i] <= limit
+        cost = np.concatenate([cost, cost[extended] + costs[i]])
+        carbon = np.concatenate([carbon, np.minimum(100, carbon[extended] + item_carbon[i])])
+        energy = np.concatenate([energy, np.minimum(100, energy[extended] + item_energy[i])])
+        months = np.concatenate([months, months[extended] + item_months[i]])
+        members = np.concatenate([members, members[extended] | (1 << i)])
+
+        keep = _non_dominated(cost, carbon, energy, months)
+        cost, carbon, energy, months, members = (
+            cost[keep], carbon[keep], energy[keep], months[keep], members[keep]
+        )
+
+    order = np.argsort(cost, kind="stable")
+    names = retrofit_df["Retrofit"].to_numpy()
+    packages = [[i for i in range(len(costs)) if mask >> i & 1] for mask in members[order]]
+
+    return pd.DataFrame({
+        "Retrofits": packages,
+        "Package": [" + ".join(names[package]) if package else "No retrofits" for package in packages],
+        "Total Cost (€)": cost[order],
+        "Carbon Reduction (%)": carbon[order],
+        "Energy Saving (%)": energy[order],
+        "Implementation Time (Months)": months[order],
+    })
+
+
+# Spread of actual vs. quoted savings (std. dev. of the savings multiplier) by complexity;
+# cost overruns use half the spread on a log scale, so they skew upwards
+COMPLEXITY_UNCERTAINTY = {"Low": 0.15, "Medium": 0.25, "High": 0.35}
+DEFAULT_UNCERTAINTY = 0.25
+
+PERCENTILES = {"P10": 10, "P50": 50, "P90": 90}
+
+
+def simulate_retrofit_outcomes(selected_df, property_data, n_draws=100_000, seed=None, weights=None):
+    """Monte Carlo projection of a retrofit package.
+
+    Each draw scales every retrofit's carbon and energy savings by one random
+    performance factor and its cost by a lognormal overrun, then projects the
+    property with :func:`project_retrofit`. All draws are evaluated together as
+    ``(n_draws, n_retrofits)`` arrays. Returns ``(bands, samples)``: a
+    DataFrame of P10/P50/P90 per metric and the raw per-draw results.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(selected_df)
+
+    spread = selected_df["Complexity"].map(COMPLEXITY_UNCERTAINTY).fillna(DEFAULT_UNCERTAINTY)
+    spread = spread.to_numpy(dtype=np.float64) if n else np.zeros(0)
+
+    performance = np.clip(rng.normal(1.0, spread, size=(n_draws, n)), 0, 2)
+    overrun = rng.lognormal(0.0, spread / 2, size=(n_draws, n))
+
+    carbon_reduction = performance @ selected_df[CARBON_REDUCTION_COLUMN].to_numpy(dtype=np.float64)
+    energy_saving = performance @ selected_df[ENERGY_SAVING_COLUMN].to_numpy(dtype=np.float64)
+    cost = overrun @ (selected_df[COST_COLUMN].to_numpy(dtype=np.float64) * property_data["Size (sqm)"])
+
+    projected = project_retrofit(property_data, carbon_reduction, energy_saving, weights)
+    samples = pd.DataFrame({
+        "Carbon Footprint (kgCO2e/sqm/yr)": np.broadcast_to(projected[CARBON_COLUMN], n_draws),
+        "Energy Score": np.broadcast_to(projected[ENERGY_COLUMN], n_draws),
+        "Overall ESG Score": np.broadcast_to(projected["Overall ESG Score"], n_draws),
+        "Total Cost (€)": cost,
+    })
+
+    bands = pd.DataFrame(
+        np.percentile(samples.to_numpy(), list(PERCENTILES.values()), axis=0),
+        index=list(PERCENTILES), columns=samples.columns
+    )
+    return bands, samples
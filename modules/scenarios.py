@@ -0,0 +1,214 @@
+import numpy as np
+import pandas as pd
+
+from modules.calculations import (
+    CARBON_COLUMN,
+    COMMUNITY_COLUMN,
+    COMPLIANCE_COLUMN,
+    ENERGY_COLUMN,
+    RECYCLING_COLUMN,
+    TENANT_COLUMN,
+    carbon_score,
+    resolve_weights,
+)
+
+# Inputs of the overall score, each with the pillar it belongs to and its sub-weight inside that pillar
+FEATURES = [
+    (ENERGY_COLUMN, "environmental", "energy"),
+    (CARBON_COLUMN, "environmental", "carbon"),
+    (RECYCLING_COLUMN, "environmental", "recycling"),
+    (TENANT_COLUMN, "social", "tenant"),
+    (COMMUNITY_COLUMN, "social", "community"),
+    (COMPLIANCE_COLUMN, "governance", None),
+]
+
+# Score bands used across the app (red below 50, yellow below 80, green above)
+SCORE_THRESHOLDS = [50, 80]
+
+# Example weighting policies, as overrides of DEFAULT_WEIGHTS
+SCENARIO_PRESETS = {
+    "Current": {},
+    "GRESB-like": {"environmental": 0.6, "social": 0.2, "governance": 0.2},
+    "SFDR-like": {"energy": 0.3, "carbon": 0.6, "recycling": 0.1,
+                  "environmental": 0.6, "social": 0.25, "governance": 0.15},
+    "Balanced": {"environmental": 1 / 3, "social": 1 / 3, "governance": 1 / 3},
+    "Carbon-led": {"energy": 0.2, "carbon": 0.7, "recycling": 0.1},
+    "Tenant-led": {"tenant": 0.8, "community": 0.2, "environmental": 0.4, "social": 0.4},
+    "Governance-led": {"environmental": 0.4, "social": 0.2, "governance": 0.4},
+}
+
+PERCENTILES = [10, 25, 50, 75, 90]
+
+# Scores are compared in steps of 0.001 points when ranking
+SCORE_RESOLUTION = 1000
+
+# Scenarios scored and ranked together; bounds the (scenarios x properties) working set
+SCENARIO_BLOCK = 8
+
+
+def feature_matrix(df):
+    """The score inputs as a (features x properties) float32 array, carbon already converted to a score."""
+    features = np.empty((len(FEATURES), len(df)), dtype=np.float32)
+    for row, (column, _, _) in enumerate(FEATURES):
+        values = df[column].to_numpy()
+        features[row] = carbon_score(values) if column == CARBON_COLUMN else values
+    return features
+
+
+def weight_coefficients(scenarios):
+    """Coefficient of every score input in the Overall ESG Score, one row per weight set.
+
+    The overall score is linear in its inputs, so the pillar weight times
+    the sub-weight is all a scenario needs.
+    """
+    coefficients = np.empty((len(scenarios), len(FEATURES)), dtype=np.float32)
+    for row, weights in enumerate(scenarios):
+        w = resolve_weights(weights)
+        for column, (_, pillar, sub_weight) in enumerate(FEATURES):
+            coefficients[row, column] = w[pillar] * (w[sub_weight] if sub_weight else 1.0)
+    return coefficients
+
+
+def scenario_scores(coefficients, features):
+    """Overall ESG Score of every property (columns) under every coefficient row.
+
+    This is the (scenarios x inputs) @ (inputs x properties) product, summed
+    input by input in a fixed order so that a property's score does not
+    depend on which other scenarios it is computed with.
+    """
+    scores = np.zeros((len(coefficients), features.shape[1]), dtype=np.float32)
+    for column, values in enumerate(features):
+        scores += coefficients[:, column, None] * values
+    return scores
+
+
+def score_histogram(scores):
+    """Histogram of every row of ``scores`` in steps of 1/SCORE_RESOLUTION points.
+
+    Returns ``(steps, low, counts)``: each score as a step above its row's
+    lowest step ``low``, and the number of properties at each step per row.
+    """
+    steps = np.rint(scores * SCORE_RESOLUTION).astype(np.int64)
+    low = steps.min(axis=1, keepdims=True)
+    steps -= low
+    span = int(steps.max()) + 1
+    counts = np.bincount((steps + np.arange(len(steps))[:, None] * span).ravel(),
+                         minlength=len(steps) * span).reshape(len(steps), span)
+    return steps, low, counts
+
+
+def _ranks(steps, counts):
+    higher = counts[:, ::-1].cumsum(axis=1)[:, ::-1] - counts
+    return (np.take_along_axis(higher, steps, axis=1) + 1).astype(np.int32)
+
+
+def _percentiles(low, counts, percentiles):
+    # Lowest step with at least q% of the properties at or below it (nearest rank)
+    cumulative = counts.cumsum(axis=1)
+    needed = np.ceil(np.outer(percentiles, cumulative[:, -1]) / 100).clip(min=1)
+    steps = np.stack([np.searchsorted(row, targets) for row, targets in zip(cumulative, needed.T)])
+    return (steps + low) / SCORE_RESOLUTION
+
+
+def rank_scores(scores):
+    """Rank of every property per row of ``scores``, 1 being the best.
+
+    A property's rank is one more than the number of properties that score
+    strictly higher at SCORE_RESOLUTION, so ties share a rank and rounding
+    noise of the float scores cannot reorder them. Ranks come from one
+    histogram of the quantized scores per row (a counting sort), which is
+    linear in the number of properties.
+    """
+    steps, _, counts = score_histogram(scores)
+    return _ranks(steps, counts)
+
+
+def _bands(scores, thresholds):
+    bands = np.zeros(scores.shape, dtype=np.int8)
+    for threshold in thresholds:
+        bands += scores >= threshold
+    return bands
+
+
+def evaluate_scenarios(df, scenarios, thresholds=SCORE_THRESHOLDS, baseline="Current"):
+    """Score the whole portfolio under every weighting scenario in ``scenarios``.
+
+    ``scenarios`` maps a name to weight overrides (see ``resolve_weights``)
+    and must contain ``baseline``, the scenario rank changes and threshold
+    crossings are measured against. Scenarios are scored and ranked a block
+    at a time (see :func:`scenario_scores` and :func:`rank_scores`), so only
+    a few scenarios' scores and ranks are held in memory.
+
+    Returns ``(summary, properties)``:
+
+    * ``summary`` has a row per scenario with the score distribution
+      (percentiles to SCORE_RESOLUTION), the
+      mean and largest rank change, the Spearman rank correlation with the
+      baseline, and per threshold the properties at or above it and those
+      that crossed it up or down.
+    * ``properties`` is aligned with ``df`` and holds each property's
+      baseline rank, best and worst rank over all scenarios, the largest
+      rank change and the number of scenarios that moved it to another
+      score band.
+
+    Raises ``ValueError`` if ``df`` has no rows.
+    """
+    if baseline not in scenarios:
+        raise ValueError(f"Baseline scenario '{baseline}' is not among the scenarios")
+    names = list(scenarios)
+    n = len(df)
+    if n == 0:
+        raise ValueError("There are no properties to score")
+    features = feature_matrix(df)
+    coefficients = weight_coefficients([scenarios[name] for name in names])
+
+    base_scores = scenario_scores(coefficients[[names.index(baseline)]], features)
+    base_ranks = rank_scores(base_scores)[0]
+    base_bands = _bands(base_scores, thresholds)[0]
+    base_above = [base_scores[0] >= threshold for threshold in thresholds]
+
+    best_rank = base_ranks.copy()
+    worst_rank = base_ranks.copy()
+    max_shift = np.zeros(n, dtype=np.int32)
+    band_changes = np.zeros(n, dtype=np.int32)
+    rows = []
+
+    for start in range(0, len(names), SCENARIO_BLOCK):
+        block = slice(start, start + SCENARIO_BLOCK)
+        scores = scenario_scores(coefficients[block], features)
+        steps, low, counts = score_histogram(scores)
+        ranks = _ranks(steps, counts)
+        percentiles = _percentiles(low, counts, PERCENTILES)
+        shifts = np.abs(ranks - base_ranks)
+
+        np.minimum(best_rank, ranks.min(axis=0), out=best_rank)
+        np.maximum(worst_rank, ranks.max(axis=0), out=worst_rank)
+        np.maximum(max_shift, shifts.max(axis=0), out=max_shift)
+        band_changes += (_bands(scores, thresholds) != base_bands).sum(axis=0, dtype=np.int32)
+
+        squared_shift = np.square(shifts, dtype=np.float64).sum(axis=1)
+        for row, name in enumerate(names[block]):
+            summary = {
+                "Mean": scores[row].mean(dtype=np.float64),
+                "Std": scores[row].std(dtype=np.float64),
+                **{f"P{q}": percentiles[row, i] for i, q in enumerate(PERCENTILES)},
+                "Mean Rank Change": shifts[row].mean(dtype=np.float64),
+                "Max Rank Change": int(shifts[row].max()) if n else 0,
+                "Rank Correlation": 1 - 6 * squared_shift[row] / (n * (n * n - 1.0)) if n > 1 else 1.0,
+            }
+            for threshold, above in zip(thresholds, base_above):
+                now_above = scores[row] >= threshold
+                summary[f"≥{threshold}"] = int(now_above.sum())
+                summary[f"Crossed Up {threshold}"] = int((now_above & ~above).sum())
+                summary[f"Crossed Down {threshold}"] = int((above & ~now_above).sum())
+            rows.append(summary)
+
+    summary = pd.DataFrame(rows, index=pd.Index(names, name="Scenario"))
+    properties = pd.DataFrame({
+        "Baseline Rank": base_ranks,
+        "Best Rank": best_rank,
+        "Worst Rank": worst_rank,
+        "Max Rank Change": max_shift,
+        "Band Changes": band_changes,
+    }, index=df.index)
+    return summary, properties
@@ -0,0 +1,166 @@
+import heapq
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from modules.calculations import CARBON_COLUMN
+from modules.retrofits import CARBON_REDUCTION_COLUMN, COST_COLUMN, TIME_COLUMN
+
+ROI_COLUMN = "ROI (Years)"
+
+# How jobs waiting for a crew are ordered
+PRIORITIES = {
+    "carbon": "Carbon Reduction per €",
+    "roi": "Shortest ROI",
+}
+
+# Scheduling stops after this many quarters even if jobs are still waiting
+MAX_QUARTERS = 80
+
+
+def _quarter_label(first_year, first_quarter, offset):
+    year, quarter = divmod(first_quarter - 1 + offset, 4)
+    return f"{first_year + year} Q{quarter + 1}"
+
+
+def _quarter_start(first_year, first_quarter, offset):
+    year, quarter = divmod(first_quarter - 1 + offset, 4)
+    return date(first_year + year, quarter * 3 + 1, 1)
+
+
+def build_jobs(jobs_df, properties_df, retrofit_df):
+    """Join (Property ID, Retrofit) pairs with property and retrofit data.
+
+    Adds the job cost, its duration in whole quarters and its carbon saving
+    in tCO2e/yr.
+    """
+    properties = properties_df.set_index("Property ID")[["Property Name", "Size (sqm)", CARBON_COLUMN]]
+    catalog = retrofit_df.set_index("Retrofit")[[COST_COLUMN, CARBON_REDUCTION_COLUMN, TIME_COLUMN, ROI_COLUMN]]
+
+    jobs = jobs_df[["Property ID", "Retrofit"]].join(properties, on="Property ID").join(catalog, on="Retrofit")
+    jobs = jobs.dropna(subset=["Size (sqm)", COST_COLUMN]).reset_index(drop=True)
+
+    jobs["Total Cost (€)"] = jobs["Size (sqm)"] * jobs[COST_COLUMN]
+    jobs["Quarters"] = np.maximum(1, np.ceil(jobs[TIME_COLUMN] / 3)).astype(np.int64)
+    jobs["Carbon Saving (tCO2e/yr)"] = (
+        jobs[CARBON_COLUMN] * jobs["Size (sqm)"] * jobs[CARBON_REDUCTION_COLUMN] / 100 / 1000
+    )
+    return jobs
+
+
+def schedule_retrofits(jobs, annual_budget, crews, priority="carbon", start=None):
+    """Sequence retrofit jobs quarter by quarter with list scheduling.
+
+    Every quarter, finished jobs free their crews and waiting jobs are taken
+    from a priority queue while crews are available, the year's budget (spent
+    when a job starts) allows it and the property has no other job running.
+    Jobs that cannot start wait for a later quarter; jobs costing more than a
+    whole year's budget are never scheduled.
+
+    ``jobs`` comes from :func:`build_jobs`. Returns the jobs with Start/End
+    quarter columns (``NaN`` if unscheduled).
+    """
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority {priority!r}; expected one of {', '.join(PRIORITIES)}")
+
+    start = start or date.today()
+    first_year, first_quarter = start.year, (start.month - 1) // 3 + 1
+
+    cost = jobs["Total Cost (€)"].to_numpy(dtype=np.float64)
+    quarters = jobs["Quarters"].to_numpy()
+    property_ids = jobs["Property ID"].to_numpy()
+    if priority == "carbon":
+        keys = -jobs["Carbon Saving (tCO2e/yr)"].to_numpy(dtype=np.float64) / np.maximum(cost, 1e-9)
+    else:
+        keys = jobs[ROI_COLUMN].to_numpy(dtype=np.float64)
+
+    waiting = [(keys[i], i) for i in range(len(jobs)) if cost[i] <= annual_budget]
+    heapq.heapify(waiting)
+
+    start_quarter = np.full(len(jobs), np.nan)
+    running = []  # (end quarter, job)
+    busy_properties = set()
+    spent_this_year = 0.0
+
+    for quarter in range(MAX_QUARTERS):
+        if not waiting:
+            break
+        if (first_quarter - 1 + quarter) % 4 == 0:
+            spent_this_year = 0.0
+
+        while running and running[0][0] <= quarter:
+            _, job = heapq.heappop(running)
+            busy_properties.discard(property_ids[job])
+
+        # Stop scanning the queue once the year's remaining budget cannot cover any waiting job
+        cheapest = min(cost[job] for _, job in waiting)
+        deferred = []
+        while waiting and len(running) < crews and annual_budget - spent_this_year >= cheapest:
+            key, job = heapq.heappop(waiting)
+            if property_ids[job] in busy_properties or spent_this_year + cost[job] > annual_budget:
+                deferred.append((key, job))
+                continue
+            start_quarter[job] = quarter
+            spent_this_year += cost[job]
+            busy_properties.add(property_ids[job])
+            heapq.heappush(running, (quarter + quarters[job], job))
+
+        for item in deferred:
+            heapq.heappush(waiting, item)
+
+    schedule = jobs.copy()
+    schedule["Start"] = start_quarter
+    schedule["End"] = start_quarter + quarters
+    scheduled = ~np.isnan(start_quarter)
+    schedule["Start Quarter"] = [
+        _quarter_label(first_year, first_quarter, int(q)) if ok else None
+        for q, ok in zip(start_quarter, scheduled)
+    ]
+    schedule["Start Date"] = [
+        _quarter_start(first_year, first_quarter, int(q)) if ok else None
+        for q, ok in zip(start_quarter, scheduled)
+    ]
+    schedule["End Date"] = [
+        _quarter_start(first_year, first_quarter, int(q)) if ok else None
+        for q, ok in zip(schedule["End"], scheduled)
+    ]
+    schedule.attrs["first_quarter"] = (first_year, first_quarter)
+    return schedule
+
+
+def carbon_trajectory(schedule, properties_df):
+    """Quarter-by-quarter spend and portfolio emissions for a schedule.
+
+    A retrofit's carbon reduction counts from the quarter it finishes, and a
+    property's reductions are capped at 100%.
+    """
+    first_year, first_quarter = schedule.attrs.get("first_quarter", (date.today().year, 1))
+    done = schedule.dropna(subset=["Start"])
+    n_quarters = int(done["End"].max()) + 1 if len(done) else 1
+
+    emissions = (properties_df[CARBON_COLUMN].to_numpy(dtype=np.float64) *
+                 properties_df["Size (sqm)"].to_numpy(dtype=np.float64) / 1000)
+    position = pd.Series(np.arange(len(properties_df)), index=properties_df["Property ID"].to_numpy())
+    rows = position.reindex(done["Property ID"].to_numpy()).to_numpy()
+    touched, local_rows = np.unique(rows, return_inverse=True)
+
+    # Carbon reduction (%) finishing in each quarter, per touched property, then running totals
+    reduction = np.zeros((len(touched), n_quarters))
+    np.add.at(reduction, (local_rows, done["End"].to_numpy(dtype=np.int64)), done[CARBON_REDUCTION_COLUMN].to_numpy())
+    reduction = np.minimum(100, np.cumsum(reduction, axis=1))
+    saved = (emissions[touched, None] * reduction / 100).sum(axis=0)
+
+    spend = np.zeros(n_quarters)
+    np.add.at(spend, done["Start"].to_numpy(dtype=np.int64), done["Total Cost (€)"].to_numpy())
+    active = np.zeros(n_quarters + 1, dtype=np.int64)
+    np.add.at(active, done["Start"].to_numpy(dtype=np.int64), 1)
+    np.add.at(active, done["End"].to_numpy(dtype=np.int64), -1)
+
+    return pd.DataFrame({
+        "Quarter": [_quarter_label(first_year, first_quarter, q) for q in range(n_quarters)],
+        "Quarter Start": [_quarter_start(first_year, first_quarter, q) for q in range(n_quarters)],
+        "Spend (€)": spend,
+        "Active Jobs": np.cumsum(active)[:n_quarters],
+        "Emissions (tCO2e/yr)": emissions.sum() - saved,
+    })
@@ -0,0 +1,212 @@
+import itertools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from modules.calculations import resolve_weights
+from modules.scenarios import feature_matrix, rank_scores, scenario_scores, weight_coefficients
+
+# Weights that share a simplex; the weights of each group sum to one
+WEIGHT_GROUPS = [
+    ["environmental", "social", "governance"],
+    ["energy", "carbon", "recycling"],
+    ["tenant", "community"],
+]
+
+SAMPLING_METHODS = {
+    "halton": "Quasi-random (Halton)",
+    "grid": "Grid",
+}
+
+DEFAULT_SAMPLES = 64
+
+# How far samples may move from the base weights: 0 keeps the base, 1 covers the whole simplex
+DEFAULT_SPREAD = 0.2
+
+# Samples scored and ranked together in one worker
+SAMPLE_BLOCK = 8
+
+# Below this many (sample, property) evaluations the analysis runs in-process
+PARALLEL_MIN_WORK = 50_000_000
+
+_HALTON_BASES = [2, 3, 5, 7, 11, 13]
+
+
+def halton(n, dimensions):
+    """First ``n`` points of the Halton sequence in the unit cube, skipping the origin."""
+    points = np.zeros((n, dimensions))
+    for dimension, base in enumerate(_HALTON_BASES[:dimensions]):
+        indices = np.arange(1, n + 1)
+        fraction = 1.0
+        while indices.any():
+            fraction /= base
+            points[:, dimension] += fraction * (indices % base)
+            indices //= base
+    return points
+
+
+def _simplex_points(uniforms):
+    # Sorted uniforms split [0, 1] into parts that are uniform on the simplex
+    edges = np.sort(uniforms, axis=1)
+    return np.diff(np.hstack([np.zeros((len(edges), 1)), edges, np.ones((len(edges), 1))]), axis=1)
+
+
+def _lattice(parts, resolution):
+    return [np.array(point) / resolution
+            for point in itertools.product(range(resolution + 1), repeat=parts)
+            if sum(point) == resolution]
+
+
+def _lattice_size(resolution):
+    size = 1
+    for group in WEIGHT_GROUPS:
+        size *= len(_lattice(len(group), resolution))
+    return size
+
+
+def _grid_resolution(samples):
+    # Finest lattice with at most samples - 1 points, or None if even the coarsest has more
+    if _lattice_size(1) > samples - 1:
+        return None
+    resolution = 1
+    while _lattice_size(resolution + 1) <= samples - 1:
+        resolution += 1
+    return resolution
+
+
+def sample_count(method="halton", samples=DEFAULT_SAMPLES):
+    """Number of weight sets :func:`sample_weights` returns for ``samples``, the base included.
+
+    A grid only comes in lattice sizes, so it can be well below ``samples``.
+    """
+    if method == "grid":
+        resolution = _grid_resolution(samples)
+        return 1 + (_lattice_size(resolution) if resolution else 0)
+    return max(samples, 1)
+
+
+def sample_weights(method="halton", samples=DEFAULT_SAMPLES, spread=DEFAULT_SPREAD, weights=None):
+    """Weight sets around ``weights`` (the defaults unless given), the base itself first.
+
+    Every group in WEIGHT_GROUPS is moved independently on its simplex:
+    a sampled point ``p`` gives ``(1 - spread) * base + spread * p``, so
+    ``spread`` bounds how far a weight can move. ``"halton"`` draws
+    ``samples - 1`` quasi-random points; ``"grid"`` uses the finest regular
+    lattice of the three simplices with at most ``samples - 1`` points.
+    """
+    if method not in SAMPLING_METHODS:
+        raise ValueError(f"Unknown sampling method: {method}")
+    if not 0 <= spread <= 1:
+        raise ValueError("spread must be between 0 and 1")
+    base = resolve_weights(weights)
+
+    if method == "halton":
+        uniforms = halton(max(samples - 1, 0), sum(len(group) - 1 for group in WEIGHT_GROUPS))
+        points, column = [], 0
+        for group in WEIGHT_GROUPS:
+            points.append(_simplex_points(uniforms[:, column:column + len(group) - 1]))
+            column += len(group) - 1
+    else:
+        resolution = _grid_resolution(samples)
+        combinations = list(itertools.product(*(_lattice(len(group), resolution) for group in WEIGHT_GROUPS))
+                            if resolution else [])
+        points = [np.array([combination[i] for combination in combinations]).reshape(-1, len(group))
+                  for i, group in enumerate(WEIGHT_GROUPS)]
+
+    sampled = [dict(base)]
+    for row in range(len(points[0])):
+        sample = dict(base)
+        for group, group_points in zip(WEIGHT_GROUPS, points):
+            group_base = np.array([base[name] for name in group])
+            group_base = group_base / group_base.sum()
+            for name, value in zip(group, (1 - spread) * group_base + spread * group_points[row]):
+                sample[name] = float(value)
+        sampled.append(sample)
+    return sampled
+
+
+def _rank_statistics(features, coefficients, top_cut, bottom_cut):
+    n = features.shape[1]
+    best = np.full(n, n, dtype=np.int32)
+    worst = np.ones(n, dtype=np.int32)
+    total = np.zeros(n, dtype=np.int64)
+    top = np.zeros(n, dtype=np.int32)
+    bottom = np.zeros(n, dtype=np.int32)
+    for start in range(0, len(coefficients), SAMPLE_BLOCK):
+        ranks = rank_scores(scenario_scores(coefficients[start:start + SAMPLE_BLOCK], features))
+        np.minimum(best, ranks.min(axis=0), out=best)
+        np.maximum(worst, ranks.max(axis=0), out=worst)
+        total += ranks.sum(axis=0, dtype=np.int64)
+        top += (ranks <= top_cut).sum(axis=0, dtype=np.int32)
+        bottom += (ranks > bottom_cut).sum(axis=0, dtype=np.int32)
+    return best, worst, total, top, bottom
+
+
+# Each worker process receives the score inputs once, then only coefficient blocks
+_worker_features = None
+
+
+def _init_worker(features):
+    global _worker_features
+    _worker_features = features
+
+
+def _worker_statistics(coefficients, top_cut, bottom_cut):
+    return _rank_statistics(_worker_features, coefficients, top_cut, bottom_cut)
+
+
+def rank_sensitivity(df, method="halton", samples=DEFAULT_SAMPLES, spread=DEFAULT_SPREAD,
+                     weights=None, workers=None):
+    """How stable each property's Overall ESG Score rank is under perturbed weights.
+
+    Scores the portfolio under every weight set from :func:`sample_weights`
+    and ranks it as :func:`modules.scenarios.rank_scores` does (1 is the
+    best). Samples are split into chunks over a pool of ``workers``
+    processes, each ranking whole blocks of samples against the full
+    portfolio; by default a pool of one process per CPU is used once the
+    work reaches PARALLEL_MIN_WORK evaluations, and ``workers=1`` always
+    runs in-process.
+
+    Returns a DataFrame aligned with ``df`` with the baseline rank, the best
+    and worst rank, their range, the mean rank and the share of samples in
+    which the property is in the top or bottom quartile. The number of
+    samples is in ``attrs["samples"]``.
+    """
+    sampled = sample_weights(method, samples, spread, weights)
+    coefficients = weight_coefficients(sampled)
+    features = feature_matrix(df)
+    n = len(df)
+    top_cut, bottom_cut = n / 4, 3 * n / 4
+
+    if workers is None:
+        workers = (os.cpu_count() or 1) if n * len(sampled) >= PARALLEL_MIN_WORK else 1
+    chunks = [chunk for chunk in np.array_split(coefficients, min(workers, len(coefficients))) if len(chunk)]
+
+    if len(chunks) > 1:
+        # Spawned rather than forked: the app serves sessions from several threads
+        with ProcessPoolExecutor(len(chunks), mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker, initargs=(features,)) as pool:
+            results = list(pool.map(_worker_statistics, chunks,
+                                    itertools.repeat(top_cut), itertools.repeat(bottom_cut)))
+    else:
+        results = [_rank_statistics(features, coefficients, top_cut, bottom_cut)]
+
+    best = np.minimum.reduce([result[0] for result in results])
+    worst = np.maximum.reduce([result[1] for result in results])
+    total, top, bottom = (sum(result[i] for result in results) for i in (2, 3, 4))
+    baseline = rank_scores(scenario_scores(coefficients[:1], features))[0]
+
+    sensitivity = pd.DataFrame({
+        "Baseline Rank": baseline,
+        "Best Rank": best,
+        "Worst Rank": worst,
+        "Rank Range": worst - best,
+        "Mean Rank": total / len(sampled),
+        "Top Quartile (%)": top / len(sampled) * 100,
+        "Bottom Quartile (%)": bottom / len(sampled) * 100,
+    }, index=df.index)
+    sensitivity.attrs["samples"] = len(sampled)
+    return sensitivity
@@ -0,0 +1,72 @@
+import os
+import threading
+from collections import namedtuple
+
+import streamlit as st
+
+from modules.aggregates import AggregateCube
+from modules.benchmarking import PeerGroups, peer_benchmarks
+from modules.data_generator import generate_retrofit_options, generate_sample_data, generate_target_data
+from modules.leaderboard import Leaderboard
+from modules.portfolio_store import PROPERTIES_STORE, RETROFITS_STORE, load_properties, load_retrofits, sync_stores
+from modules.property_index import PropertyIndex, PropertySearch
+from modules.spatial import SpatialIndex
+
+SharedData = namedtuple("SharedData", [
+    "fingerprint", "properties", "targets", "retrofits",
+    "property_index", "property_search", "spatial_index", "leaderboard", "aggregates",
+    "benchmarks", "peer_groups"
+])
+
+DATA_SOURCES = [PROPERTIES_STORE, RETROFITS_STORE]
+
+# Sessions run on separate threads; only one of them should convert edited CSV files
+_sync_lock = threading.Lock()
+
+
+def data_fingerprint(paths=DATA_SOURCES):
+    """Identify the current state of the data files by their size and modification time.
+
+    This only stats the files, so it is cheap enough to check on every rerun.
+    """
+    fingerprint = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            fingerprint.append((path, None, None))
+        else:
+            fingerprint.append((path, stat.st_size, stat.st_mtime_ns))
+    return tuple(fingerprint)
+
+
+# Only the latest data source is kept; an older fingerprint is evicted once the files change
+@st.cache_resource(max_entries=1, show_spinner="Loading portfolio...")
+def _load_shared_data(fingerprint):
+    properties = load_properties()
+    if properties is None:
+        properties = generate_sample_data()
+
+    retrofits = load_retrofits()
+    if retrofits is None:
+        retrofits = generate_retrofit_options()
+
+    peer_groups = PeerGroups(properties)
+    return SharedData(
+        fingerprint, properties, generate_target_data(), retrofits,
+        PropertyIndex(properties), PropertySearch(properties), SpatialIndex.from_frame(properties),
+        Leaderboard(properties), AggregateCube(properties),
+        peer_benchmarks(properties, groups=peer_groups), peer_groups
+    )
+
+
+def get_shared_data():
+    """Return the portfolio, targets, retrofit catalog and indexes shared by every session.
+
+    The frames are loaded once per server process and must be treated as
+    read-only: sessions keep references to them and store their own changes
+    separately in ``st.session_state``.
+    """
+    with _sync_lock:
+        sync_stores()
+    return _load_shared_data(data_fingerprint())
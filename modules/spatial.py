@@ -0,0 +1,197 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+SCORE_COLUMN = "Overall ESG Score"
+
+# Upper bound on markers sent to the browser for one map
+MAX_MARKERS = 2000
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+# Average number of properties per grid cell of a SpatialIndex
+POINTS_PER_CELL = 4
+
+
+def haversine_km(lat, lon, latitudes, longitudes):
+    """Great-circle distance in km from one point to arrays of points."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    latitudes, longitudes = np.radians(latitudes), np.radians(longitudes)
+    a = (np.sin((latitudes - lat) / 2) ** 2 +
+         np.cos(lat) * np.cos(latitudes) * np.sin((longitudes - lon) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Uniform latitude/longitude grid over a set of points.
+
+    Points are sorted by grid cell, and cells are numbered row by row, so
+    the cells of one grid row inside a bounding box form a single
+    contiguous slice found with two binary searches. Queries only look at
+    the points of the cells they overlap and return positional indices
+    into the arrays the index was built from.
+    """
+
+    def __init__(self, latitudes, longitudes, points_per_cell=POINTS_PER_CELL):
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        n = len(self.latitudes)
+
+        if n:
+            self.lat_min, lon_min = self.latitudes.min(), self.longitudes.min()
+            lat_span = max(self.latitudes.max() - self.lat_min, 1e-9)
+            lon_span = max(self.longitudes.max() - lon_min, 1e-9)
+        else:
+            self.lat_min, lon_min, lat_span, lon_span = 0.0, 0.0, 1.0, 1.0
+        self.lon_min = lon_min
+        self.cell = max(math.sqrt(lat_span * lon_span * points_per_cell / max(n, 1)), 1e-9)
+        self.n_rows = int(lat_span // self.cell) + 1
+        self.n_cols = int(lon_span // self.cell) + 1
+
+        cells = self._rows(self.latitudes) * self.n_cols + self._cols(self.longitudes)
+        self.order = np.argsort(cells, kind="stable")
+        self.cells = cells[self.order]
+
+    def __len__(self):
+        return len(self.latitudes)
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(df["Latitude"].to_numpy(dtype=np.float64), df["Longitude"].to_numpy(dtype=np.float64))
+
+    def _rows(self, latitudes):
+        return np.clip((np.asarray(latitudes) - self.lat_min) // self.cell, 0, self.n_rows - 1).astype(np.int64)
+
+    def _cols(self, longitudes):
+        return np.clip((np.asarray(longitudes) - self.lon_min) // self.cell, 0, self.n_cols - 1).astype(np.int64)
+
+    def _candidates(self, bounds):
+        lat_min, lat_max, lon_min, lon_max = bounds
+        if len(self) == 0 or lat_max < lat_min or lon_max < lon_min:
+            return np.empty(0, dtype=np.int64)
+        rows = np.arange(self._rows(lat_min), self._rows(lat_max) + 1)
+        first = rows * self.n_cols + self._cols(lon_min)
+        last = rows * self.n_cols + self._cols(lon_max)
+        starts = np.searchsorted(self.cells, first, side="left")
+        stops = np.searchsorted(self.cells, last, side="right")
+        if len(rows) == 1:
+            return self.order[starts[0]:stops[0]]
+        return np.concatenate([self.order[start:stop] for start, stop in zip(starts, stops)])
+
+    def bbox(self, bounds):
+        """Positions of the points inside ``bounds`` (lat_min, lat_max, lon_min, lon_max)."""
+        lat_min, lat_max, lon_min, lon_max = bounds
+        candidates = self._candidates(bounds)
+        lat, lon = self.latitudes[candidates], self.longitudes[candidates]
+        inside = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(candidates[inside])
+
+    def radius(self, lat, lon, radius_km):
+        """Positions and distances (km) of the points within ``radius_km`` of a point, nearest first."""
+        dlat = radius_km / KM_PER_DEGREE
+        # Longitude degrees shrink towards the poles; size the box for the widest latitude it covers
+        widest = min(abs(lat) + dlat, 89.9)
+        dlon = min(radius_km / (KM_PER_DEGREE * math.cos(math.radians(widest))), 180.0)
+
+        candidates = self._candidates((lat - dlat, lat + dlat, lon - dlon, lon + dlon))
+        distances = haversine_km(lat, lon, self.latitudes[candidates], self.longitudes[candidates])
+        within = distances <= radius_km
+        candidates, distances = candidates[within], distances[within]
+        nearest = np.argsort(distances, kind="stable")
+        return candidates[nearest], distances[nearest]
+
+    def nearest(self, lat, lon, k, exclude=None):
+        """Positions and distances (km) of the ``k`` points closest to a point.
+
+        ``exclude`` is a position to leave out, typically the query point itself.
+        """
+        wanted = k + (exclude is not None)
+        wanted_total = min(wanted, len(self))
+        if wanted_total == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        # Start with a radius expected to hold about ``wanted`` points and double it until enough are found
+        radius_km = self.cell * KM_PER_DEGREE * math.sqrt(wanted / POINTS_PER_CELL)
+        while True:
+            positions, distances = self.radius(lat, lon, radius_km)
+            if len(positions) >= wanted_total or radius_km > math.pi * EARTH_RADIUS_KM:
+                break
+            radius_km *= 2
+
+        if exclude is not None:
+            keep = positions != exclude
+            positions, distances = positions[keep], distances[keep]
+        return positions[:k], distances[:k]
+
+
+def view_bounds(df, padding=0.1):
+    """Bounding box (lat_min, lat_max, lon_min, lon_max) around ``df``, padded by a fraction of its span."""
+    if len(df) == 0:
+        return (-90.0, 90.0, -180.0, 180.0)
+    lat = df["Latitude"].to_numpy(dtype=np.float64)
+    lon = df["Longitude"].to_numpy(dtype=np.float64)
+    lat_pad = max((lat.max() - lat.min()) * padding, 0.01)
+    lon_pad = max((lon.max() - lon.min()) * padding, 0.01)
+    return (max(lat.min() - lat_pad, -90.0), min(lat.max() + lat_pad, 90.0),
+            max(lon.min() - lon_pad, -180.0), min(lon.max() + lon_pad, 180.0))
+
+
+def map_zoom(bounds):
+    """Mapbox zoom level that roughly fits ``bounds`` in the map panel."""
+    lat_min, lat_max, lon_min, lon_max = bounds
+    span = max(lat_max - lat_min, lon_max - lon_min, 1e-6)
+    return float(np.clip(math.log2(360 / span), 0, 15))
+
+
+def in_bounds(df, bounds):
+    """Boolean mask of the rows of ``df`` inside ``bounds``."""
+    lat_min, lat_max, lon_min, lon_max = bounds
+    lat = df["Latitude"].to_numpy(dtype=np.float64)
+    lon = df["Longitude"].to_numpy(dtype=np.float64)
+    return (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+
+
+def cluster_properties(df, bounds, max_markers=MAX_MARKERS, index=None):
+    """Level-of-detail view of the properties inside ``bounds``.
+
+    When at most ``max_markers`` properties are in view they are returned
+    as they are. Otherwise they are binned into a square grid over the
+    view, coarsened until no more than ``max_markers`` cells are occupied,
+    and each cell becomes one marker at the centroid of its properties with
+    their count and mean Overall ESG Score.
+
+    ``index`` is an optional :class:`SpatialIndex` over ``df`` used to find
+    the properties in view. Returns ``(markers, clustered)``.
+    """
+    if index is not None:
+        view = df.iloc[index.bbox(bounds)]
+    else:
+        view = df[in_bounds(df, bounds)]
+    if len(view) <= max_markers:
+        return view, False
+
+    lat_min, lat_max, lon_min, lon_max = bounds
+    lat = view["Latitude"].to_numpy(dtype=np.float64)
+    lon = view["Longitude"].to_numpy(dtype=np.float64)
+    score = view[SCORE_COLUMN].to_numpy(dtype=np.float64)
+
+    # Start from a grid with about max_markers cells over the view and double the cell size until it fits
+    cell = max(lat_max - lat_min, lon_max - lon_min) / math.sqrt(max_markers)
+    while True:
+        rows = ((lat - lat_min) // cell).astype(np.int64)
+        cols = ((lon - lon_min) // cell).astype(np.int64)
+        cells, members = np.unique(rows * (int((lon_max - lon_min) // cell) + 1) + cols, return_inverse=True)
+        if len(cells) <= max_markers:
+            break
+        cell *= 2
+
+    count = np.bincount(members)
+    markers = pd.DataFrame({
+        "Latitude": np.bincount(members, weights=lat) / count,
+        "Longitude": np.bincount(members, weights=lon) / count,
+        "Properties": count,
+        SCORE_COLUMN: np.bincount(members, weights=score) / count,
+    })
+    return markers, True
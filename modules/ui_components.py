@@ -0,0 +1,212 @@
+import html
+from functools import lru_cache
+
+import streamlit as st
+
+# Card markup is kept on as few lines as possible: every list of cards is sent
+# to the browser as one element, so indentation would be repeated per card.
+PROGRESS_BAR = (
+    '<div class="retro-progress-container">'
+    '<div class="retro-progress-bar" style="width:{percentage}%; background-color:{color};">'
+    '{label} {whole}%</div></div>'
+)
+
+BUILDING_ART = (
+    '<div style="text-align: center; color: {color}; font-family: monospace; font-size: 18px; margin: 10px 0;">'
+    '<pre>\n'
+    '  /\\\n'
+    ' /  \\\n'
+    '/____\\\n'
+    '|    |\n'
+    '|____|\n'
+    '|    |\n'
+    '|    |\n'
+    '|____|\n'
+    '</pre>'
+    '<p style="margin-top: -10px; font-family: \'Press Start 2P\', cursive; font-size: 14px; color: {color};">'
+    'ESG SCORE: {{score}}%</p></div>'
+)
+
+PROPERTY_CARD = (
+    '<div class="property-card">'
+    '<p style="font-family: \'Press Start 2P\', cursive; font-size: 0.9em; margin-bottom: 10px;">{name}</p>'
+    '{building}'
+    '<p>TYPE: {type}</p>'
+    '<p>LOCATION: {location}</p>'
+    '<p>CERT: {certification}</p>'
+    '{progress}'
+    '</div>'
+)
+
+QUEST_CARD = (
+    '<div style="background-color: #000080; border: 3px solid #FFFFFF; padding: 15px; '
+    'box-shadow: 5px 5px 0px #000000; margin-bottom: 15px;">'
+    '<div style="display: flex; justify-content: space-between; align-items: center;">'
+    '<p style="font-family: \'Press Start 2P\', cursive; font-size: 1em; color: #FFFF00;">{name}</p>'
+    '<p style="background-color: {priority_color}; padding: 5px 10px; font-family: \'VT323\', monospace; '
+    'font-size: 16px;">{priority}</p>'
+    '</div>'
+    '<p style="margin-top: 10px;">CATEGORY: {category}</p>'
+    '<p>REGULATION: {regulation}</p>'
+    '<p>TARGET YEAR: {year} ({years_left} years left)</p>'
+    '<div style="display: flex; margin-top: 15px; margin-bottom: 10px;">'
+    '<p style="width: 50%; text-align: left;">CURRENT: {current}%</p>'
+    '<p style="width: 50%; text-align: right;">TARGET: {target}%</p>'
+    '</div>'
+    '{progress}'
+    '<div style="display: flex; justify-content: flex-end; margin-top: 10px;">'
+    '<div style="background-color: #0000AA; border: 2px solid #FFFFFF; padding: 5px 10px; '
+    'font-family: \'Press Start 2P\', cursive; font-size: 0.8em; cursor: pointer;">UPDATE QUEST</div>'
+    '</div>'
+    '</div>'
+)
+
+RETROFIT_CARD = (
+    '<div style="background-color: {background}; border: 3px solid {border}; padding: 15px; margin-bottom: 15px;">'
+    '<p style="font-family: \'Press Start 2P\', cursive; font-size: 0.9em; color: {title_color}; '
+    'margin-bottom: 10px;">{name}</p>'
+    '<p>CATEGORY: {category}</p>'
+    '<p>COST: €{cost:,}</p>'
+    '<p>ROI: {roi} years</p>'
+    '<p>CARBON REDUCTION: {carbon}%</p>'
+    '<p>ENERGY SAVING: {energy}%</p>'
+    '<p>TIME: {months} months</p>'
+    '<p>COMPLEXITY: {complexity}</p>'
+    '<div style="margin-top: 15px; text-align: center;">'
+    '<div style="display: inline-block; background-color: {action_color}; border: 2px solid #FFFFFF; '
+    'padding: 5px 10px; font-family: \'Press Start 2P\', cursive; font-size: 0.7em;">{action}</div>'
+    '</div>'
+    '</div>'
+)
+
+CARD_GRID = '<div style="display: grid; grid-template-columns: repeat({columns}, 1fr); column-gap: 1rem;">{cards}</div>'
+
+PAGE_INFO = (
+    '<p style="text-align: center; font-family: \'VT323\', monospace; font-size: 1.2em; margin-top: 5px;">'
+    'PAGE {page} / {pages} ({first:,}-{last:,} OF {total:,})</p>'
+)
+
+PRIORITY_COLORS = {"High": "#FF0000", "Medium": "#FFFF00"}
+
+
+def band_color(value):
+    """Green from 80, yellow from 50, red below."""
+    if value >= 80:
+        return "#00FF00"
+    elif value >= 50:
+        return "#FFFF00"
+    return "#FF0000"
+
+
+def _text(value):
+    return html.escape(str(value))
+
+
+@lru_cache(maxsize=4096)
+def retro_progress_bar(percentage, label="", color="#00FF00"):
+    return PROGRESS_BAR.format(percentage=percentage, color=color, label=label, whole=int(percentage))
+
+
+@lru_cache(maxsize=None)
+def _building_template(color):
+    return BUILDING_ART.format(color=color)
+
+
+@lru_cache(maxsize=512)
+def pixel_building(score):
+    """ASCII building in the colour of the score's band; the art is built once per band."""
+    return _building_template(band_color(score)).format(score=score)
+
+
+def property_card(prop):
+    score = int(prop["Overall ESG Score"])
+    return PROPERTY_CARD.format(
+        name=_text(prop["Property Name"]),
+        building=pixel_building(score),
+        type=_text(prop["Type"]),
+        location=_text(prop["Location"]),
+        certification=_text(prop["Certification"]),
+        progress=retro_progress_bar(score, "ESG", band_color(score)),
+    )
+
+
+def quest_card(target, current_year):
+    current_value = target["Current Value"]
+    target_value = target["Target Value"]
+    progress = (current_value / target_value) * 100
+    return QUEST_CARD.format(
+        name=_text(target["Target Name"]),
+        priority_color=PRIORITY_COLORS.get(target["Priority"], "#00FF00"),
+        priority=_text(target["Priority"]),
+        category=_text(target["Category"]),
+        regulation=_text(target["Regulation"]),
+        year=target["Target Year"],
+        years_left=target["Target Year"] - current_year,
+        current=current_value,
+        target=target_value,
+        progress=retro_progress_bar(progress, "PROGRESS", band_color(progress)),
+    )
+
+
+def retrofit_card(retrofit, is_selected, can_afford):
+    return RETROFIT_CARD.format(
+        background="#004400" if is_selected else "#000080",
+        border="#00FF00" if is_selected else ("#FFFFFF" if can_afford else "#FF0000"),
+        title_color="#00FF00" if is_selected else "#FFFF00",
+        name=_text(retrofit["Retrofit"]),
+        category=_text(retrofit["Category"]),
+        cost=int(retrofit["Total Cost (€)"]),
+        roi=retrofit["ROI (Years)"],
+        carbon=retrofit["Carbon Reduction (%)"],
+        energy=retrofit["Energy Saving (%)"],
+        months=retrofit["Implementation Time (Months)"],
+        complexity=_text(retrofit["Complexity"]),
+        action_color="#FF0000" if is_selected else "#00FF00",
+        action="REMOVE" if is_selected else ("SELECT" if can_afford else "INSUFFICIENT FUNDS"),
+    )
+
+
+def render_cards(cards, columns=1, header="", footer=""):
+    """Send a list of card fragments to the browser as a single element.
+
+    With ``columns`` > 1 the cards are laid out in a CSS grid. ``header``
+    and ``footer`` wrap the list, so a container opened in ``header`` is
+    closed in the same element.
+    """
+    markup = "".join(cards)
+    if columns > 1:
+        markup = CARD_GRID.format(columns=columns, cards=markup)
+    st.markdown(header + markup + footer, unsafe_allow_html=True)
+
+
+def _turn_page(key, step):
+    st.session_state[key] += step
+
+
+def paginate(total, page_size, key, reset_on=None):
+    """Show page controls for a list of ``total`` items and return the ``(start, stop)`` slice to render.
+
+    The page lives in ``st.session_state[key]`` and returns to the first
+    page whenever ``reset_on`` (e.g. the active filters) changes. Only the
+    returned slice should be built into cards, so the cost of a page does
+    not grow with the list. Call it inside an ``st.fragment`` to turn
+    pages without rerunning the rest of the app.
+    """
+    pages = max(1, -(-total // page_size))
+    if st.session_state.get(f"{key}_reset_on") != reset_on:
+        st.session_state[f"{key}_reset_on"] = reset_on
+        st.session_state[key] = 0
+    page = min(max(st.session_state.get(key, 0), 0), pages - 1)
+    st.session_state[key] = page
+    start, stop = page * page_size, min((page + 1) * page_size, total)
+
+    if pages > 1:
+        col_prev, col_info, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("◀ PREV", key=f"{key}_prev", disabled=page == 0, on_click=_turn_page, args=(key, -1))
+        with col_info:
+            st.markdown(PAGE_INFO.format(page=page + 1, pages=pages, first=start + 1, last=stop, total=total),
+                        unsafe_allow_html=True)
+        with col_next:
+            st.button("NEXT ▶", key=f"{key}_next", disabled=page == pages - 1, on_click=_turn_page, args=(key, 1))
+    return start, stop
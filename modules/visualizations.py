@@ -0,0 +1,587 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
+from plotly.basedatatypes import BaseFigure
+
+# Retro arcade theme shared by the report-style charts
+RETRO_BACKGROUND = "#000080"
+RETRO_GRID = "#333333"
+RETRO_COLORS = ["#00FF00", "#FFFF00", "#FF0000", "#00FFFF", "#FF00FF", "#0000FF"]
+BODY_FONT = dict(family="VT323", size=16, color="white")
+TITLE_FONT = dict(family="Press Start 2P", size=16)
+AXIS_TITLE_FONT = dict(family="Press Start 2P", size=12)
+TICK_FONT = dict(family="VT323", size=14)
+
+# GRESB matrix: up to SVG_POINT_LIMIT properties are drawn as SVG, up to
+# MAX_SCATTER_POINTS with WebGL, and larger portfolios are reduced first
+GRESB_COLUMNS = ["Environmental Score", "Social Score", "Size (sqm)", "Type", "Property Name"]
+GRESB_MODES = {"sample": "Sampled points", "density": "Density map"}
+SVG_POINT_LIMIT = 2_000
+MAX_SCATTER_POINTS = 10_000
+THINNING_BINS = 100
+DENSITY_BINS = 60
+RANK_RANGE_BINS = 40
+
+# Serialized figures kept per server process, shared by every session
+FIGURE_CACHE_BYTES = 64 * 1024 * 1024
+FIGURE_CACHE_ENTRIES = 256
+
+
+def retro_layout(fig, title=None, **layout):
+    """Apply the retro theme to ``fig``; ``layout`` is passed on to ``update_layout``."""
+    if title is not None:
+        layout["title"] = dict(text=title, font=TITLE_FONT)
+    fig.update_layout(paper_bgcolor=RETRO_BACKGROUND, plot_bgcolor=RETRO_BACKGROUND, font=BODY_FONT)
+    fig.update_layout(**layout)
+    return fig
+
+
+def retro_axis(title, **axis):
+    return dict(title=title, title_font=AXIS_TITLE_FONT, tickfont=TICK_FONT, **axis)
+
+
+def fingerprint(*parts):
+    """Content hash of chart inputs: frames and arrays by their values, anything else by ``repr``."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, (pd.DataFrame, pd.Series)):
+            digest.update(pd.util.hash_pandas_object(part, index=True).to_numpy().tobytes())
+            names = list(part.columns) if isinstance(part, pd.DataFrame) else [part.name]
+            digest.update(repr(names).encode())
+        elif isinstance(part, np.ndarray):
+            digest.update(repr((part.dtype.str, part.shape)).encode())
+            digest.update(np.ascontiguousarray(part).tobytes())
+        else:
+            digest.update(repr(part).encode())
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """Least-recently-used cache of serialized figures, bounded by entries and total JSON size."""
+
+    def __init__(self, max_bytes=FIGURE_CACHE_BYTES, max_entries=FIGURE_CACHE_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            spec = self._entries.get(key)
+            if spec is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return spec
+
+    def put(self, key, spec):
+        # A figure larger than the whole cache is rebuilt every time rather than evicting everything
+        if len(spec) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.size -= len(self._entries.pop(key))
+            self._entries[key] = spec
+            self.size += len(spec)
+            while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+figure_cache = FigureCache()
+
+
+class SerializedFigure(BaseFigure):
+    """A figure kept as its plotly JSON, for ``st.plotly_chart``.
+
+    ``st.plotly_chart`` and ``plotly.io.to_json`` only ask a figure for
+    :meth:`to_dict`, so the cached JSON is handed over as parsed data
+    without building plotly objects. The plotly object tree is never built,
+    so nothing else of ``go.Figure`` works on it: anything that needs it
+    (``update_layout``, ``data``, ``show`` ...) raises ``AttributeError``.
+    Use :meth:`figure` for a real, editable ``go.Figure``.
+    """
+
+    def __init__(self, spec):
+        self._spec = spec
+
+    def __getattr__(self, name):
+        # Only reached for attributes a built figure would have
+        raise AttributeError(f"SerializedFigure has no {name!r}; call .figure() for an editable go.Figure")
+
+    def __repr__(self):
+        return f"SerializedFigure({len(self._spec):,} bytes)"
+
+    def __eq__(self, other):
+        if isinstance(other, SerializedFigure):
+            return self._spec == other._spec
+        return isinstance(other, BaseFigure) and self.to_dict() == other.to_dict()
+
+    __hash__ = None
+
+    def __reduce__(self):
+        return SerializedFigure, (self._spec,)
+
+    def to_dict(self):
+        return json.loads(self._spec)
+
+    def to_plotly_json(self):
+        return self.to_dict()
+
+    def figure(self):
+        # Validated, so the plotly objects are built and the figure can be edited
+        return go.Figure(json.loads(self._spec))
+
+
+def cached_figure(name, data, build, data_key=None, **params):
+    """``build(data, **params)``, served from the figure cache while its inputs are unchanged.
+
+    The key is the chart ``name`` plus a fingerprint of ``data`` (only the
+    slice the chart draws) and ``params``. A hit costs the hash and parsing
+    the cached JSON; the figure is never rebuilt. Returns a
+    :class:`SerializedFigure` to pass to ``st.plotly_chart``.
+
+    Where preparing or hashing ``data`` costs more than a cache check, pass
+    a function returning it together with a cheap ``data_key`` that changes
+    whenever the data would (e.g. a data version); the key is fingerprinted
+    instead and the function is only called on a miss.
+    """
+    key = f"{name}:{fingerprint(data if data_key is None else data_key, sorted(params.items()))}"
+    spec = figure_cache.get(key)
+    if spec is None:
+        if callable(data):
+            data = data()
+        spec = pio.to_json(build(data, **params), validate=False)
+        figure_cache.put(key, spec)
+    return SerializedFigure(spec)
+
+
+def portfolio_map(markers, clustered, center, zoom):
+    if clustered:
+        fig = px.scatter_mapbox(
+            markers,
+            lat="Latitude",
+            lon="Longitude",
+            color="Overall ESG Score",
+            size="Properties",
+            size_max=30,
+            color_continuous_scale=["red", "yellow", "green"],
+            range_color=[0, 100],
+            hover_data={
+                "Properties": ":,",
+                "Overall ESG Score": ":.1f",
+                "Latitude": False,
+                "Longitude": False
+            },
+            center=center,
+            zoom=zoom,
+            height=500
+        )
+    else:
+        fig = px.scatter_mapbox(
+            markers,
+            lat="Latitude",
+            lon="Longitude",
+            color="Overall ESG Score",
+            color_continuous_scale=["red", "yellow", "green"],
+            range_color=[0, 100],
+            hover_name="Property Name",
+            hover_data={
+                "Property ID": True,
+                "Type": True,
+                "Location": True,
+                "Overall ESG Score": True,
+                "Certification": True,
+                "Latitude": False,
+                "Longitude": False
+            },
+            center=center,
+            zoom=zoom,
+            height=500
+        )
+        fig.update_traces(marker=dict(size=14))  # Fixed size for pixel art feel
+
+    # The map keeps a light background so the streets stay readable
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        paper_bgcolor="#FFFFFF",
+        plot_bgcolor="#FFFFFF",
+        font=dict(family="VT323", size=16, color="#000000"),
+        margin=dict(l=0, r=0, t=0, b=0),
+        coloraxis_colorbar=dict(
+            title="ESG Score",
+            tickfont=dict(family="VT323", size=14, color="#000000"),
+            titlefont=dict(family="Press Start 2P", size=12, color="#6B0075"),
+            len=0.8
+        )
+    )
+    return fig
+
+
+def comparison_radar(scores, categories):
+    """``scores`` maps a trace name to its values for ``categories``."""
+    fig = go.Figure()
+    for (name, values), color, fill in zip(scores.items(), ["#00FFFF", "#FF00FF"],
+                                           ["rgba(0, 255, 255, 0.2)", "rgba(255, 0, 255, 0.2)"]):
+        fig.add_trace(go.Scatterpolar(
+            r=values,
+            theta=categories,
+            fill='toself',
+            name=name,
+            line=dict(color=color),
+            fillcolor=fill
+        ))
+    return retro_layout(
+        fig,
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+        showlegend=True,
+        legend=dict(font=BODY_FONT)
+    )
+
+
+def quest_progress(progress_values, categories):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=categories,
+        y=progress_values,
+        text=[f"{val:.1f}%" for val in progress_values],
+        textposition='auto',
+        marker=dict(
+            color=['#00FF00', '#FFFF00', '#FF0000'],
+            line=dict(color='#FFFFFF', width=2)
+        )
+    ))
+
+    # Add a horizontal line at 100%
+    fig.add_shape(
+        type="line",
+        x0=-0.5,
+        y0=100,
+        x1=len(categories) - 0.5,
+        y1=100,
+        line=dict(color="#FFFFFF", width=2, dash="dash")
+    )
+    return retro_layout(
+        fig,
+        xaxis=retro_axis("ESG Categories", tickmode='array', tickvals=list(range(len(categories))),
+                         ticktext=categories),
+        yaxis=retro_axis("Progress (%)", range=[0, 110])
+    )
+
+
+def _score_bins(x, y, bins):
+    def codes(values):
+        low, high = np.nanmin(values), np.nanmax(values)
+        scale = bins / (high - low) if high > low else 0.0
+        return np.clip(((values - low) * scale).astype(np.int64), 0, bins - 1), low, high
+    x_codes, x_low, x_high = codes(x)
+    y_codes, y_low, y_high = codes(y)
+    return x_codes, y_codes, (x_low, x_high), (y_low, y_high)
+
+
+def thin_points(x, y, limit=MAX_SCATTER_POINTS, bins=THINNING_BINS, seed=0):
+    """Sorted positions of about ``limit`` points that keep the shape of the (x, y) cloud.
+
+    A uniform random sample keeps the density of the cloud; one point of
+    every occupied cell of a ``bins`` x ``bins`` grid is added on top, so
+    sparse regions and outliers are never dropped. The same inputs always
+    give the same sample.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if len(x) <= limit:
+        return np.arange(len(x))
+    x_codes, y_codes, _, _ = _score_bins(x, y, bins)
+    order = np.random.default_rng(seed).permutation(len(x))
+    _, first = np.unique((x_codes * bins + y_codes)[order], return_index=True)
+    return np.union1d(order[first], order[:max(limit - len(first), 0)])
+
+
+def bin_scores(df, bins=DENSITY_BINS):
+    """Every cell of a ``bins`` x ``bins`` grid over the GRESB matrix, with its property count and mean size.
+
+    Cells are ordered by Environmental Score bin, then Social Score bin;
+    empty cells have a count of 0 and no mean size.
+    """
+    x = df["Environmental Score"].to_numpy(dtype=np.float64)
+    y = df["Social Score"].to_numpy(dtype=np.float64)
+    x_codes, y_codes, x_range, y_range = _score_bins(x, y, bins)
+    cells = x_codes * bins + y_codes
+    counts = np.bincount(cells, minlength=bins * bins)
+    sizes = np.bincount(cells, weights=df["Size (sqm)"].to_numpy(dtype=np.float64), minlength=bins * bins)
+    x_centers = x_range[0] + (np.arange(bins) + 0.5) * (x_range[1] - x_range[0]) / bins
+    y_centers = y_range[0] + (np.arange(bins) + 0.5) * (y_range[1] - y_range[0]) / bins
+    with np.errstate(invalid="ignore"):
+        mean_sizes = sizes / counts
+    return pd.DataFrame({
+        "Environmental Score": np.repeat(x_centers, bins),
+        "Social Score": np.tile(y_centers, bins),
+        "Properties": counts,
+        "Mean Size (sqm)": mean_sizes,
+    })
+
+
+def gresb_data(df, mode="sample"):
+    """The slice of ``df`` the GRESB matrix draws.
+
+    Every property while there are at most MAX_SCATTER_POINTS; beyond that
+    a :func:`thin_points` sample (``"sample"``) or the :func:`bin_scores`
+    grid (``"density"``). Reducing first keeps the payload of the cached
+    figure bounded; the reduction itself scans the whole portfolio, so pass
+    it to :func:`cached_figure` as a function with a ``data_key``.
+    """
+    if mode not in GRESB_MODES:
+        raise ValueError(f"Unknown GRESB matrix mode: {mode}")
+    if len(df) <= MAX_SCATTER_POINTS:
+        return df[GRESB_COLUMNS]
+    if mode == "density":
+        return bin_scores(df)
+    positions = thin_points(df["Environmental Score"], df["Social Score"])
+    return df[GRESB_COLUMNS].iloc[positions]
+
+
+def gresb_matrix(df, total=None):
+    """Environmental vs Social Score chart of :func:`gresb_data` output.
+
+    A binned grid becomes a heatmap of property counts with the mean size
+    on hover; points become a bubble chart, drawn with WebGL above
+    SVG_POINT_LIMIT. ``total`` is the portfolio size, shown when ``df`` is
+    a sample.
+    """
+    title = "Property ESG Performance Matrix"
+    if "Properties" in df.columns:
+        bins = int(round(np.sqrt(len(df))))
+        counts = df["Properties"].to_numpy().reshape(bins, bins).T
+        fig = go.Figure(go.Heatmap(
+            x=df["Environmental Score"].to_numpy()[::bins],
+            y=df["Social Score"].to_numpy()[:bins],
+            z=np.where(counts > 0, counts, np.nan),
+            customdata=df["Mean Size (sqm)"].to_numpy().reshape(bins, bins).T,
+            colorscale=[[0, "#FF00FF"], [0.5, "#FFFF00"], [1, "#00FF00"]],
+            colorbar=dict(title="Properties"),
+            hovertemplate=(
+                "Environmental %{x:.1f}<br>Social %{y:.1f}<br>"
+                "%{z:,} properties<br>Mean size %{customdata:,.0f} sqm<extra></extra>"
+            ),
+        ))
+        title = f"{title} ({int(counts.sum()):,} properties, binned)"
+    else:
+        fig = px.scatter(
+            df,
+            x="Environmental Score",
+            y="Social Score",
+            size="Size (sqm)",
+            color="Type",
+            hover_name="Property Name",
+            size_max=50,
+            color_discrete_sequence=RETRO_COLORS[:5],
+            render_mode="webgl" if len(df) > SVG_POINT_LIMIT else "auto"
+        )
+        if total is not None and total > len(df):
+            title = f"{title} ({len(df):,} of {total:,} properties)"
+    return retro_layout(
+        fig,
+        title,
+        xaxis=dict(title="Environmental Score", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID),
+        yaxis=dict(title="Social Score", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID)
+    )
+
+
+def sfdr_impacts(values, categories):
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=categories,
+        y=values,
+        marker=dict(color=RETRO_COLORS[:len(categories)], line=dict(color="#FFFFFF", width=2))
+    ))
+    return retro_layout(
+        fig,
+        "Principal Adverse Impact Indicators",
+        xaxis=retro_axis("Categories"),
+        yaxis=retro_axis("Mitigation Score", gridcolor=RETRO_GRID)
+    )
+
+
+def gri_compliance(compliance, categories):
+    """``compliance`` maps each level (full, partial, none) to a percentage per category."""
+    fig = go.Figure()
+    for (name, values), color in zip(compliance.items(), ["#00FF00", "#FFFF00", "#FF0000"]):
+        fig.add_trace(go.Bar(
+            x=categories,
+            y=values,
+            name=name,
+            marker=dict(color=color, line=dict(color="#FFFFFF", width=1))
+        ))
+    return retro_layout(
+        fig,
+        "GRI Disclosures Compliance",
+        barmode="stack",
+        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="center", x=0.5, font=TICK_FONT),
+        xaxis=retro_axis("Categories"),
+        yaxis=retro_axis("Percentage", gridcolor=RETRO_GRID)
+    )
+
+
+def tcfd_radar(values, categories):
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=categories,
+        fill='toself',
+        name='Current Compliance',
+        line=dict(color="#00FFFF"),
+        fillcolor="rgba(0, 255, 255, 0.2)"
+    ))
+    fig.add_trace(go.Scatterpolar(
+        r=[100] * len(categories),
+        theta=categories,
+        fill='toself',
+        name='Target',
+        line=dict(color="#FF00FF", dash="dash"),
+        fillcolor="rgba(255, 0, 255, 0.1)"
+    ))
+    return retro_layout(
+        fig,
+        "TCFD Compliance by Dimension",
+        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+        showlegend=True,
+        legend=dict(orientation="h", yanchor="bottom", y=1.1, xanchor="center", x=0.5, font=TICK_FONT)
+    )
+
+
+def pareto_frontier(frontier):
+    """Cost against carbon reduction of the packages on a property's Pareto frontier."""
+    fig = px.scatter(
+        frontier,
+        x="Total Cost (€)",
+        y="Carbon Reduction (%)",
+        color="Energy Saving (%)",
+        hover_name="Package",
+        hover_data={"Implementation Time (Months)": True},
+        color_continuous_scale=["#FF0000", "#FFFF00", "#00FF00"],
+        range_color=[0, 100]
+    )
+    fig.update_traces(marker=dict(size=14, symbol="square", line=dict(color="#FFFFFF", width=2)))
+    return retro_layout(
+        fig,
+        "Optimal Packages Within Budget",
+        xaxis=dict(title="Total Cost (€)", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID),
+        yaxis=dict(title="Carbon Reduction (%)", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID)
+    )
+
+
+def retrofit_timeline(timeline):
+    """Gantt chart of scheduled retrofits, one bar per row of ``timeline``."""
+    timeline = timeline.assign(
+        Job=timeline["Property Name"].astype(str) + " - " + timeline["Retrofit"].astype(str)
+    )
+    fig = px.timeline(
+        timeline,
+        x_start="Start Date",
+        x_end="End Date",
+        y="Job",
+        color="Retrofit",
+        hover_data={"Total Cost (€)": ":,.0f", "Start Quarter": True}
+    )
+    fig.update_yaxes(autorange="reversed")
+    return retro_layout(
+        fig,
+        "Retrofit Timeline",
+        xaxis=dict(gridcolor=RETRO_GRID),
+        yaxis=dict(title="", gridcolor=RETRO_GRID, showticklabels=len(timeline) <= 40),
+        height=max(300, min(800, 25 * len(timeline)))
+    )
+
+
+def spend_trajectory(trajectory):
+    """Quarterly spend as bars with the portfolio's emissions on a second axis."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=trajectory["Quarter"],
+        y=trajectory["Spend (€)"],
+        name="Spend (€)",
+        marker_color="#FF00FF"
+    ))
+    fig.add_trace(go.Scatter(
+        x=trajectory["Quarter"],
+        y=trajectory["Emissions (tCO2e/yr)"],
+        name="Emissions (tCO2e/yr)",
+        yaxis="y2",
+        mode="lines+markers",
+        line=dict(color="#00FF00", width=3),
+        marker=dict(size=10, symbol="square")
+    ))
+    return retro_layout(
+        fig,
+        "Spend & Carbon Trajectory",
+        xaxis=dict(gridcolor=RETRO_GRID),
+        yaxis=dict(title="Spend (€)", gridcolor=RETRO_GRID),
+        yaxis2=dict(title="Emissions (tCO2e/yr)", overlaying="y", side="right", showgrid=False),
+        legend=dict(orientation="h", y=-0.2)
+    )
+
+
+def scenario_distribution(summary, thresholds):
+    """Median Overall ESG Score per scenario with P10-P90 whiskers and the score band ``thresholds``."""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(
+        x=summary.index,
+        y=summary["P50"],
+        name="Median",
+        marker=dict(color="#00FFFF", line=dict(color="#FFFFFF", width=2)),
+        error_y=dict(
+            type="data",
+            symmetric=False,
+            array=summary["P90"] - summary["P50"],
+            arrayminus=summary["P50"] - summary["P10"],
+            color="#FFFF00"
+        )
+    ))
+    for threshold, color in zip(thresholds, ["#FF0000", "#00FF00"]):
+        fig.add_hline(y=threshold, line=dict(color=color, dash="dash"))
+    return retro_layout(
+        fig,
+        "Overall ESG Score by Policy (P10-P90)",
+        xaxis=dict(title="Policy", title_font=AXIS_TITLE_FONT),
+        yaxis=dict(title="Overall ESG Score", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID)
+    )
+
+
+def rank_range_histogram(ranges, bins=RANK_RANGE_BINS):
+    """Histogram of property rank ranges, binned here so only the bar heights reach the browser."""
+    counts, edges = np.histogram(np.asarray(ranges, dtype=float), bins=bins)
+    fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        customdata=np.column_stack([edges[:-1], edges[1:]]),
+        hovertemplate="Rank Range %{customdata[0]:,.0f}-%{customdata[1]:,.0f}<br>%{y:,} properties<extra></extra>",
+        marker_color="#FF00FF"
+    ))
+    return retro_layout(
+        fig,
+        "Rank Range Under Weight Changes",
+        bargap=0,
+        xaxis=dict(title="Rank Range", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID),
+        yaxis=dict(title="Properties", title_font=AXIS_TITLE_FONT, gridcolor=RETRO_GRID)
+    )
@@ -0,0 +1,100 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.aggregates import AggregateCube
+from modules.benchmarking import PeerGroups, peer_benchmarks
+from modules.calculations import SCORE_COLUMNS, score_properties
+from modules.data_generator import generate_sample_data
+from modules.dataflow import PortfolioState
+from modules.leaderboard import Leaderboard
+from modules.property_index import PropertyIndex
+
+METRIC_RANGES = {
+    "Energy Score": (20, 100),
+    "Carbon Footprint (kgCO2e/sqm/yr)": (50, 250),
+    "Water Usage (L/sqm/yr)": (500, 2000),
+    "Waste Recycling (%)": (10, 95),
+    "Tenant Satisfaction": (50, 100),
+    "Community Impact": (30, 100),
+    "Governance Compliance": (40, 100),
+}
+
+
+def shared_state(properties):
+    groups = PeerGroups(properties)
+    return PortfolioState(
+        properties, PropertyIndex(properties), Leaderboard(properties), AggregateCube(properties),
+        peer_benchmarks(properties, groups=groups), version="loaded", peer_groups=groups
+    )
+
+
+def random_changes(properties, rng, n_properties, n_columns):
+    changes = {}
+    for position in rng.choice(len(properties), n_properties, replace=False):
+        columns = rng.choice(list(METRIC_RANGES), n_columns, replace=False)
+        changes[properties["Property ID"].iloc[position]] = {
+            # Some values are fractional, so integer columns have to widen to float
+            column: float(rng.integers(*METRIC_RANGES[column]) + rng.choice([0, 0.5]))
+            for column in columns
+        }
+    return changes
+
+
+def leaderboard_rankings(leaderboard, n):
+    return {(group, bottom): leaderboard.ranking(n, group, bottom).tolist()
+            for group in leaderboard.group_names() for bottom in (False, True)}
+
+
+@pytest.fixture
+def properties():
+    return generate_sample_data(3_000, seed=0)
+
+
+def test_updates_match_full_rebuilds(properties):
+    loaded = properties.copy()
+    state = shared_state(properties)
+    # Fill the leaderboard buffers first, so the updates have to patch them
+    leaderboard_rankings(state.leaderboard, 5)
+
+    rng = np.random.default_rng(1)
+    for n_properties, n_columns in [(1, 1), (10, 3), (150, 2), (3, 7)]:
+        state.update(random_changes(state.properties, rng, n_properties, n_columns))
+
+        df = state.properties
+        rescored = score_properties(df[[column for column in df.columns if column not in SCORE_COLUMNS]])
+        pd.testing.assert_frame_equal(df[SCORE_COLUMNS], rescored[SCORE_COLUMNS])
+
+        for n in (5, 40):
+            assert leaderboard_rankings(state.leaderboard, n) == leaderboard_rankings(Leaderboard(df), n)
+        pd.testing.assert_frame_equal(state.aggregates.cells, AggregateCube(df).cells, check_dtype=False)
+        pd.testing.assert_frame_equal(state.benchmarks, peer_benchmarks(df))
+
+    # The loaded data other sessions share is left as it was
+    pd.testing.assert_frame_equal(properties, loaded)
+
+
+def test_update_changes_the_version(properties):
+    state = shared_state(properties)
+    assert state.version == "loaded"
+    property_id = properties["Property ID"].iloc[0]
+    state.update({property_id: {"Energy Score": 90}})
+    first = state.version
+    state.update({property_id: {"Energy Score": 91}})
+    assert first != "loaded" and state.version != first
+
+
+def test_update_renames_through_the_index(properties):
+    state = shared_state(properties)
+    property_id = properties["Property ID"].iloc[4]
+    state.update({property_id: {"Property Name": "Renamed Tower"}})
+    assert state.property_index.name(property_id) == "Renamed Tower"
+    assert state.properties["Property Name"].iloc[4] == "Renamed Tower"
+    assert properties["Property Name"].iloc[4] != "Renamed Tower"
+
+
+@pytest.mark.parametrize("column", ["Overall ESG Score", "Type", "Size (sqm)", "Unknown"])
+def test_update_rejects_columns_it_cannot_maintain(properties, column):
+    state = shared_state(properties)
+    with pytest.raises(ValueError):
+        state.update({properties["Property ID"].iloc[0]: {column: 1}})
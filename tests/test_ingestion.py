@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from modules.data_generator import generate_sample_data
+from modules.ingestion import PROPERTY_COLUMNS, ingest_properties_csv, validate_chunk
+from modules.portfolio_store import read_table
+
+
+def raw_rows(df):
+    # The ingester reads every field as text
+    return df[PROPERTY_COLUMNS].astype(str).reset_index(drop=True)
+
+
+def reasons(failures):
+    return {reason: np.flatnonzero(mask).tolist() for reason, mask in failures}
+
+
+def test_validate_chunk_accepts_generated_rows():
+    _, failures = validate_chunk(raw_rows(generate_sample_data(50, seed=0)))
+    assert failures == []
+
+
+def test_validate_chunk_rejects_ids_seen_in_earlier_chunks():
+    chunk = raw_rows(generate_sample_data(6, seed=0))
+    seen_ids = {chunk["Property ID"][1], chunk["Property ID"][4], "PROP-999"}
+    _, failures = validate_chunk(chunk, seen_ids)
+    assert reasons(failures) == {"duplicate Property ID": [1, 4]}
+
+
+def test_validate_chunk_keeps_the_first_of_repeated_ids():
+    chunk = raw_rows(generate_sample_data(4, seed=0))
+    chunk.loc[3, "Property ID"] = chunk["Property ID"][0]
+    _, failures = validate_chunk(chunk)
+    assert reasons(failures) == {"duplicate Property ID": [3]}
+
+
+def test_ingest_rejects_duplicates_across_chunks(tmp_path):
+    properties = generate_sample_data(40, seed=0)
+    # Repeat accepted rows in the last two chunks, one of them twice
+    repeats = properties.iloc[[2, 5, 5, 33]]
+    csv_rows = pd.concat([properties, repeats], ignore_index=True)
+    csv_path, store_path, rejects_path = (str(tmp_path / name) for name in
+                                          ("properties.csv", "properties.arrow", "rejects.csv"))
+    csv_rows[PROPERTY_COLUMNS].to_csv(csv_path, index=False)
+
+    summary = ingest_properties_csv(csv_path, store_path, chunk_size=7, rejects_path=rejects_path)
+    assert summary["Rejected"].sum() == len(repeats)
+    assert summary["Accepted"].sum() == len(properties)
+
+    stored = read_table(store_path)
+    assert stored["Property ID"].tolist() == properties["Property ID"].tolist()
+    pd.testing.assert_series_equal(stored["Overall ESG Score"], properties["Overall ESG Score"])
+
+    rejects = pd.read_csv(rejects_path)
+    assert rejects["Line"].tolist() == [42, 43, 44, 45]
+    assert (rejects["Reason"] == "duplicate Property ID").all()
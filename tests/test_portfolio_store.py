@@ -0,0 +1,27 @@
+import pandas as pd
+
+from modules.data_generator import generate_sample_data
+from modules.ingestion import PROPERTY_COLUMNS
+from modules.portfolio_store import load_properties
+
+
+def write_csv(df, path):
+    df[PROPERTY_COLUMNS].to_csv(path, index=False)
+    return str(path)
+
+
+def test_load_properties_reads_the_ingested_csv(tmp_path):
+    properties = generate_sample_data()
+    csv_path = write_csv(properties, tmp_path / "properties.csv")
+    loaded = load_properties(store_path=str(tmp_path / "properties.arrow"), csv_path=csv_path)
+    assert loaded["Property ID"].tolist() == properties["Property ID"].tolist()
+
+
+def test_load_properties_without_valid_rows_is_no_data(tmp_path):
+    properties = generate_sample_data()
+    properties["Energy Score"] = 150.0
+    csv_path = write_csv(properties, tmp_path / "properties.csv")
+    store_path = str(tmp_path / "properties.arrow")
+    assert load_properties(store_path=store_path, csv_path=csv_path) is None
+    rejects = pd.read_csv(tmp_path / "properties_rejects.csv")
+    assert len(rejects) == len(properties)
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.data_generator import generate_retrofit_options, generate_sample_data
+from modules.retrofits import optimize_retrofits, pareto_packages, project_retrofit
+
+
+def random_catalog(n, seed):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Retrofit": [f"Retrofit {i}" for i in range(n)],
+        "Cost (€/sqm)": rng.integers(5, 150, n),
+        # Halves are exact at the optimizer's saving resolution
+        "Carbon Reduction (%)": rng.integers(0, 80, n) / 2,
+        "Energy Saving (%)": rng.integers(0, 80, n) / 2,
+        "Implementation Time (Months)": rng.integers(1, 12, n),
+    })
+
+
+CATALOGS = [generate_retrofit_options(), random_catalog(9, seed=1), random_catalog(10, seed=2)]
+
+
+def all_packages(retrofit_df, property_size):
+    """Totals of every subset of the catalog, one row per subset."""
+    n = len(retrofit_df)
+    members = (np.arange(2 ** n)[:, None] >> np.arange(n) & 1).astype(bool)
+    return members, {
+        "cost": members @ retrofit_df["Cost (€/sqm)"].to_numpy(dtype=np.float64) * property_size,
+        "carbon": np.minimum(100, members @ retrofit_df["Carbon Reduction (%)"].to_numpy(dtype=np.float64)),
+        "energy": np.minimum(100, members @ retrofit_df["Energy Saving (%)"].to_numpy(dtype=np.float64)),
+        "months": members @ retrofit_df["Implementation Time (Months)"].to_numpy(dtype=np.float64),
+    }
+
+
+def objective_values(totals, property_data, objective):
+    if objective == "esg":
+        return project_retrofit(property_data, totals["carbon"], totals["energy"])["Overall ESG Score"]
+    return totals[objective]
+
+
+@pytest.mark.parametrize("catalog", range(len(CATALOGS)))
+@pytest.mark.parametrize("objective", ["carbon", "energy", "esg"])
+def test_optimize_retrofits_matches_brute_force(catalog, objective):
+    retrofit_df = CATALOGS[catalog]
+    for _, property_data in generate_sample_data(6, seed=catalog).iterrows():
+        members, totals = all_packages(retrofit_df, property_data["Size (sqm)"])
+        values = objective_values(totals, property_data, objective)
+        for budget in totals["cost"][-1] * np.array([0, 0.15, 0.4, 1]):
+            feasible = totals["cost"] <= budget + 1e-6
+            best = values[feasible].max()
+            cheapest = totals["cost"][feasible & (values >= best - 1e-9)].min()
+
+            chosen = optimize_retrofits(retrofit_df, property_data, budget, objective)
+            package = np.zeros(len(retrofit_df), dtype=bool)
+            package[chosen] = True
+            subset = np.flatnonzero((members == package).all(axis=1))[0]
+            assert values[subset] == pytest.approx(best)
+            assert totals["cost"][subset] == pytest.approx(cheapest)
+
+
+def brute_force_frontier(retrofit_df, property_size, budget=None):
+    _, totals = all_packages(retrofit_df, property_size)
+    packages = np.column_stack([totals["cost"], -totals["carbon"], -totals["energy"], totals["months"]])
+    if budget is not None:
+        packages = packages[packages[:, 0] <= budget]
+    packages = np.unique(packages, axis=0)
+    # A package is dominated by one no worse on every criterion and different from it
+    no_worse = (packages[None, :, :] <= packages[:, None, :]).all(axis=2)
+    dominated = (no_worse & ~np.eye(len(packages), dtype=bool)).any(axis=1)
+    frontier = packages[~dominated]
+    frontier[:, 1:3] *= -1
+    return frontier[np.lexsort(frontier.T[::-1])]
+
+
+@pytest.mark.parametrize("catalog", range(len(CATALOGS)))
+@pytest.mark.parametrize("budget", [None, 400_000, 1_500_000])
+def test_pareto_packages_match_brute_force(catalog, budget):
+    retrofit_df = CATALOGS[catalog]
+    frontier = pareto_packages(retrofit_df, 2_000, budget)
+
+    found = frontier[["Total Cost (€)", "Carbon Reduction (%)", "Energy Saving (%)",
+                      "Implementation Time (Months)"]].to_numpy()
+    found = found[np.lexsort(found.T[::-1])]
+    np.testing.assert_allclose(found, brute_force_frontier(retrofit_df, 2_000, budget))
+    assert frontier["Total Cost (€)"].is_monotonic_increasing
+
+    costs = retrofit_df["Cost (€/sqm)"].to_numpy()
+    for package, cost in zip(frontier["Retrofits"], frontier["Total Cost (€)"]):
+        assert costs[package].sum() * 2_000 == pytest.approx(cost)
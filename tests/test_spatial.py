@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modules.spatial import SpatialIndex, cluster_properties, haversine_km, in_bounds
+
+
+@pytest.fixture(scope="module")
+def points():
+    rng = np.random.default_rng(0)
+    # A dense cluster, a sparse spread and exact duplicates
+    latitudes = np.concatenate([rng.normal(48.8, 0.05, 3_000), rng.uniform(35, 60, 2_000), np.full(20, 52.5)])
+    longitudes = np.concatenate([rng.normal(2.3, 0.05, 3_000), rng.uniform(-10, 25, 2_000), np.full(20, 13.4)])
+    return latitudes, longitudes
+
+
+@pytest.fixture(scope="module")
+def index(points):
+    return SpatialIndex(*points)
+
+
+BOXES = [
+    (48.75, 48.85, 2.25, 2.35),
+    (40.0, 55.0, -5.0, 10.0),
+    (52.5, 52.5, 13.4, 13.4),
+    (-90.0, 90.0, -180.0, 180.0),
+    (10.0, 20.0, 100.0, 120.0),
+    (50.0, 40.0, 0.0, 10.0),
+]
+
+
+@pytest.mark.parametrize("bounds", BOXES)
+def test_bbox_matches_linear_scan(points, index, bounds):
+    frame = pd.DataFrame({"Latitude": points[0], "Longitude": points[1]})
+    np.testing.assert_array_equal(index.bbox(bounds), np.flatnonzero(in_bounds(frame, bounds)))
+
+
+@pytest.mark.parametrize("lat, lon, radius_km", [(48.8, 2.3, 5), (48.8, 2.3, 300), (52.5, 13.4, 0.1),
+                                                 (45.0, 0.0, 2_000), (0.0, 0.0, 100)])
+def test_radius_matches_linear_scan(points, index, lat, lon, radius_km):
+    distances = haversine_km(lat, lon, *points)
+    within = np.flatnonzero(distances <= radius_km)
+
+    positions, found = index.radius(lat, lon, radius_km)
+    assert sorted(positions.tolist()) == within.tolist()
+    np.testing.assert_allclose(found, distances[positions])
+    assert (np.diff(found) >= 0).all()
+
+
+@pytest.mark.parametrize("k", [1, 10, 500])
+@pytest.mark.parametrize("lat, lon", [(48.8, 2.3), (58.0, -9.0), (-30.0, 150.0)])
+def test_nearest_matches_linear_scan(points, index, k, lat, lon):
+    distances = haversine_km(lat, lon, *points)
+    positions, found = index.nearest(lat, lon, k)
+    np.testing.assert_allclose(found, np.sort(distances)[:k])
+    np.testing.assert_allclose(distances[positions], found)
+
+
+def test_nearest_leaves_out_the_excluded_point(points, index):
+    lat, lon = points[0][7], points[1][7]
+    positions, _ = index.nearest(lat, lon, 5, exclude=7)
+    assert len(positions) == 5 and 7 not in positions
+
+
+def test_empty_index():
+    index = SpatialIndex([], [])
+    assert len(index.bbox((-90, 90, -180, 180))) == 0
+    assert len(index.nearest(0.0, 0.0, 3)[0]) == 0
+
+
+def test_cluster_properties_with_index_matches_scan(points, index):
+    frame = pd.DataFrame({"Latitude": points[0], "Longitude": points[1],
+                          "Overall ESG Score": np.linspace(0, 100, len(points[0]))})
+    for bounds, max_markers in [(BOXES[0], 5_000), (BOXES[1], 200)]:
+        scanned, scanned_clustered = cluster_properties(frame, bounds, max_markers)
+        indexed, indexed_clustered = cluster_properties(frame, bounds, max_markers, index=index)
+        assert scanned_clustered == indexed_clustered
+        pd.testing.assert_frame_equal(scanned.reset_index(drop=True), indexed.reset_index(drop=True))
+    assert indexed_clustered and indexed["Properties"].sum() == in_bounds(frame, BOXES[1]).sum()
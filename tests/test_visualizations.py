@@ -0,0 +1,50 @@
+import pickle
+
+import plotly.graph_objects as go
+import plotly.io as pio
+import pytest
+
+from modules.visualizations import SerializedFigure, cached_figure
+
+
+def bar_chart(data, title=""):
+    return go.Figure(go.Bar(x=data["x"], y=data["y"]), layout=dict(title=title))
+
+
+@pytest.fixture
+def figure():
+    return bar_chart({"x": ["A", "B"], "y": [3, 4]}, title="Test")
+
+
+def test_serialized_figure_matches_the_built_figure(figure):
+    serialized = SerializedFigure(pio.to_json(figure, validate=False))
+    assert serialized.to_dict() == figure.to_dict()
+    assert pio.to_json(serialized) == pio.to_json(figure)
+    assert serialized == figure
+    assert serialized.figure() == figure
+
+
+def test_serialized_figure_round_trips_through_pickle(figure):
+    serialized = SerializedFigure(pio.to_json(figure, validate=False))
+    assert pickle.loads(pickle.dumps(serialized)) == serialized
+
+
+def test_serialized_figure_points_edits_to_figure(figure):
+    serialized = SerializedFigure(pio.to_json(figure, validate=False))
+    with pytest.raises(AttributeError, match=r"\.figure\(\)"):
+        serialized.update_layout(title="Edited")
+    edited = serialized.figure().update_layout(title="Edited")
+    assert edited.layout.title.text == "Edited"
+
+
+def test_cached_figure_builds_deferred_data_once():
+    calls = []
+
+    def data():
+        calls.append(1)
+        return {"x": ["A"], "y": [1]}
+
+    first = cached_figure("test_bar", data, bar_chart, data_key=("test", 1), title="Cached")
+    second = cached_figure("test_bar", data, bar_chart, data_key=("test", 1), title="Cached")
+    assert len(calls) == 1
+    assert first == second == bar_chart(data(), title="Cached")